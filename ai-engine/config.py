@@ -16,11 +16,20 @@ DARK_THEME = {
 
 # Database path
 DB_PATH = 'diginetra.db'
-EVENTS_DIR = 'events'
+DB_SYNCHRONOUS = 'NORMAL'  # SQLite synchronous mode; with WAL, NORMAL skips the fsync on every commit
+DB_CACHE_SIZE_KB = 16384  # Page cache per connection
+DB_BUSY_TIMEOUT = 5  # Seconds a connection waits for a lock before failing
+DB_WRITER_BATCH_SIZE = 256  # Most writes group-committed in one transaction
+DB_CAMERA_CACHE_TTL = 10  # Seconds cached camera rows are served before being reloaded (picks up edits from other processes)
+DB_WRITER_BATCH_WINDOW = 0.0  # Extra seconds to wait for more writes before committing (0 = commit what has queued)
+EVENTS_DIR = 'events'  # Event images, sharded into YYYYMMDD subdirectories
+CLIPS_DIR = os.path.join(EVENTS_DIR, 'clips')  # Event clips, sharded the same way
+DETECTION_FEED_DIR = 'api-backend/events'  # det_*.jpg frames and their _metadata.json sidecars for the dashboards
 
-# Ensure events directory exists
-if not os.path.exists(EVENTS_DIR):
-    os.makedirs(EVENTS_DIR)
+# Ensure events and clips directories exist
+for directory in (EVENTS_DIR, CLIPS_DIR):
+    if not os.path.exists(directory):
+        os.makedirs(directory)
 
 # Webhook configuration
 WEBHOOK_URL = "http://13.232.212.109/api/webhook/receive"
@@ -35,21 +44,93 @@ DEFAULT_LONGITUDE = "77.3910"
 # Camera settings
 MAX_CAMERA_RESOLUTION = (1280, 720)  # Maximum resolution for cameras (HD)
 CAMERA_QUEUE_SIZE = 32  # Number of frames to buffer per camera
-CAMERA_RECONNECT_DELAY = 2  # Seconds between reconnection attempts
+FRAME_RING_SLOTS = 8  # Preallocated frame slots per camera shared by capture, detection and display
+CAMERA_RECONNECT_DELAY = 2  # Base seconds between reconnection attempts (doubled per failure)
+CAMERA_RECONNECT_MAX_DELAY = 60  # Upper bound for the reconnection backoff
+CAMERA_MAX_CONCURRENT_CONNECTS = 4  # Cameras allowed to be opening a connection at the same time
+CAMERA_STABLE_SECONDS = 30  # A connection must stay up this long before its reconnection backoff resets
+CAMERA_OPEN_TIMEOUT = 10  # Seconds to wait for a stream to open
+CAMERA_READ_TIMEOUT = 10  # Seconds without a frame before a stream counts as lost
+STARTUP_REPORT_TIMEOUT = 60  # Seconds after loading cameras before the time-to-first-frame report is printed anyway
+
+# Ingest settings
+INGEST_MODE = 'opencv'  # 'opencv' (cv2.VideoCapture thread per camera), 'ffmpeg' (ffmpeg subprocess per camera)
+                        # 'pooled' (ffmpeg subprocesses serviced by one shared event loop thread)
+                        # or 'sharded' (pooled ingest split across capture worker processes)
+FFMPEG_PATH = 'ffmpeg'  # ffmpeg binary used by the ffmpeg ingest mode
+FFPROBE_PATH = 'ffprobe'  # ffprobe binary used to read the source resolution
+FFMPEG_CUVID = False  # Use NVDEC (h264_cuvid/hevc_cuvid) with decoder-side resize in ffmpeg ingest
+INGEST_PROBE_WORKERS = 4  # Worker threads for resolution probes in pooled mode
+INGEST_MAX_FPS = 10  # Output frame rate cap per camera in pooled mode (None = native rate)
+CAPTURE_SHARDS = max(1, (os.cpu_count() or 2) // 2)  # Capture worker processes in sharded mode
+
+# Dual-stream cameras: detection runs on rtsp_url (substream), event images come from snapshot_url (main stream)
+SNAPSHOT_MODE = 'keyframe'  # 'keyframe' (cache main-stream keyframes via ffmpeg) or 'on_demand' (open per event)
+
+# Display settings
+DISPLAY_MAX_FPS = 15  # Refresh cap per camera tile; frames are downscaled to the tile size off the GUI thread
+
+# Activity heatmaps (per camera and category, from detection box positions)
+HEATMAPS_ENABLED = True  # Accumulate occupancy grids from the detection results
+HEATMAP_GRID = (64, 36)  # Grid columns, rows
+HEATMAP_FLUSH_INTERVAL = 300  # Seconds between merges of the in-memory grids into the hourly rows
 
 # Detection settings
+STORE_DETECTIONS = True  # Write every detected box to the detections table (alongside the det_*.json sidecars)
 DETECTION_CONFIDENCE = 0.45  # Confidence threshold for detection
 TARGET_DETECTION_SIZE = (640, 480)  # Size to resize frames for detection
 FRAME_SKIP = 2  # Process every Nth frame (1 = process all frames)
 BATCH_SIZE = 4  # Process this many frames at once
 EVENT_COOLDOWN = 30  # Seconds between duplicate event detections
 
+# Event clip settings (compressed packets are remuxed to MP4, never re-encoded)
+EVENT_CLIPS = False  # Opt-in: buffer recent packets per camera and save a clip with each event (needs PyAV; opens a second RTSP session per camera)
+CLIP_PRE_SECONDS = 5  # Seconds of video kept before an event (rounded back to a keyframe)
+CLIP_POST_SECONDS = 5  # Seconds of video recorded after an event
+CLIP_MAX_SECONDS = 30  # Upper bound for a clip extended by overlapping events
+
+# Continuous recording (stream copy into MPEG-TS segments, needs PyAV)
+RECORDING_ENABLED = False  # Record every network camera continuously
+RECORDINGS_DIR = 'recordings'
+RECORDING_SEGMENT_SECONDS = 60  # Segment length (cut on the next keyframe)
+RECORDING_MAX_BYTES = 50 * 1024 ** 3  # Oldest segments are deleted beyond this total size
+
+# Retention (events, their images and clips, detection-feed files); None disables a budget
+RETENTION_ENABLED = False  # Run the background retention manager (opt-in: it deletes events and files)
+RETENTION_INTERVAL = 600  # Seconds between retention passes
+RETENTION_MAX_AGE_DAYS = 90  # Events older than this are deleted
+RETENTION_MAX_BYTES = 20 * 1024 ** 3  # Event images and clips kept across all cameras (oldest deleted first)
+RETENTION_CAMERA_MAX_AGE_DAYS = {}  # Per-camera age overrides: {camera_id: days}
+RETENTION_CAMERA_MAX_BYTES = {}  # Per-camera size budgets: {camera_id: bytes}
+RETENTION_DETECTION_MAX_AGE_DAYS = 30  # Detection boxes that raised no event
+RETENTION_MINUTE_COUNTS_DAYS = 14  # Per-minute event counts (hourly counts are kept for good)
+RETENTION_HEATMAP_DAYS = 365  # Hourly activity heatmaps
+RETENTION_FEED_MAX_AGE_DAYS = 2  # det_*.jpg images in DETECTION_FEED_DIR, deleted with their _metadata.json sidecars
+RETENTION_FEED_MAX_BYTES = 1024 ** 3  # det_*.jpg images plus sidecars in DETECTION_FEED_DIR
+RETENTION_BATCH_SIZE = 500  # Events (or detection rows) deleted per write transaction
+RETENTION_VACUUM_PAGES = 2000  # Free database pages returned to the disk after each pass (incremental vacuum)
+# With retention enabled, a database file created before incremental vacuum is switched to it once, with a
+# full VACUUM when the database writer starts at application startup (writes wait until it finishes)
+
+# Latency reporting
+LATENCY_SAMPLES = 512  # Recent samples kept per camera and stage
+LATENCY_REPORT_INTERVAL = 60  # Seconds between latency summaries in the log
+
 # Image compression settings
 JPEG_QUALITY = 85  # JPEG quality for saving event images (0-100)
+EVENT_SINK_WORKERS = 2  # Pool threads saving events (image, database row, webhook) off the GUI thread
+EVENT_SINK_QUEUE_SIZE = 32  # Events waiting to be saved before new ones are dropped
+EVENT_IMAGE_ANNOTATED = False  # Opt-in: event images (disk, database, webhook) carry the detection boxes; default keeps the raw frame
 
 # Webhook settings
 WEBHOOK_TIMEOUT = 5  # Seconds to wait for webhook response
-ENABLE_WEBHOOKS = True  # Set to False to disable webhook functionality
+ENABLE_WEBHOOKS = False  # Opt-in: set to True to send alerts to WEBHOOK_URL
+WEBHOOK_QUEUE_SIZE = 64  # Alerts waiting for the dispatcher before new ones are dropped
+WEBHOOK_COALESCE_SECONDS = 5  # After an alert, later ones for the same camera and category within this window are sent as one summary
+WEBHOOK_MAX_ATTEMPTS = 8  # Delivery attempts before an alert is given up
+WEBHOOK_RETRY_DELAY = 5  # Base seconds before a failed alert is retried (doubled per attempt)
+WEBHOOK_RETRY_MAX_DELAY = 300  # Upper bound for the retry backoff
+WEBHOOK_OUTBOX_LIMIT = 500  # Undelivered alerts kept in the database outbox (oldest dropped first)
 
 # Thread settings
 OPENCV_THREADS = 4  # Number of threads for OpenCV operations
\ No newline at end of file
@@ -15,7 +15,8 @@ class EventsController(QObject):
     
     def load_events(self):
         """Load events from database and display in view"""
-        events = self.db.get_events()
+        # First page of the keyset-paged listing; stays an index walk however large the table grows
+        events, _ = self.db.get_events_page()
         self.view.display_events(events)
     
     def cleanup(self):
@@ -1,11 +1,13 @@
 import os
-import cv2
 import time
 import platform
-import requests
 from datetime import datetime
-from PyQt6.QtCore import QObject, QThreadPool
-from config import DARK_THEME, EVENTS_DIR, WEBHOOK_URL, WEBHOOK_SECRET, AUTH_TOKEN, DEFAULT_LATITUDE, DEFAULT_LONGITUDE
+from PyQt6.QtCore import QObject, QThreadPool, QTimer
+from config import DARK_THEME, EVENTS_DIR, ENABLE_WEBHOOKS, DEFAULT_LATITUDE, DEFAULT_LONGITUDE
+from config import INGEST_MODE, EVENT_CLIPS, RECORDING_ENABLED, RECORDING_MAX_BYTES, STARTUP_REPORT_TIMEOUT
+from config import DISPLAY_MAX_FPS, RETENTION_ENABLED, HEATMAPS_ENABLED
+from models.latency import latency_tracker
+from models.startup_report import StartupReport
 
 # Hardware detection
 IS_MAC = platform.system() == "Darwin"
@@ -37,7 +39,12 @@ class LiveController(QObject):
         self.db = database
         self.view = live_view_page
         self.camera_streams = {}  # Dictionary of RTSPStream threads
+        self.camera_specs = {}  # camera_id -> (rtsp_url, snapshot_url) the running streams were started with
+        self.snapshot_sources = {}  # Main-stream snapshot sources for dual-stream cameras
+        self.packet_streams = {}  # Demux-only connections feeding clip and segment recorders
+        self.clip_recorders = {}  # Pre-event packet buffers that save event clips
         self.detection_thread = None  # Will be set later
+        self.startup_report = StartupReport()  # Time-to-first-frame of the last load_cameras()
         
         # Initialize thread pool for parallel tasks
         self.thread_pool = QThreadPool.globalInstance()
@@ -51,6 +58,43 @@ class LiveController(QObject):
             
         self.thread_pool.setMaxThreadCount(max_threads)
         print(f"Using thread pool with max {self.thread_pool.maxThreadCount()} threads")
+        
+        # Tiles are refreshed at most DISPLAY_MAX_FPS, with frames scaled to the tile off the GUI thread
+        from models.preview_scaler import PreviewScaler  # Import here to avoid circular imports
+        self.display_interval = 1.0 / DISPLAY_MAX_FPS if DISPLAY_MAX_FPS else 0.0
+        self.last_display = {}  # camera_id -> monotonic time of the last frame sent to the tile
+        self.preview_scaler = PreviewScaler()
+        self.preview_scaler.preview_ready.connect(self.on_preview_ready)
+        self.preview_scaler.start()
+        
+        # Events are saved on the pool; results come back through signals
+        from models.event_sink import EventSink  # Import here to avoid circular imports
+        self.event_sink = EventSink(self._store_event, db_path=self.db.db_path, thread_pool=self.thread_pool)
+        self.event_sink.event_stored.connect(self.on_event_stored)
+        self.event_sink.event_failed.connect(self.on_event_failed)
+        self.event_sink.event_dropped.connect(self.on_event_dropped)
+        
+        # Webhooks are delivered off the GUI thread with retries from a database outbox
+        self.webhook_dispatcher = None
+        if ENABLE_WEBHOOKS:
+            from models.webhook_dispatcher import WebhookDispatcher  # Import here to avoid circular imports
+            self.webhook_dispatcher = WebhookDispatcher()
+            self.webhook_dispatcher.webhook_sent.connect(self.on_webhook_sent)
+            self.webhook_dispatcher.webhook_failed.connect(self.on_webhook_failed)
+            self.webhook_dispatcher.start()
+        
+        # Where objects appear in each view, accumulated from the detection results
+        self.heatmap = None
+        if HEATMAPS_ENABLED:
+            from models.heatmap import HeatmapAccumulator  # Import here to avoid circular imports
+            self.heatmap = HeatmapAccumulator(self.db)
+        
+        # Old events, images, clips and detection-feed files are deleted in the background
+        self.retention_manager = None
+        if RETENTION_ENABLED:
+            from models.retention import RetentionManager  # Import here to avoid circular imports
+            self.retention_manager = RetentionManager(db_path=self.db.db_path)
+            self.retention_manager.start()
     
     def set_detection_thread(self, detection_thread):
         """Set the detection thread and connect signals"""
@@ -59,12 +103,15 @@ class LiveController(QObject):
         self.detection_thread.event_detected.connect(self.on_event_detected)
     
     def load_cameras(self):
-        """Load cameras from database and create widgets with optimization"""
-        # Clear existing streams and widgets
-        self.cleanup_cameras()
+        """Bring running cameras in line with the database, touching only what changed
         
+        Cameras that were removed or disabled are stopped, new ones are
+        started, and a camera is restarted only when its stream URLs
+        change. Name and location edits just update the widget.
+        """
         # Load cameras from database
-        cameras = self.db.get_cameras()
+        cameras = self.db.get_camera_list()
+        report_generation = self.startup_report.begin()
         
         # Calculate optimal batch size based on camera count
         batch_size = min(BATCH_SIZE, max(1, len(cameras)))
@@ -72,115 +119,320 @@ class LiveController(QObject):
             self.detection_thread.batch_size = batch_size
             self.detection_thread.frame_skip = FRAME_SKIP
         
+        desired = {}
         for camera in cameras:
-            # Unpack camera data including latitude and longitude
-            camera_id, name, rtsp_url, enabled, latitude, longitude = camera
+            if camera.enabled:
+                desired[str(camera.id)] = (camera.name, camera.latitude, camera.longitude,
+                                           (camera.rtsp_url, camera.snapshot_url or None))
+        
+        # Stop cameras that were deleted or disabled
+        for camera_id in [camera_id for camera_id in self.camera_specs if camera_id not in desired]:
+            self._stop_camera(camera_id)
+            self._remove_camera_widget(camera_id)
+        
+        started = 0
+        for camera_id, (name, latitude, longitude, spec) in desired.items():
+            running_spec = self.camera_specs.get(camera_id)
+            if running_spec == spec:
+                camera_widget = self.view.camera_widgets.get(camera_id)
+                if camera_widget is not None:
+                    self._rename_camera_widget(camera_widget, name)
+                    camera_widget.latitude = latitude
+                    camera_widget.longitude = longitude
+                continue
             
-            if enabled:
+            if running_spec is None:
                 # Create camera widget through the view
-                camera_widget = self.view.add_camera_widget(str(camera_id), name)
-                
-                # Store location info in the widget for webhook use
-                camera_widget.latitude = latitude
-                camera_widget.longitude = longitude
-                
-                # Create and start stream with optimized parameters
-                from models.rtsp_stream import RTSPStream  # Import here to avoid circular imports
-                
-                # Determine optimal queue size based on hardware
-                queue_size = 16 if IS_MAC else 32 if not HAS_GPU else 64
-                
-                stream_thread = RTSPStream(
-                    str(camera_id), 
-                    rtsp_url,
-                    queue_size=queue_size,
-                    max_resolution=MAX_RESOLUTION
-                )
-                stream_thread.frame_ready.connect(self.process_frame)
-                stream_thread.connection_status.connect(self.update_connection_status)
-                stream_thread.start()
-                
-                # Store thread reference
-                self.camera_streams[str(camera_id)] = stream_thread
-                
-                # Small delay between starting cameras to distribute load
-                # Longer delay for Mac to reduce initial load spike
-                time.sleep(0.5 if IS_MAC else 0.2)
+                camera_widget = self.view.add_camera_widget(camera_id, name)
+            else:
+                # Stream settings changed: restart the streams, keep the tile
+                self._stop_camera(camera_id)
+                camera_widget = self.view.camera_widgets[camera_id]
+                self._rename_camera_widget(camera_widget, name)
+            
+            # Store location info in the widget for webhook use
+            camera_widget.latitude = latitude
+            camera_widget.longitude = longitude
+            self.startup_report.add_camera(camera_id, name)
+            self._start_camera(camera_id, *spec)
+            started += 1
+        
+        print(f"Started {started} camera streams ({len(self.camera_streams)} running)")
+        # Cameras that never deliver a frame are still reported once the deadline passes
+        if started:
+            QTimer.singleShot(int(STARTUP_REPORT_TIMEOUT * 1000), lambda: self.startup_report.log(report_generation))
+    
+    def _start_camera(self, camera_id, rtsp_url, snapshot_url=None):
+        """Start the streams for one camera"""
+        # Create and start stream with optimized parameters
+        from models.rtsp_stream import RTSPStream  # Import here to avoid circular imports
+        from models.ffmpeg_stream import FFmpegStream
+        from models.ingest_loop import PooledStream
+        from models.capture_shards import ShardedStream
+        
+        # Determine optimal queue size based on hardware
+        queue_size = 16 if IS_MAC else 32 if not HAS_GPU else 64
+        
+        # Scale once, at decode time, straight to the size detection runs at
+        detection_size = self.detection_thread.target_size if self.detection_thread else None
+        
+        # ffmpeg-based ingest decodes and scales out of process; local devices stay on OpenCV
+        stream_class = RTSPStream
+        if not str(rtsp_url).isdigit():
+            if INGEST_MODE == 'ffmpeg':
+                stream_class = FFmpegStream
+            elif INGEST_MODE == 'pooled':
+                stream_class = PooledStream
+            elif INGEST_MODE == 'sharded':
+                stream_class = ShardedStream
+        
+        stream_thread = stream_class(
+            camera_id, 
+            rtsp_url,
+            queue_size=queue_size,
+            max_resolution=MAX_RESOLUTION,
+            output_size=detection_size
+        )
+        stream_thread.frame_ready.connect(self.process_frame)
+        stream_thread.connection_status.connect(self.update_connection_status)
+        # Non-blocking: connection attempts queue on the supervisor's concurrency cap
+        # (CAMERA_MAX_CONCURRENT_CONNECTS) and give up after CAMERA_OPEN_TIMEOUT
+        stream_thread.start()
         
-        print(f"Started {len(self.camera_streams)} camera streams")
+        # Store thread reference
+        self.camera_streams[camera_id] = stream_thread
+        self.camera_specs[camera_id] = (rtsp_url, snapshot_url)
+        
+        # Dual-stream cameras: detect on the substream above, take event images from the main stream
+        if snapshot_url:
+            from models.snapshot import SnapshotSource
+            snapshot_source = SnapshotSource(camera_id, snapshot_url)
+            snapshot_source.start()
+            self.snapshot_sources[camera_id] = snapshot_source
+        
+        # Compressed video (no decoding) for event clips and continuous recording
+        if (EVENT_CLIPS or RECORDING_ENABLED) and not str(rtsp_url).isdigit():
+            from models.packet_stream import PacketStream
+            if PacketStream.available():
+                packet_stream = PacketStream(camera_id, snapshot_url or rtsp_url)
+                if EVENT_CLIPS:
+                    from models.clip_recorder import ClipRecorder
+                    clip_recorder = ClipRecorder(camera_id)
+                    clip_recorder.clip_ready.connect(self.on_clip_ready)
+                    packet_stream.add_consumer(clip_recorder)
+                    self.clip_recorders[camera_id] = clip_recorder
+                if RECORDING_ENABLED:
+                    from models.segment_recorder import SegmentRecorder
+                    segment_recorder = SegmentRecorder(camera_id)
+                    segment_recorder.segment_closed.connect(self.on_segment_closed)
+                    packet_stream.add_consumer(segment_recorder)
+                packet_stream.start()
+                self.packet_streams[camera_id] = packet_stream
+    
+    def _stop_camera(self, camera_id):
+        """Stop the streams for one camera, leaving its widget in place"""
+        stream = self.camera_streams.pop(camera_id, None)
+        if stream is not None:
+            stream.stop()
+        snapshot_source = self.snapshot_sources.pop(camera_id, None)
+        if snapshot_source is not None:
+            snapshot_source.stop()
+        packet_stream = self.packet_streams.pop(camera_id, None)
+        if packet_stream is not None:
+            packet_stream.stop()
+        self.clip_recorders.pop(camera_id, None)
+        self.camera_specs.pop(camera_id, None)
+        from models.connection_supervisor import supervisor
+        supervisor.forget(camera_id)  # A restarted camera starts without the old backoff
+        self.last_display.pop(camera_id, None)
+        self.preview_scaler.discard(camera_id)
+        if self.detection_thread:
+            self.detection_thread.forget_camera(camera_id)
+    
+    @staticmethod
+    def _rename_camera_widget(camera_widget, name):
+        """Rename one camera's tile, including the title it shows"""
+        camera_widget.camera_name = name
+        if hasattr(camera_widget, 'set_camera_name'):
+            camera_widget.set_camera_name(name)
+        elif hasattr(camera_widget, 'name_label'):
+            camera_widget.name_label.setText(name)
     
-    def process_frame(self, frame, camera_id):
+    def _remove_camera_widget(self, camera_id):
+        """Take one camera's tile out of the live view"""
+        if hasattr(self.view, 'remove_camera_widget'):
+            self.view.remove_camera_widget(camera_id)
+            return
+        camera_widget = self.view.camera_widgets.pop(camera_id, None)
+        if camera_widget is not None:
+            camera_widget.setParent(None)
+            camera_widget.deleteLater()
+    
+    def process_frame(self, frame, camera_id, frame_ref=None):
         """Process incoming frame from camera stream with optimizations"""
         if camera_id in self.view.camera_widgets:
-            # Send frame to detection thread
+            if self.startup_report.first_frame(camera_id, frame_ref.timestamp if frame_ref else time.time()):
+                self.startup_report.log()
+            
+            # Send frame to detection thread (the ref lets it pin the capture ring slot)
             if self.detection_thread:
-                self.detection_thread.add_frame(frame, camera_id)
+                self.detection_thread.add_frame(frame, camera_id, frame_ref)
     
-    def process_detection_results(self, detections, processed_frame, camera_id):
+    def process_detection_results(self, detections, processed_frame, camera_id, capture_time=None):
         """Process detection results and update camera display"""
-        if camera_id in self.view.camera_widgets:
-            # Update the frame with bounding boxes
-            self.view.camera_widgets[camera_id].update_frame(processed_frame)
+        if self.heatmap is not None:
+            self.heatmap.add(camera_id, detections, processed_frame.shape, capture_time)
+        
+        widget = self.view.camera_widgets.get(camera_id)
+        if widget is None:
+            return
+        
+        # Throttle per tile, and skip tiles nobody can see
+        now = time.monotonic()
+        if now - self.last_display.get(camera_id, 0.0) < self.display_interval:
+            return
+        if not self._is_widget_visible(widget):
+            return
+        self.last_display[camera_id] = now
+        
+        # Scale the frame with bounding boxes to the tile's current size in the background
+        ratio = widget.devicePixelRatioF()
+        self.preview_scaler.submit(processed_frame, camera_id,
+                                   (int(widget.width() * ratio), int(widget.height() * ratio)))
+    
+    def on_preview_ready(self, frame, camera_id):
+        """Show a tile-sized frame"""
+        widget = self.view.camera_widgets.get(camera_id)
+        if widget is not None:
+            widget.update_frame(frame)
+    
+    def _is_widget_visible(self, widget):
+        """True if any part of the tile is on screen"""
+        return (widget.isVisible() and not widget.window().isMinimized()
+                and not widget.visibleRegion().isEmpty())
     
     def update_connection_status(self, camera_id, status):
         """Update connection status for camera widget"""
+        self.startup_report.set_status(camera_id, status)
         if camera_id in self.view.camera_widgets:
             self.view.camera_widgets[camera_id].update_connection_status(status)
     
-    def on_event_detected(self, camera_id, object_type, frame, bbox):
+    def on_event_detected(self, artifact):
         """Handle new object detection event with optimizations"""
-        if camera_id in self.view.camera_widgets:
+        if artifact.camera_id in self.view.camera_widgets:
             # Show notification in camera widget
-            self.view.camera_widgets[camera_id].show_notification(object_type)
+            self.view.camera_widgets[artifact.camera_id].show_notification(artifact.category)
+            
+            # Webhook fields come from the camera widget, so they are gathered here on the GUI thread
+            webhook_fields = self._webhook_fields(artifact) if self.webhook_dispatcher is not None else None
             
-            # Save event image (run in background thread to avoid blocking)
-            self._save_event_image_async(camera_id, object_type, frame, bbox)
+            # Save event image in the background so a burst of events never stalls rendering
+            self.event_sink.submit(artifact, webhook_fields)
     
-    def _save_event_image_async(self, camera_id, object_type, frame, bbox):
-        """Save event image and send webhook in background thread"""
+    def _store_event(self, artifact, db, webhook_fields=None):
+        """Save event image and database row and queue the webhook (runs on an event sink pool thread)
+        
+        The artifact's JPEG bytes were encoded once by the detection thread;
+        the disk write, database row and webhook all reuse them.
+        """
+        camera_id = artifact.camera_id
+        object_type = artifact.category
+        captured_at = artifact.captured_at
+        
+        # Prefer a high-resolution main-stream frame when the camera has one
+        self._apply_snapshot(artifact)
+        
         # Save event image
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        image_path = os.path.join(EVENTS_DIR, f"{camera_id}_{timestamp}_{object_type}.jpg")
+        image_path = artifact.save(EVENTS_DIR)
+        if image_path is None:
+            raise OSError(f"could not write {artifact.filename}")
         
-        # Compression parameters for faster saving
-        encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), JPEG_QUALITY]  # Lower quality for faster saving
+        # Save to database (this thread's connection), keeping the capture time so event age can be measured later
+        # The frame's boxes (already queued by the detection thread) are linked to it in the same transaction
+        event_id = db.add_event(int(camera_id), object_type, image_path, captured_at or None, artifact.detections,
+                                (artifact.shape[1], artifact.shape[0]), len(artifact.jpeg))
+        artifact.event_id = event_id
+        latency_tracker.record_age(camera_id, 'age_at_event', captured_at)
         
-        # Save image with reduced quality
-        cv2.imwrite(image_path, frame, encode_params)
+        # The clip is remuxed from buffered packets once the post-roll has arrived
+        clip_recorder = self.clip_recorders.get(camera_id)
+        if clip_recorder is not None:
+            clip_recorder.request_clip(event_id, captured_at)
         
-        # Save to database
-        self.db.add_event(int(camera_id), object_type, image_path)
-
-        # For Mac with limited resources, don't send webhook immediately for better performance
-        if IS_MAC and not HAS_GPU:
-            # Show notification
-            self.view.show_badge_notification(f"{object_type} detected - saving image", 
-                                              color=DARK_THEME['success'], 
-                                              duration=2000)
-            # Delay webhook sending to reduce system load spikes
-            time.sleep(0.5)
-            
-        # Send webhook notification with bounding box information
-        # self.send_webhook(image_path, object_type, camera_id, bbox)
+        # Send webhook notification with the same image bytes (submit never blocks)
+        if webhook_fields is not None:
+            self.webhook_dispatcher.submit(camera_id, object_type, webhook_fields, artifact.jpeg, artifact.filename)
+    
+    def on_event_stored(self, artifact):
+        """Report a saved event once the sink has written it"""
+        if self.webhook_dispatcher is not None:
+            self.view.show_badge_notification(f"Sending {artifact.category} detection...")
+    
+    def on_event_failed(self, artifact, error):
+        """Report an event that could not be saved"""
+        self.view.show_badge_notification(f"Event not saved ({error[:30]})", 
+                                    color=DARK_THEME['error'], 
+                                    duration=4000)
+    
+    def on_event_dropped(self, artifact):
+        """Report an event refused because the sink's backlog was full"""
+        self.view.show_badge_notification(f"{artifact.category} event dropped (saving backlog full)", 
+                                    color=DARK_THEME['warning'], 
+                                    duration=3000)
     
-    def send_webhook(self, image_path, object_type, camera_id, bbox=None):
-        """Send webhook notification with detected object information and bounding box"""
+    def on_clip_ready(self, camera_id, event_id, clip_path):
+        """Record a finished event clip"""
+        self.db.set_event_clip(event_id, clip_path)
+    
+    def on_segment_closed(self, camera_id, path, start_time, end_time, size_bytes, keyframes):
+        """Index a finished recording segment and enforce the recording size budget"""
+        # Both run on the database writer in order, so the prune sees the new segment
+        self.db.add_recording_segment(int(camera_id), path, start_time, end_time, size_bytes, keyframes)
+        self.db.prune_recordings(RECORDING_MAX_BYTES).add_done_callback(self._remove_recordings)
+    
+    def _remove_recordings(self, future):
+        """Hand the files of pruned recording segments to the thread pool for deletion"""
+        if future.exception() is not None:
+            print(f"Error pruning recordings: {str(future.exception())}")
+            return
+        old_paths = future.result()
+        if old_paths:
+            self.thread_pool.start(lambda: self._remove_files(old_paths))
+    
+    @staticmethod
+    def _remove_files(paths):
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    
+    def _apply_snapshot(self, artifact):
+        """Re-encode the event image from a main-stream snapshot, rescaling the boxes to match"""
+        snapshot_source = self.snapshot_sources.get(artifact.camera_id)
+        if snapshot_source is None:
+            return False
+        
+        snapshot = snapshot_source.capture()
+        if snapshot is None:
+            return False
+        return artifact.replace_frame(snapshot, JPEG_QUALITY)
+    
+    def _webhook_fields(self, artifact):
+        """Build the webhook form fields for an event (GUI thread); None on error
+        
+        The event sink hands these and the artifact's encoded image to the
+        background dispatcher, which owns delivery, retries and coalescing.
+        """
+        camera_id = artifact.camera_id
+        object_type = artifact.category
         try:
-            # Get camera location from the widget
+            # Get camera location from the camera registry (cached, no query per alert)
             latitude = None
             longitude = None
-            
-            # Get location from camera widget or database if available
-            if camera_id in self.view.camera_widgets:
-                widget = self.view.camera_widgets[camera_id]
-                latitude = getattr(widget, 'latitude', None)
-                longitude = getattr(widget, 'longitude', None)
-                
-            # If location not found in widget, try to get from database
-            if not latitude or not longitude:
-                location = self.db.get_camera_location(int(camera_id))
-                if location:
-                    latitude, longitude = location
+            camera = self.db.get_camera(camera_id)
+            if camera is not None:
+                latitude, longitude = camera.location
             
             # If still not found, use defaults
             if not latitude or not longitude:
@@ -206,103 +458,62 @@ class LiveController(QObject):
             detection_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             case_details = f"{object_type} detected on {camera_name} at {detection_time}"
             
-            # Create a notification that we're sending the webhook
-            self.view.show_badge_notification(f"Sending {object_type} detection...")
-            
-            # Add bounding box to the image if provided
-            send_image_path = image_path
-            if bbox is not None:
-                # Create a copy of the image to avoid modifying the original
-                image = cv2.imread(image_path)
-                x, y, w, h = bbox
-                # Draw the bounding box (green rectangle, 2px thickness)
-                cv2.rectangle(image, (x, y), (x+w, y+h), (0, 255, 0), 2)
-                # Create a temporary file for the modified image
-                temp_image_path = os.path.join(os.path.dirname(image_path), 
-                                            f"temp_{os.path.basename(image_path)}")
-                # Save with compression for faster processing
-                cv2.imwrite(temp_image_path, image, [int(cv2.IMWRITE_JPEG_QUALITY), JPEG_QUALITY])
-                # Use the modified image instead
-                send_image_path = temp_image_path
-            
-            # Get the correct MIME type based on file extension
-            mime_type = 'image/jpeg'  # Default for .jpg files
-            if send_image_path.lower().endswith('.png'):
-                mime_type = 'image/png'
-            
-            # Debug info about location being sent
-            print(f"Sending webhook with location: Lat={latitude}, Long={longitude}")
-            
-            # Prepare files and data for multipart/form-data request
-            with open(send_image_path, 'rb') as img_file:
-                files = {
-                    'image': (os.path.basename(send_image_path), img_file, mime_type)
-                }
-                
-                data = {
-                    'latitude': latitude,
-                    'longitude': longitude,
-                    'objectType': animal_type,
-                    'caseDetails': case_details,
-                    'severity': severity
-                }
-                
-                # Set timeout based on hardware (longer for Mac)
-                timeout = 10 if IS_MAC else 5
-                
-                # Send the POST request with authentication headers
-                response = requests.post(
-                    WEBHOOK_URL, 
-                    files=files, 
-                    data=data, 
-                    headers={
-                        'x-webhook-secret': WEBHOOK_SECRET,
-                        'authorization': AUTH_TOKEN
-                    },
-                    timeout=timeout)
-            
-            # Clean up the temporary file if we created one
-            if bbox is not None:
-                try:
-                    os.remove(send_image_path)
-                except:
-                    pass
-            
-            # Show badge notification
-            if response.status_code == 200:
-                # Success notification
-                self.view.show_badge_notification(f"{object_type} alert sent ✓", 
-                                            color=DARK_THEME['success'], 
-                                            duration=3000)
-            else:
-                # Error notification
-                self.view.show_badge_notification(f"Alert failed ({response.status_code})", 
-                                            color=DARK_THEME['error'], 
-                                            duration=4000)
-            
-            return True, response.status_code
-            
-        except requests.RequestException as e:
-            # Network error
-            self.view.show_badge_notification(f"Network error: {str(e)[:30]}...", 
-                                        color=DARK_THEME['error'], 
-                                        duration=4000)
-            return False, str(e)
+            data = {
+                'latitude': latitude,
+                'longitude': longitude,
+                'objectType': animal_type,
+                'caseDetails': case_details,
+                'severity': severity
+            }
+            return data
             
         except Exception as e:
-            # Other error
             self.view.show_badge_notification(f"Error: {str(e)[:30]}...", 
                                         color=DARK_THEME['error'], 
                                         duration=4000)
-            return False, str(e)
+            return None
+    
+    def on_webhook_sent(self, camera_id, object_type, status_code):
+        """Show a success badge once the dispatcher has delivered an alert"""
+        self.view.show_badge_notification(f"{object_type} alert sent ✓", 
+                                    color=DARK_THEME['success'], 
+                                    duration=3000)
+    
+    def on_webhook_failed(self, camera_id, object_type, error):
+        """Show a failure badge; the dispatcher keeps retrying from its outbox"""
+        self.view.show_badge_notification(f"Alert failed ({error[:30]})", 
+                                    color=DARK_THEME['error'], 
+                                    duration=4000)
     
     def cleanup_cameras(self):
         """Clean up camera streams and widgets"""
         for stream in self.camera_streams.values():
             stream.stop()
         self.camera_streams.clear()
+        for snapshot_source in self.snapshot_sources.values():
+            snapshot_source.stop()
+        self.snapshot_sources.clear()
+        for packet_stream in self.packet_streams.values():
+            packet_stream.stop()
+        self.packet_streams.clear()
+        self.clip_recorders.clear()
+        self.camera_specs.clear()
+        self.last_display.clear()
         self.view.clear_camera_widgets()
     
     def cleanup(self):
         """Clean up resources before closing"""
-        self.cleanup_cameras()
\ No newline at end of file
+        self.event_sink.stop()  # Finish saving queued events while snapshot sources are still up
+        self.cleanup_cameras()
+        if INGEST_MODE == 'sharded':
+            from models.capture_shards import stop_capture_shards
+            stop_capture_shards()
+        self.preview_scaler.stop()
+        if self.webhook_dispatcher is not None:
+            self.webhook_dispatcher.stop()
+        if self.retention_manager is not None:
+            self.retention_manager.stop()
+        if self.heatmap is not None:
+            self.heatmap.flush()
+        from models.database_writer import stop_database_writers
+        stop_database_writers()  # Commit whatever is still queued
\ No newline at end of file
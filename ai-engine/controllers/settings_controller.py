@@ -32,7 +32,8 @@ class SettingsController(QObject):
                 camera_info["name"], 
                 camera_info["url"], 
                 camera_info["latitude"], 
-                camera_info["longitude"]
+                camera_info["longitude"],
+                camera_info.get("snapshot_url")
             )
             # Reload list
             self.load_cameras()
@@ -64,7 +65,8 @@ class SettingsController(QObject):
                 updated_info["name"], 
                 updated_info["url"],
                 updated_info["latitude"],
-                updated_info["longitude"]
+                updated_info["longitude"],
+                updated_info.get("snapshot_url")
             )
             # Reload list
             self.load_cameras()
@@ -0,0 +1,95 @@
+"""Measure sustained event inserts per second before and after the database writer
+
+Runs against throwaway databases in a temp directory:
+  - old path: rollback journal, synchronous=FULL, one INSERT + commit per event
+  - writer, blocking: several threads calling Database.add_event (like the event sink's pool threads)
+  - writer, async: one thread queueing Database.add_event_async and waiting on the Futures at the end
+
+Usage: python db_benchmark.py [events] [threads]
+"""
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import tempfile
+import threading
+from models.database import Database
+from models.database_writer import stop_database_writers
+
+
+def old_path(path, events):
+    db = Database(path)  # Creates the schema
+    db.close()
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=DELETE")
+    conn.execute("PRAGMA synchronous=FULL")
+    cursor = conn.cursor()
+    for index in range(events):
+        cursor.execute(
+            "INSERT INTO events (camera_id, object_type, image_path, captured_at) VALUES (?, ?, ?, ?)",
+            (index % 16 + 1, 'Human', f'events/{index}.jpg', time.time())
+        )
+        conn.commit()
+    conn.close()
+
+
+def writer_blocking(path, events, threads):
+    per_thread = events // threads
+
+    def produce(offset):
+        db = Database(path)  # One connection per thread
+        for index in range(offset, offset + per_thread):
+            db.add_event(index % 16 + 1, 'Human', f'events/{index}.jpg', time.time())
+        db.close()
+
+    workers = [threading.Thread(target=produce, args=(n * per_thread,)) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+def writer_async(path, events):
+    db = Database(path)
+    futures = [db.add_event_async(index % 16 + 1, 'Human', f'events/{index}.jpg', time.time())
+               for index in range(events)]
+    for future in futures:
+        future.result()
+    db.close()
+
+
+def count_events(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def main():
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    print(f"Inserting {events} events per run ({threads} threads for the blocking writer run)")
+    print()
+
+    workdir = tempfile.mkdtemp(prefix='db_benchmark_')
+    try:
+        for name, fn, args in [
+            ('old: commit per event', old_path, (events,)),
+            ('writer: add_event, threads', writer_blocking, (events, threads)),
+            ('writer: add_event_async', writer_async, (events,)),
+        ]:
+            path = os.path.join(workdir, name.split(':')[0] + f'_{len(os.listdir(workdir))}.db')
+            start = time.perf_counter()
+            fn(path, *args)
+            elapsed = time.perf_counter() - start
+            stop_database_writers()  # Each run gets a fresh writer
+            written = count_events(path)
+            print(f"  {name:28s} {written:7d} events  {written / elapsed:9.0f} events/s")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
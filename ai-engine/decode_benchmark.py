@@ -0,0 +1,139 @@
+"""Compare decode + downscale paths for the detection pipeline
+
+Generates short synthetic clips with ffmpeg and measures frames per second
+for:
+  - OpenCV decode, resize to MAX_CAMERA_RESOLUTION, then resize again to the detection size (old path)
+  - OpenCV decode, one resize straight to the detection size
+  - ffmpeg decode with the scale filter (plus -lowres for MJPEG) writing detection-size frames
+
+Usage: python decode_benchmark.py [seconds_per_clip]
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+import cv2
+import numpy as np
+from config import FFMPEG_PATH, MAX_CAMERA_RESOLUTION, TARGET_DETECTION_SIZE
+from models.ffmpeg_stream import build_ffmpeg_command, decoder_scaling_args
+
+CLIPS = [
+    ('1080p', (1920, 1080)),
+    ('4MP', (2560, 1440)),
+]
+CODECS = [
+    ('h264', ['-pix_fmt', 'yuv420p', '-c:v', 'libx264', '-preset', 'ultrafast', '-g', '25'], 'mp4'),
+    ('mjpeg', ['-pix_fmt', 'yuvj420p', '-c:v', 'mjpeg', '-q:v', '5'], 'avi'),
+]
+
+
+def make_clip(path, size, codec_args, seconds):
+    width, height = size
+    cmd = [FFMPEG_PATH, '-y', '-loglevel', 'error', '-f', 'lavfi',
+           '-i', f'testsrc2=size={width}x{height}:rate=25', '-t', str(seconds)] + codec_args + [path]
+    subprocess.run(cmd, check=True)
+
+
+def opencv_double_resize(path, output_size):
+    cap = cv2.VideoCapture(path, cv2.CAP_FFMPEG)
+    frames = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        height, width = frame.shape[:2]
+        scale = min(MAX_CAMERA_RESOLUTION[0] / width, MAX_CAMERA_RESOLUTION[1] / height, 1.0)
+        frame = cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+        cv2.resize(frame, output_size)
+        frames += 1
+    cap.release()
+    return frames
+
+
+def opencv_single_resize(path, output_size):
+    cap = cv2.VideoCapture(path, cv2.CAP_FFMPEG)
+    width, height = output_size
+    decode_buffer = None
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frames = 0
+    while True:
+        ret, decode_buffer = cap.read(decode_buffer)
+        if not ret:
+            break
+        cv2.resize(decode_buffer, output_size, dst=frame, interpolation=cv2.INTER_AREA)
+        frames += 1
+    cap.release()
+    return frames
+
+
+def ffmpeg_scaled(path, output_size, source_size, codec):
+    input_args = decoder_scaling_args(source_size, codec, output_size)
+    cmd = build_ffmpeg_command(path, output_size, input_args=input_args)
+    # build_ffmpeg_command loops local files in real time for live testing; decode flat out here
+    cmd = [arg for arg in cmd if arg not in ('-re',)]
+    loop_index = cmd.index('-stream_loop')
+    del cmd[loop_index:loop_index + 2]
+
+    width, height = output_size
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    view = memoryview(frame.reshape(-1))
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0)
+    frames = 0
+    while True:
+        received = 0
+        while received < len(view):
+            count = process.stdout.readinto(view[received:])
+            if not count:
+                break
+            received += count
+        if received < len(view):
+            break
+        frames += 1
+    process.wait()
+    return frames
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    frames = fn(*args)
+    elapsed = time.perf_counter() - start
+    return frames, frames / elapsed if elapsed > 0 else 0.0
+
+
+def main():
+    seconds = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    if shutil.which(FFMPEG_PATH) is None:
+        print(f"ffmpeg not found at '{FFMPEG_PATH}', set FFMPEG_PATH in config.py")
+        return
+
+    output_size = TARGET_DETECTION_SIZE
+    print(f"Detection size: {output_size[0]}x{output_size[1]}, old intermediate size: {MAX_CAMERA_RESOLUTION}")
+    print(f"OpenCV threads: {cv2.getNumThreads()}")
+    print()
+
+    workdir = tempfile.mkdtemp(prefix='decode_benchmark_')
+    try:
+        for label, source_size in CLIPS:
+            for codec, codec_args, extension in CODECS:
+                path = os.path.join(workdir, f'{label}_{codec}.{extension}')
+                make_clip(path, source_size, codec_args, seconds)
+                print(f"=== {label} {codec} ({source_size[0]}x{source_size[1]}) ===")
+                for name, fn, args in [
+                    ('opencv, resize twice', opencv_double_resize, (path, output_size)),
+                    ('opencv, resize once', opencv_single_resize, (path, output_size)),
+                    ('ffmpeg, scaled at decode', ffmpeg_scaled, (path, output_size, source_size, codec)),
+                ]:
+                    frames, fps = timed(fn, *args)
+                    print(f"  {name:26s} {frames:5d} frames  {fps:7.1f} fps")
+                decoder_args = decoder_scaling_args(source_size, codec, output_size)
+                if decoder_args:
+                    print(f"  decoder scaling: {' '.join(decoder_args)}")
+                print()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Export events with camera names and detection boxes as NDJSON or CSV
+
+Events are streamed from the database one page at a time, oldest first,
+so memory use stays flat however many rows match and the database writer
+is never blocked. The resume cursor is printed when the export ends (also
+on Ctrl+C); pass it back with --cursor and --append to continue.
+
+Usage: python export_events.py [--format ndjson|csv] [--output FILE] [--since TIME] [--until TIME]
+                               [--camera ID] [--category NAME ...] [--cursor CURSOR] [--append]
+TIME is epoch seconds or 'YYYY-MM-DD HH:MM:SS' (UTC)
+"""
+import sys
+import argparse
+from config import DB_PATH
+from models.database import Database
+from models.event_export import EXPORT_FORMATS, export_events, format_cursor, parse_cursor
+
+
+def time_value(text):
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export events as NDJSON or CSV")
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='ndjson')
+    parser.add_argument('--output', help="output file (default: standard output)")
+    parser.add_argument('--since', type=time_value, help="first event time")
+    parser.add_argument('--until', type=time_value, help="last event time")
+    parser.add_argument('--camera', type=int, help="camera id")
+    parser.add_argument('--category', action='append', help="object type (repeatable)")
+    parser.add_argument('--cursor', type=parse_cursor, help="resume after this cursor")
+    parser.add_argument('--append', action='store_true', help="append to --output (no CSV header)")
+    parser.add_argument('--db', default=DB_PATH)
+    args = parser.parse_args()
+
+    db = Database(args.db)
+    output = open(args.output, 'a' if args.append else 'w', newline='') if args.output else sys.stdout
+    cursor = args.cursor
+    count = 0
+    try:
+        for cursor in export_events(db, output, args.format, args.cursor, header=not args.append,
+                                    camera_id=args.camera, categories=args.category,
+                                    start_time=args.since, end_time=args.until):
+            count += 1
+    except KeyboardInterrupt:
+        print("Interrupted", file=sys.stderr)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        db.close()
+    print(f"Exported {count} events", file=sys.stderr)
+    if cursor is not None:
+        print(f"Resume with: --cursor '{format_cursor(cursor)}' --append", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
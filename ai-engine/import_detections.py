@@ -0,0 +1,33 @@
+"""One-time import of det_*_metadata.json sidecar files into the detections table
+
+Sidecars written before detections were stored in SQLite (by DetectionThread
+and run_detection.py) are read once and bulk inserted. Already imported
+files are skipped, so it is safe to run again.
+
+Usage: python import_detections.py [directory ...]   (default: api-backend/events events)
+"""
+import os
+import sys
+from models.database import Database
+from models.database_writer import stop_database_writers
+
+DEFAULT_DIRECTORIES = ['api-backend/events', 'events']
+
+
+def main():
+    directories = sys.argv[1:] or DEFAULT_DIRECTORIES
+    db = Database()
+    try:
+        for directory in directories:
+            if not os.path.isdir(directory):
+                print(f"{directory}: not found, skipped")
+                continue
+            files, rows = db.import_detection_sidecars(directory)
+            print(f"{directory}: imported {rows} detections from {files} sidecar files")
+    finally:
+        stop_database_writers()
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
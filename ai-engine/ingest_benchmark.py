@@ -0,0 +1,99 @@
+"""Compare the 'pooled' and 'sharded' ingest modes as seen by the inference process
+
+Generates a synthetic clip with ffmpeg, feeds it to N cameras (played back
+in real time and looped, like a live camera) and measures for each mode:
+  - frames delivered to this process per second
+  - CPU time this process spent per delivered frame (the GIL budget left for inference)
+  - frame age on delivery (capture to consumer)
+
+Usage: python ingest_benchmark.py [cameras] [seconds]
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+import subprocess
+from config import FFMPEG_PATH, TARGET_DETECTION_SIZE
+from models.ingest_loop import IngestLoop, PooledStream
+from models.capture_shards import CaptureShards, ShardedStream
+
+
+def make_clip(path, seconds=10):
+    cmd = [FFMPEG_PATH, '-y', '-loglevel', 'error', '-f', 'lavfi', '-i', 'testsrc2=size=1920x1080:rate=25',
+           '-t', str(seconds), '-pix_fmt', 'yuv420p', '-c:v', 'libx264', '-preset', 'ultrafast', '-g', '25', path]
+    subprocess.run(cmd, check=True)
+
+
+def measure(streams, seconds):
+    lock = threading.Lock()
+    stats = {'frames': 0, 'age': 0.0}
+
+    def on_frame(frame, camera_id, frame_ref):
+        # Consumers retain the ref, read the frame, then release it
+        if not frame_ref.retain():
+            return
+        try:
+            frame.sum(dtype='uint64')
+            age = time.time() - frame_ref.timestamp
+        finally:
+            frame_ref.release()
+        with lock:
+            stats['frames'] += 1
+            stats['age'] += age
+
+    for stream in streams:
+        stream.frame_ready.connect(on_frame)
+        stream.start()
+    time.sleep(5)  # Connect and warm up
+    with lock:
+        stats['frames'] = 0
+        stats['age'] = 0.0
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    time.sleep(seconds)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    with lock:
+        frames, age = stats['frames'], stats['age']
+    for stream in streams:
+        stream.stop()
+    return frames / elapsed, cpu / frames * 1000 if frames else 0.0, age / frames * 1000 if frames else 0.0
+
+
+def main():
+    cameras = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    seconds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    if shutil.which(FFMPEG_PATH) is None:
+        print(f"ffmpeg not found at '{FFMPEG_PATH}', set FFMPEG_PATH in config.py")
+        return
+
+    workdir = tempfile.mkdtemp(prefix='ingest_benchmark_')
+    try:
+        path = os.path.join(workdir, 'clip.mp4')
+        make_clip(path)
+        print(f"{cameras} cameras, 1080p h264 at 25 fps scaled to {TARGET_DETECTION_SIZE[0]}x{TARGET_DETECTION_SIZE[1]}, "
+              f"{seconds}s per mode")
+
+        loop = IngestLoop()
+        loop.start()
+        streams = [PooledStream(str(index), path, loop=loop, output_size=TARGET_DETECTION_SIZE)
+                   for index in range(cameras)]
+        results = [('pooled', measure(streams, seconds))]
+        loop.stop()
+
+        shards = CaptureShards()
+        streams = [ShardedStream(str(index), path, shards=shards, output_size=TARGET_DETECTION_SIZE)
+                   for index in range(cameras)]
+        results.append((f'sharded ({len(shards.shard_report())} workers)', measure(streams, seconds)))
+        shards.stop()
+
+        for name, (fps, cpu_ms, age_ms) in results:
+            print(f"  {name:22s} {fps:7.1f} frames/s  {cpu_ms:6.2f} ms CPU/frame  {age_ms:6.1f} ms frame age")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,26 @@
-from models.database import Database
-from models.rtsp_stream import RTSPStream
-from models.detection import DetectionThread
+import importlib
 
-__all__ = ['Database', 'RTSPStream', 'DetectionThread']
\ No newline at end of file
+# Submodules are imported on first attribute access: capture shard workers are
+# spawned processes that unpickle models.capture_shards.run_shard, and must not
+# load the detection stack (ultralytics/torch) or OpenCV just to run an IngestLoop
+_EXPORTS = {
+    'Database': 'models.database',
+    'RTSPStream': 'models.rtsp_stream',
+    'FFmpegStream': 'models.ffmpeg_stream',
+    'IngestLoop': 'models.ingest_loop',
+    'PooledStream': 'models.ingest_loop',
+    'CaptureShards': 'models.capture_shards',
+    'ShardedStream': 'models.capture_shards',
+    'DetectionThread': 'models.detection',
+    'EventArtifact': 'models.event_artifact',
+}
+
+__all__ = ['Database', 'RTSPStream', 'FFmpegStream', 'IngestLoop', 'PooledStream', 'CaptureShards', 'ShardedStream',
+           'DetectionThread', 'EventArtifact']
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module 'models' has no attribute {name!r}")
+    return getattr(importlib.import_module(module), name)
@@ -0,0 +1,81 @@
+import os
+import time
+import threading
+from config import DB_CAMERA_CACHE_TTL
+
+
+class Camera:
+    """One row of the cameras table"""
+    __slots__ = ('id', 'name', 'rtsp_url', 'enabled', 'latitude', 'longitude', 'snapshot_url')
+
+    def __init__(self, id, name, rtsp_url, enabled=1, latitude=None, longitude=None, snapshot_url=None):
+        self.id = id
+        self.name = name
+        self.rtsp_url = rtsp_url
+        self.enabled = enabled
+        self.latitude = latitude
+        self.longitude = longitude
+        self.snapshot_url = snapshot_url
+
+    @property
+    def location(self):
+        """(latitude, longitude), like Database.get_camera_location"""
+        return self.latitude, self.longitude
+
+    def as_row(self):
+        """The tuple Database.get_cameras returns: (id, name, rtsp_url, enabled, latitude, longitude)"""
+        return self.id, self.name, self.rtsp_url, self.enabled, self.latitude, self.longitude
+
+
+class CameraRegistry:
+    """Camera rows for one database file, loaded once and shared by every connection
+
+    Database reads cameras from here and reloads them (through its own
+    connection) after invalidate(), which its camera writes call, and once
+    the rows are older than ttl seconds, so edits made by another process
+    (the API backend, a second app instance) show up within that time.
+    The loaded mapping is never modified, only replaced, so readers on any
+    thread can use it without locking. A load that raced with a write is
+    discarded instead of caching stale rows.
+    """
+    COLUMNS = "id, name, rtsp_url, enabled, latitude, longitude, snapshot_url"
+
+    def __init__(self, ttl=DB_CAMERA_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._cached = None  # (camera id -> Camera, expiry), None until loaded or after a write
+        self._generation = 0  # Bumped by every invalidate()
+
+    def cameras(self, cursor):
+        """{camera_id: Camera}, loading the cameras table with cursor if needed"""
+        cached = self._cached
+        if cached is not None and time.monotonic() < cached[1]:
+            return cached[0]
+        with self._lock:
+            generation = self._generation
+        cursor.execute(f"SELECT {self.COLUMNS} FROM cameras ORDER BY id")
+        cameras = {row[0]: Camera(*row) for row in cursor.fetchall()}
+        with self._lock:
+            if generation == self._generation:
+                self._cached = (cameras, time.monotonic() + self.ttl)
+        return cameras
+
+    def invalidate(self):
+        """Drop the cached rows after a camera was added, changed or deleted"""
+        with self._lock:
+            self._generation += 1
+            self._cached = None
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_camera_registry(db_path):
+    """Return the process-wide registry for a database file"""
+    key = os.path.abspath(db_path)
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            registry = _registries[key] = CameraRegistry()
+        return registry
@@ -0,0 +1,411 @@
+import os
+import time
+import signal
+import itertools
+import threading
+import multiprocessing
+from multiprocessing.connection import wait
+import numpy as np
+from PyQt6.QtCore import QObject, pyqtSignal
+from config import (CAPTURE_SHARDS, INGEST_MAX_FPS, FRAME_RING_SLOTS,
+                    CAMERA_RECONNECT_DELAY, CAMERA_RECONNECT_MAX_DELAY)
+from models.frame_ring import FrameRing, FrameRef, HEADER_SEQ
+
+MAX_MESSAGES_PER_WAKE = 64  # Keep one busy worker from starving the others
+
+
+def run_shard(shard_index, command_conn, event_conn, max_fps):
+    """Entry point of a capture worker process
+
+    Runs an IngestLoop for the cameras the parent assigns. Frames land in
+    shared-memory FrameRings; only (camera, slot, seq, time, pts) tuples
+    cross the pipe back to the parent. Each announced slot stays referenced
+    here until the parent sends it back with a 'release' command.
+    """
+    from models.ingest_loop import IngestLoop  # Imported in the worker, after spawn
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C is handled by the parent
+    rings = {}
+    ring_names = itertools.count()
+    send_lock = threading.Lock()
+
+    def send(message):
+        with send_lock:
+            event_conn.send(message)
+
+    def ring_factory(camera_id, shape):
+        old = rings.pop(camera_id, None)
+        if old is not None:
+            old.close()
+        ring = FrameRing(shape, FRAME_RING_SLOTS, name=f"dn{os.getpid()}_{camera_id}_{next(ring_names)}")
+        rings[camera_id] = ring
+        send(('ring', camera_id, ring.name, ring.shape, ring.slots))
+        return ring
+
+    def on_frame(camera_id, frame, frame_ref):
+        if frame_ref.retain():  # Lent to the parent until it sends the slot back
+            send(('frame', camera_id, frame_ref.slot, frame_ref.seq, frame_ref.timestamp, frame_ref.pts))
+
+    def on_status(camera_id, status):
+        send(('status', camera_id, status))
+
+    loop = IngestLoop(ring_factory=ring_factory, max_fps=max_fps)
+    loop.start()
+    print(f"Capture shard {shard_index} started (pid {os.getpid()})")
+    try:
+        while True:
+            try:
+                command = command_conn.recv()
+            except EOFError:
+                break  # Parent went away
+            if command is None:
+                break
+            kind, camera_id, spec = command
+            if kind == 'add':
+                url, max_resolution, output_size = spec
+                loop.add_camera(camera_id, url, max_resolution, on_frame, on_status, output_size)
+            elif kind == 'remove':
+                loop.remove_camera(camera_id)
+            elif kind == 'release':
+                name, slot = spec
+                ring = rings.get(camera_id)
+                if ring is not None and ring.name == name:
+                    ring.release(slot)
+    finally:
+        loop.stop()
+        for ring in rings.values():
+            ring.close()
+
+
+class _LentRing(FrameRing):
+    """Parent-side attachment to a worker's shared ring whose slots the worker lends out
+
+    lend() takes over a slot the worker announced and keeps it as the
+    latest frame until the next one arrives; consumers retain and release
+    it as with a local ring. When the last reference goes, the slot is
+    handed back (on_return) and cannot be retained again until the worker
+    lends it anew, so it is never read while the worker rewrites it.
+    """
+    def __init__(self, shape, slots, name, on_return):
+        super().__init__(shape, slots, name=name, create=False)
+        self._lent = [False] * self.slots
+        self._on_return = on_return
+
+    def lend(self, slot, seq, timestamp, pts):
+        """Take over an announced slot; returns its FrameRef, or None if the ring is closed"""
+        returned = []
+        with self._lock:
+            if self._header is None or int(self._header[slot, HEADER_SEQ]) != seq:
+                return None
+            self._lent[slot] = True
+            self._refcount[slot] += 1  # Held while it is the latest frame
+            previous, self._latest = self._latest, slot
+            if previous >= 0:
+                self._drop(previous, returned)
+        for returned_slot in returned:
+            self._on_return(returned_slot)
+        return FrameRef(self, slot, seq, timestamp, pts)
+
+    def retain(self, slot, seq=None):
+        with self._lock:
+            if self._header is None or not self._lent[slot]:
+                return False
+            if seq is not None and int(self._header[slot, HEADER_SEQ]) != seq:
+                return False
+            self._refcount[slot] += 1
+            return True
+
+    def release(self, slot):
+        returned = []
+        with self._lock:
+            self._drop(slot, returned)
+        for returned_slot in returned:
+            self._on_return(returned_slot)
+
+    def _drop(self, slot, returned):
+        if self._refcount[slot] > 0:
+            self._refcount[slot] -= 1
+            if self._refcount[slot] == 0 and self._lent[slot]:
+                self._lent[slot] = False
+                returned.append(slot)
+
+    def latest_frame(self):
+        with self._lock:
+            return self._frames[self._latest] if self._header is not None and self._latest >= 0 else None
+
+    def close(self, unlink=None):
+        with self._lock:
+            super().close(unlink)
+
+
+class _Shard:
+    """Parent-side bookkeeping for one capture worker process"""
+    __slots__ = ('index', 'process', 'command_conn', 'event_conn', 'cameras',
+                 'started_at', 'restart_at', 'crashes')
+
+    def __init__(self, index):
+        self.index = index
+        self.process = None
+        self.command_conn = None
+        self.event_conn = None
+        self.cameras = {}  # camera_id -> (url, max_resolution, output_size)
+        self.started_at = 0.0
+        self.restart_at = 0.0  # Non-zero while a restart is pending
+        self.crashes = 0
+
+
+class CaptureShards:
+    """Splits camera capture across worker processes feeding this (inference) process
+
+    Each worker decodes and scales its slice of the cameras with an
+    IngestLoop, outside this process's GIL. One reader thread here waits on
+    all worker pipes and hands each announced shared-memory slot straight
+    to the camera's ShardedStream (no copy); the slot goes back to its
+    worker once every consumer has released it. Workers that die are
+    restarted with backoff and get their cameras back.
+    """
+    def __init__(self, shard_count=CAPTURE_SHARDS, max_fps=INGEST_MAX_FPS):
+        self.max_fps = max_fps
+        # Spawn, not fork: the parent runs Qt and inference threads
+        self._context = multiprocessing.get_context('spawn')
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()  # Slot returns come from consumer threads
+        self._handles = {}  # camera_id -> ShardedStream
+        self._assignment = {}  # camera_id -> _Shard
+        self._rings = {}  # camera_id -> _LentRing attached to the worker's shared ring
+        self._shards = [_Shard(index) for index in range(max(1, shard_count))]
+        self.is_running = True
+        for shard in self._shards:
+            self._start_shard(shard)
+        self._thread = threading.Thread(target=self._run, daemon=True, name='capture-shards')
+        self._thread.start()
+
+    # Public API
+
+    def add_camera(self, handle):
+        """Assign a camera to the least loaded worker"""
+        with self._lock:
+            self._remove_locked(handle.camera_id)
+            shard = min(self._shards, key=lambda candidate: len(candidate.cameras))
+            spec = (handle.rtsp_url, handle.max_resolution, handle.output_size)
+            shard.cameras[handle.camera_id] = spec
+            self._handles[handle.camera_id] = handle
+            self._assignment[handle.camera_id] = shard
+            self._send(shard, ('add', handle.camera_id, spec))
+
+    def remove_camera(self, camera_id):
+        with self._lock:
+            self._remove_locked(camera_id)
+
+    def stop(self):
+        """Stop every worker and release shared memory"""
+        self.is_running = False
+        self._thread.join(2)
+        with self._lock:
+            for shard in self._shards:
+                self._send(shard, None)
+            for shard in self._shards:
+                if shard.process is not None:
+                    shard.process.join(2)
+                    if shard.process.is_alive():
+                        shard.process.terminate()
+            for camera_id in list(self._rings):
+                self._release_rings(camera_id, unlink=True)
+
+    def shard_report(self):
+        """Snapshot of worker state: {shard index: (pid, alive, camera count, crashes)}"""
+        with self._lock:
+            return {
+                shard.index: (shard.process.pid if shard.process else None,
+                              bool(shard.process and shard.process.is_alive()),
+                              len(shard.cameras), shard.crashes)
+                for shard in self._shards
+            }
+
+    # Internals
+
+    def _remove_locked(self, camera_id):
+        shard = self._assignment.pop(camera_id, None)
+        self._handles.pop(camera_id, None)
+        if shard is not None:
+            shard.cameras.pop(camera_id, None)
+            self._send(shard, ('remove', camera_id, None))
+        self._release_rings(camera_id)
+
+    def _send(self, shard, command):
+        command_conn = shard.command_conn
+        if command_conn is None:
+            return  # Worker is down; its cameras are re-sent on restart
+        try:
+            with self._send_lock:
+                command_conn.send(command)
+        except (OSError, EOFError):
+            pass
+
+    def _return_slot(self, camera_id, name, slot):
+        """Give a released slot back to the worker that lent it"""
+        shard = self._assignment.get(camera_id)
+        if shard is not None:
+            self._send(shard, ('release', camera_id, (name, slot)))
+
+    def _start_shard(self, shard):
+        command_reader, command_writer = self._context.Pipe(duplex=False)
+        event_reader, event_writer = self._context.Pipe(duplex=False)
+        process = self._context.Process(target=run_shard, name=f'capture-shard-{shard.index}',
+                                        args=(shard.index, command_reader, event_writer, self.max_fps),
+                                        daemon=True)
+        process.start()
+        # Only the worker keeps these ends, so a dead worker shows up as EOF here
+        command_reader.close()
+        event_writer.close()
+        shard.process = process
+        shard.command_conn = command_writer
+        shard.event_conn = event_reader
+        shard.started_at = time.monotonic()
+        shard.restart_at = 0.0
+        for camera_id, spec in shard.cameras.items():
+            self._send(shard, ('add', camera_id, spec))
+
+    def _run(self):
+        while self.is_running:
+            connections = {shard.event_conn: shard for shard in self._shards if shard.event_conn is not None}
+            for conn in wait(list(connections), timeout=0.5):
+                shard = connections[conn]
+                try:
+                    for _ in range(MAX_MESSAGES_PER_WAKE):
+                        self._dispatch(conn.recv())
+                        if not conn.poll():
+                            break
+                except (EOFError, OSError):
+                    conn.close()
+                    shard.event_conn = None
+                except Exception as e:
+                    print(f"Error handling capture shard {shard.index} message: {str(e)}")
+            self._check_shards(time.monotonic())
+
+    def _dispatch(self, message):
+        kind, camera_id = message[0], message[1]
+        handle = self._handles.get(camera_id)
+        if handle is None:
+            return
+
+        if kind == 'frame':
+            _, _, slot, seq, timestamp, pts = message
+            ring = self._rings.get(camera_id)
+            frame_ref = ring.lend(slot, seq, timestamp, pts) if ring is not None else None
+            if frame_ref is None:
+                return
+            handle._deliver(ring.view(slot), frame_ref)
+        elif kind == 'ring':
+            _, _, name, shape, slots = message
+            with self._lock:
+                self._release_rings(camera_id)
+                self._rings[camera_id] = _LentRing(
+                    shape, slots, name, lambda slot: self._return_slot(camera_id, name, slot))
+        elif kind == 'status':
+            handle.connection_status.emit(camera_id, message[2])
+
+    def _release_rings(self, camera_id, unlink=False):
+        ring = self._rings.pop(camera_id, None)
+        if ring is not None:
+            ring.close(unlink=unlink)
+
+    def _check_shards(self, now):
+        """Restart dead workers with exponential backoff"""
+        for shard in self._shards:
+            if shard.restart_at:
+                if now >= shard.restart_at and self.is_running:
+                    print(f"Restarting capture shard {shard.index}")
+                    with self._lock:
+                        self._start_shard(shard)
+                continue
+            if shard.process is not None and shard.process.is_alive() and shard.event_conn is not None:
+                continue
+
+            # Crash loops back off; a worker that ran for a while starts over
+            if now - shard.started_at > CAMERA_RECONNECT_MAX_DELAY:
+                shard.crashes = 0
+            shard.crashes += 1
+            delay = min(CAMERA_RECONNECT_MAX_DELAY, CAMERA_RECONNECT_DELAY * 2 ** (shard.crashes - 1))
+            exitcode = None
+            if shard.process is not None:
+                shard.process.join(0.5)  # Reap it so the exit code is known
+                exitcode = shard.process.exitcode
+            print(f"Capture shard {shard.index} exited (code {exitcode}), restarting in {delay:.0f}s")
+
+            with self._lock:
+                if shard.process is not None and shard.process.is_alive():
+                    shard.process.terminate()
+                if shard.command_conn is not None:
+                    shard.command_conn.close()
+                    shard.command_conn = None
+                if shard.event_conn is not None:
+                    shard.event_conn.close()
+                    shard.event_conn = None
+                # The worker cannot unlink its rings any more; do it for it
+                for camera_id in shard.cameras:
+                    self._release_rings(camera_id, unlink=True)
+                handles = [self._handles.get(camera_id) for camera_id in shard.cameras]
+            for handle in handles:
+                if handle is not None:
+                    handle.connection_status.emit(handle.camera_id, "Reconnecting...")
+            shard.restart_at = now + delay
+
+
+_capture_shards = None
+_capture_shards_lock = threading.Lock()
+
+
+def get_capture_shards():
+    """Return the process-wide capture shard pool, starting it on first use"""
+    global _capture_shards
+    with _capture_shards_lock:
+        if _capture_shards is None or not _capture_shards.is_running:
+            _capture_shards = CaptureShards()
+        return _capture_shards
+
+
+def stop_capture_shards():
+    """Stop the capture shard pool if it was started"""
+    global _capture_shards
+    with _capture_shards_lock:
+        if _capture_shards is not None:
+            _capture_shards.stop()
+            _capture_shards = None
+
+
+class ShardedStream(QObject):
+    """Camera handle captured in a worker process; a drop-in for RTSPStream in LiveController"""
+    frame_ready = pyqtSignal(np.ndarray, str, object)  # frame (shared ring view), camera_id, FrameRef
+    connection_status = pyqtSignal(str, str)  # camera_id, status
+
+    def __init__(self, camera_id, rtsp_url, queue_size=64, max_resolution=(1280, 720), shards=None,
+                 output_size=None):
+        super().__init__()
+        self.camera_id = camera_id
+        self.rtsp_url = rtsp_url
+        self.queue_size = queue_size  # Kept for interface parity with RTSPStream
+        self.max_resolution = max_resolution
+        self.output_size = output_size
+        self.shards = shards
+        self.frame_ring = None
+
+    @property
+    def last_frame(self):
+        """Most recent frame as a zero-copy view of the shared ring, or None"""
+        return self.frame_ring.latest_frame() if self.frame_ring else None
+
+    def _deliver(self, frame, frame_ref):
+        self.frame_ring = frame_ref.ring
+        self.frame_ready.emit(frame, self.camera_id, frame_ref)
+
+    def start(self):
+        """Hand the camera to a capture worker"""
+        if self.shards is None:
+            self.shards = get_capture_shards()
+        self.shards.add_camera(self)
+
+    def stop(self):
+        """Take the camera off its worker"""
+        if self.shards is not None:
+            self.shards.remove_camera(self.camera_id)
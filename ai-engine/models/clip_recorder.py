@@ -0,0 +1,163 @@
+import os
+import time
+from collections import deque
+from datetime import datetime
+from queue import Queue, Empty
+from PyQt6.QtCore import QObject, pyqtSignal
+from config import CLIPS_DIR, CLIP_PRE_SECONDS, CLIP_POST_SECONDS, CLIP_MAX_SECONDS
+from models.packet_stream import av, add_stream_copy, mux_packet
+from models.event_artifact import dated_directory
+
+
+class PacketRing:
+    """Rolling buffer of compressed packets, trimmed on GOP boundaries
+
+    The buffer always starts on a keyframe and reaches back at least
+    `seconds`, so a clip cut from it decodes from its first packet.
+    """
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self._gops = deque()  # Each GOP is a list of packets starting with a keyframe
+
+    def append(self, packet):
+        if packet.is_keyframe:
+            self._gops.append([packet])
+            # Drop the oldest GOP while the next one still reaches back far enough
+            horizon = packet.wall_time - self.seconds
+            while len(self._gops) > 1 and self._gops[1][0].wall_time <= horizon:
+                self._gops.popleft()
+        elif self._gops:
+            self._gops[-1].append(packet)
+        # Packets before the first keyframe cannot be decoded on their own; drop them
+
+    def packets_since(self, wall_time):
+        """Packets from the last keyframe at or before wall_time (or the oldest buffered one) onwards"""
+        start = 0
+        for index, gop in enumerate(self._gops):
+            if gop[0].wall_time > wall_time:
+                break
+            start = index
+        return [packet for gop in list(self._gops)[start:] for packet in gop]
+
+    def clear(self):
+        self._gops.clear()
+
+
+class _ClipJob:
+    """A clip being collected: pre-roll from the ring plus packets until end_time"""
+    __slots__ = ('event_ids', 'start_time', 'end_time', 'packets')
+
+    def __init__(self, event_id, start_time, end_time, packets):
+        self.event_ids = [event_id]
+        self.start_time = start_time
+        self.end_time = end_time
+        self.packets = packets
+
+
+class ClipRecorder(QObject):
+    """PacketStream consumer that remuxes event clips without re-encoding
+
+    Keeps the last few seconds of packets in a PacketRing. request_clip()
+    cuts pre-roll from the ring at the GOP boundary before the event, keeps
+    appending packets for the post-roll, then writes them straight into an
+    MP4. Events that arrive during a clip's post-roll extend that clip
+    instead of starting a new one.
+    """
+    clip_ready = pyqtSignal(str, int, str)  # camera_id, event_id, clip path
+
+    def __init__(self, camera_id, pre_seconds=CLIP_PRE_SECONDS, post_seconds=CLIP_POST_SECONDS,
+                 max_seconds=CLIP_MAX_SECONDS):
+        super().__init__()
+        self.camera_id = camera_id
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.max_seconds = max_seconds
+        self.packet_ring = PacketRing(pre_seconds)
+        self._requests = Queue()
+        self._job = None
+        self._stream = None  # Input video stream, the template for clip output streams
+
+    def request_clip(self, event_id, captured_at=None):
+        """Ask for a clip around an event; safe to call from any thread"""
+        self._requests.put((event_id, captured_at or time.time()))
+
+    # PacketStream consumer interface (called on the demux thread)
+
+    def on_stream_opened(self, stream):
+        self._stream = stream
+
+    def on_packet(self, packet):
+        self._drain_requests()
+        self.packet_ring.append(packet)
+        if self._job is not None:
+            self._job.packets.append(packet)
+            if packet.wall_time >= self._job.end_time:
+                self._finish_job()
+
+    def on_stream_closed(self):
+        self._finish_job()  # Keep whatever was collected before the stream dropped
+        self.packet_ring.clear()
+        self._stream = None
+
+    def _drain_requests(self):
+        while True:
+            try:
+                event_id, captured_at = self._requests.get_nowait()
+            except Empty:
+                return
+
+            job = self._job
+            if job is not None and captured_at <= job.end_time:
+                # Overlapping event: share the clip and extend its post-roll (bounded)
+                job.event_ids.append(event_id)
+                job.end_time = min(max(job.end_time, captured_at + self.post_seconds),
+                                   job.start_time + self.max_seconds)
+                continue
+
+            self._finish_job()
+            start_time = captured_at - self.pre_seconds
+            self._job = _ClipJob(event_id, start_time, captured_at + self.post_seconds,
+                                 self.packet_ring.packets_since(start_time))
+
+    def _finish_job(self):
+        """Write the current clip (if any) and report it for each of its events"""
+        job, self._job = self._job, None
+        if job is None:
+            return
+        clip_path = self._write_clip(job)
+        if clip_path is None:
+            return
+        for event_id in job.event_ids:
+            self.clip_ready.emit(self.camera_id, event_id, clip_path)
+
+    def _write_clip(self, job):
+        """Remux the job's packets into an MP4 without re-encoding; returns the path or None"""
+        packets = job.packets
+        # A clip has to open on a keyframe
+        while packets and not packets[0].is_keyframe:
+            packets = packets[1:]
+        if not packets or self._stream is None:
+            print(f"Camera {self.camera_id}: no video buffered for event {job.event_ids[0]}, clip skipped")
+            return None
+
+        timestamp = datetime.fromtimestamp(job.start_time).strftime("%Y%m%d_%H%M%S")
+        first = packets[0]
+        offset = first.dts if first.dts is not None else first.pts or 0  # Clip timestamps start at zero
+
+        clip_path = None
+        try:
+            clip_path = os.path.join(dated_directory(CLIPS_DIR, job.start_time),
+                                     f"{self.camera_id}_{timestamp}_{job.event_ids[0]}.mp4")
+            with av.open(clip_path, 'w') as output:
+                output_stream = add_stream_copy(output, self._stream)
+                for buffered in packets:
+                    mux_packet(output, output_stream, buffered, self._stream.time_base, offset)
+        except Exception as e:
+            print(f"Error writing clip for camera {self.camera_id}: {str(e)}")
+            if clip_path is not None and os.path.exists(clip_path):
+                os.remove(clip_path)
+            return None
+
+        duration = packets[-1].wall_time - packets[0].wall_time
+        print(f"Camera {self.camera_id}: saved {duration:.1f}s clip {clip_path} ({len(packets)} packets)")
+        return clip_path
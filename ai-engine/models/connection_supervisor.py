@@ -0,0 +1,135 @@
+import random
+import threading
+import time
+from config import (CAMERA_RECONNECT_DELAY, CAMERA_RECONNECT_MAX_DELAY,
+                    CAMERA_MAX_CONCURRENT_CONNECTS, CAMERA_STABLE_SECONDS)
+
+
+class CameraHealth:
+    """Connection bookkeeping for one camera"""
+    __slots__ = ('camera_id', 'consecutive_failures', 'total_failures', 'total_connects',
+                 'score', 'connected', 'connected_at', 'last_error', 'last_change')
+
+    def __init__(self, camera_id):
+        self.camera_id = camera_id
+        self.consecutive_failures = 0
+        self.total_failures = 0
+        self.total_connects = 0
+        self.score = 1.0  # Exponentially weighted success rate, 1.0 = healthy
+        self.connected = False
+        self.connected_at = 0.0  # Monotonic time of the last successful connect
+        self.last_error = None
+        self.last_change = time.time()
+
+
+class ConnectionSupervisor:
+    """Central coordinator for camera connection attempts
+
+    Caps how many cameras may be opening a connection at once, and hands out
+    exponential backoff delays with jitter so a switch reboot does not make
+    every camera reconnect in lockstep. Offline cameras just sleep on an event
+    between attempts. The backoff only starts over once a connection has
+    stayed up for stable_seconds (streams drop connections that stop
+    delivering frames), so a camera that accepts the connection and then
+    fails right away keeps backing off.
+    """
+    def __init__(self, max_concurrent=CAMERA_MAX_CONCURRENT_CONNECTS,
+                 base_delay=CAMERA_RECONNECT_DELAY, max_delay=CAMERA_RECONNECT_MAX_DELAY,
+                 stable_seconds=CAMERA_STABLE_SECONDS):
+        self.max_concurrent = max(1, max_concurrent)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stable_seconds = stable_seconds
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        self._lock = threading.Lock()
+        self._health = {}
+
+    def _get_health(self, camera_id):
+        with self._lock:
+            health = self._health.get(camera_id)
+            if health is None:
+                health = self._health[camera_id] = CameraHealth(camera_id)
+            return health
+
+    def connect(self, camera_id, open_fn, stop_event):
+        """Run open_fn while holding a connection slot; returns its result or None"""
+        # Wait for a free slot, but give up promptly if the stream is being stopped
+        while not self._slots.acquire(timeout=0.5):
+            if stop_event.is_set():
+                return None
+        try:
+            if stop_event.is_set():
+                return None
+            result = open_fn()
+        except Exception as e:
+            print(f"Camera {camera_id}: connection attempt failed: {str(e)}")
+            result = None
+        finally:
+            self._slots.release()
+
+        if result is None:
+            self.record_failure(camera_id, "open failed")
+        else:
+            self.record_success(camera_id)
+        return result
+
+    def try_acquire_slot(self):
+        """Non-blocking variant of connect() for event-loop callers; pair with release_slot()"""
+        return self._slots.acquire(blocking=False)
+
+    def release_slot(self):
+        self._slots.release()
+
+    def record_success(self, camera_id):
+        """Mark a camera as connected; its backoff resets once the connection proves stable"""
+        health = self._get_health(camera_id)
+        with self._lock:
+            health.total_connects += 1
+            health.score = health.score * 0.8 + 0.2
+            health.connected = True
+            health.connected_at = time.monotonic()
+            health.last_error = None
+            health.last_change = time.time()
+
+    def record_failure(self, camera_id, reason=None):
+        """Mark a failed attempt or a dropped connection"""
+        health = self._get_health(camera_id)
+        with self._lock:
+            if health.connected and time.monotonic() - health.connected_at >= self.stable_seconds:
+                health.consecutive_failures = 0  # A stable connection dropped: start the backoff over
+            health.consecutive_failures += 1
+            health.total_failures += 1
+            health.score = health.score * 0.8
+            health.connected = False
+            health.last_error = reason
+            health.last_change = time.time()
+
+    def backoff_delay(self, camera_id):
+        """Exponential backoff with jitter for the camera's next attempt"""
+        health = self._get_health(camera_id)
+        exponent = min(max(0, health.consecutive_failures - 1), 16)
+        delay = min(self.max_delay, self.base_delay * (2 ** exponent))
+        # "Equal jitter": keep at least half the delay, randomise the rest
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def wait_before_retry(self, camera_id, stop_event):
+        """Sleep for the backoff delay; returns False if the stream was stopped meanwhile"""
+        return not stop_event.wait(self.backoff_delay(camera_id))
+
+    def health_report(self):
+        """Snapshot of per-camera health: {camera_id: (score, connected, consecutive_failures, last_error)}"""
+        with self._lock:
+            return {
+                camera_id: (round(health.score, 3), health.connected,
+                            health.consecutive_failures, health.last_error)
+                for camera_id, health in self._health.items()
+            }
+
+    def forget(self, camera_id):
+        """Drop bookkeeping for a removed camera"""
+        with self._lock:
+            self._health.pop(camera_id, None)
+
+
+# Shared supervisor used by all camera streams in this process
+supervisor = ConnectionSupervisor()
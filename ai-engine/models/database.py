@@ -1,13 +1,112 @@
+import os
+import glob
+import json
+import time
 import sqlite3
+import numpy as np
 from config import DB_PATH
+from models.database_writer import configure_connection, get_database_writer
+from models.heatmap import encode_grid, decode_grid
+from models.camera_registry import get_camera_registry
+
+SIDECAR_IMPORT_BATCH = 500  # Sidecar files per write transaction during an import
+# The R*Tree stores 32-bit floats; times are kept relative to this origin (2024-01-01 UTC) to stay precise
+RTREE_TIME_ORIGIN = 1704067200
+# Event count rollups: resolution -> (table, bucket length in seconds)
+EVENT_COUNT_TABLES = {'minute': ('event_counts_minute', 60), 'hour': ('event_counts_hour', 3600)}
+
+
+def detection_rows(event_id, camera_id, detected_at, detections, source=None, frame_size=None):
+    """Rows for the detections table from detection dicts (DetectionThread's or the sidecar JSON format)
+    
+    frame_size is the (width, height) the boxes were measured in; rows
+    without it are stored but cannot be searched spatially.
+    """
+    frame_w, frame_h = frame_size or (None, None)
+    rows = []
+    for detection in detections:
+        category = detection.get('class') or detection.get('type')
+        if not category:
+            continue
+        x, y, w, h = (int(value) for value in detection['bbox'])
+        rows.append((event_id, str(camera_id), detected_at, category, float(detection['confidence']),
+                     x, y, w, h, source, frame_w, frame_h))
+    return rows
+
+
+def insert_detections(cursor, rows):
+    """Bulk insert rows built by detection_rows() and add them to the spatial index"""
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM detections")
+    last_id = cursor.fetchone()[0]
+    cursor.executemany(
+        "INSERT INTO detections (event_id, camera_id, detected_at, category, confidence, x, y, w, h, source, "
+        "frame_w, frame_h) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        rows
+    )
+    index_detections(cursor, last_id)
+    return len(rows)
+
+
+def index_detections(cursor, after_id=0):
+    """Add detections with id > after_id (and a known frame size) to the R*Tree"""
+    cursor.execute("""
+    INSERT INTO detection_rtree (id, min_x, max_x, min_y, max_y, min_t, max_t, min_c, max_c, category)
+    SELECT id, CAST(x AS REAL) / frame_w, CAST(x + w AS REAL) / frame_w,
+           CAST(y AS REAL) / frame_h, CAST(y + h AS REAL) / frame_h,
+           detected_at - ?, detected_at - ?, CAST(camera_id AS INTEGER), CAST(camera_id AS INTEGER), category
+    FROM detections
+    WHERE id > ? AND frame_w > 0 AND frame_h > 0
+    """, (RTREE_TIME_ORIGIN, RTREE_TIME_ORIGIN, after_id))
+    return cursor.rowcount
+
+
+def count_event(cursor, camera_id, category, at, delta=1):
+    """Add delta to the minute and hour count buckets holding epoch time `at`"""
+    for table, seconds in EVENT_COUNT_TABLES.values():
+        cursor.execute(
+            f"INSERT INTO {table} (bucket, camera_id, category, count) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (bucket, camera_id, category) DO UPDATE SET count = count + excluded.count",
+            (int(at // seconds * seconds), camera_id, category, delta)
+        )
+
+
+def point_in_polygon(x, y, polygon):
+    """Ray-casting test; polygon is a list of (x, y) vertices"""
+    inside = False
+    count = len(polygon)
+    for index in range(count):
+        x1, y1 = polygon[index]
+        x2, y2 = polygon[(index + 1) % count]
+        if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+    return inside
 
 class Database:
-    """Database manager for camera settings and events"""
+    """Database manager for camera settings and events
+    
+    Each instance owns one connection and must stay on the thread that
+    created it; other threads open their own. High-volume writes (events,
+    clips, recording segments) go through the shared DatabaseWriter, which
+    group-commits them from a single thread. Camera rows are read from a
+    CameraRegistry shared by every instance and refreshed after camera writes.
+    """
     def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self.camera_registry = get_camera_registry(db_path)
         self.conn = sqlite3.connect(db_path)
+        configure_connection(self.conn)
         self.cursor = self.conn.cursor()
         self.create_tables()
         self.update_schema()  # Add this to handle schema updates
+        self._writer = None
+        self._recording_bytes = None  # SUM(size_bytes) of recording_segments, kept up to date by writer tasks
+    
+    @property
+    def writer(self):
+        """The process-wide writer thread for this database file (started on first use)"""
+        if self._writer is None or not self._writer.is_alive():
+            self._writer = get_database_writer(self.db_path)
+        return self._writer
     
     def create_tables(self):
         # Create cameras table
@@ -18,7 +117,8 @@ class Database:
             rtsp_url TEXT NOT NULL,
             enabled INTEGER DEFAULT 1,
             latitude TEXT DEFAULT NULL,
-            longitude TEXT DEFAULT NULL
+            longitude TEXT DEFAULT NULL,
+            snapshot_url TEXT DEFAULT NULL
         )
         ''')
         
@@ -30,9 +130,99 @@ class Database:
             object_type TEXT NOT NULL,
             timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
             image_path TEXT NOT NULL,
+            captured_at REAL DEFAULT NULL,
+            clip_path TEXT DEFAULT NULL,
+            size_bytes INTEGER DEFAULT NULL,
             FOREIGN KEY (camera_id) REFERENCES cameras (id)
         )
         ''')
+        
+        # Create continuous recording index: one row per segment file, plus its keyframe offsets
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS recording_segments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            camera_id INTEGER,
+            path TEXT NOT NULL,
+            start_time REAL NOT NULL,
+            end_time REAL NOT NULL,
+            size_bytes INTEGER NOT NULL,
+            FOREIGN KEY (camera_id) REFERENCES cameras (id)
+        )
+        ''')
+        self.cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_recording_segments_camera_time
+        ON recording_segments (camera_id, start_time)
+        ''')
+        self.cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_recording_segments_time
+        ON recording_segments (start_time)
+        ''')
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS recording_keyframes (
+            segment_id INTEGER NOT NULL,
+            time REAL NOT NULL,
+            byte_offset INTEGER NOT NULL,
+            FOREIGN KEY (segment_id) REFERENCES recording_segments (id)
+        )
+        ''')
+        self.cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_recording_keyframes_segment_time
+        ON recording_keyframes (segment_id, time)
+        ''')
+        
+        # Create detections table: one row per box; event_id is NULL for detection-feed frames
+        # that did not raise an event, source is the image (or imported sidecar) file name
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS detections (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_id INTEGER DEFAULT NULL,
+            camera_id TEXT NOT NULL,
+            detected_at REAL NOT NULL,
+            category TEXT NOT NULL,
+            confidence REAL NOT NULL,
+            x INTEGER NOT NULL,
+            y INTEGER NOT NULL,
+            w INTEGER NOT NULL,
+            h INTEGER NOT NULL,
+            source TEXT DEFAULT NULL,
+            frame_w INTEGER DEFAULT NULL,
+            frame_h INTEGER DEFAULT NULL,
+            FOREIGN KEY (event_id) REFERENCES events (id)
+        )
+        ''')
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_detections_event ON detections (event_id)")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_detections_camera_time ON detections (camera_id, detected_at)")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_detections_category_time ON detections (category, detected_at)")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_detections_source ON detections (source)")
+        
+        # Create heatmaps table: hourly occupancy grids per camera and category (zlib-compressed uint32 cells)
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS heatmaps (
+            camera_id TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            category TEXT NOT NULL,
+            rows INTEGER NOT NULL,
+            cols INTEGER NOT NULL,
+            cells BLOB NOT NULL,
+            PRIMARY KEY (camera_id, bucket, category)
+        ) WITHOUT ROWID
+        ''')
+        
+        # Create webhook outbox: alerts are stored here until the server accepts them
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS webhook_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            camera_id TEXT NOT NULL,
+            object_type TEXT NOT NULL,
+            fields TEXT NOT NULL,
+            image BLOB,
+            filename TEXT,
+            attempts INTEGER DEFAULT 0,
+            next_attempt REAL NOT NULL,
+            last_error TEXT DEFAULT NULL,
+            created_at REAL NOT NULL
+        )
+        ''')
         self.conn.commit()
     
     def update_schema(self):
@@ -45,47 +235,352 @@ class Database:
             self.cursor.execute("ALTER TABLE cameras ADD COLUMN latitude TEXT DEFAULT NULL")
             self.cursor.execute("ALTER TABLE cameras ADD COLUMN longitude TEXT DEFAULT NULL")
             self.conn.commit()
+        
+        # Check if the high-resolution snapshot URL column exists (dual-stream cameras)
+        try:
+            self.cursor.execute("SELECT snapshot_url FROM cameras LIMIT 1")
+        except sqlite3.OperationalError:
+            print("Updating database schema - adding snapshot URL column")
+            self.cursor.execute("ALTER TABLE cameras ADD COLUMN snapshot_url TEXT DEFAULT NULL")
+            self.conn.commit()
+        
+        # Check if events record the frame capture time (for latency reporting)
+        try:
+            self.cursor.execute("SELECT captured_at FROM events LIMIT 1")
+        except sqlite3.OperationalError:
+            print("Updating database schema - adding event capture time column")
+            self.cursor.execute("ALTER TABLE events ADD COLUMN captured_at REAL DEFAULT NULL")
+            self.conn.commit()
+        
+        # Check if events can reference a video clip
+        try:
+            self.cursor.execute("SELECT clip_path FROM events LIMIT 1")
+        except sqlite3.OperationalError:
+            print("Updating database schema - adding event clip column")
+            self.cursor.execute("ALTER TABLE events ADD COLUMN clip_path TEXT DEFAULT NULL")
+            self.conn.commit()
+        
+        # Event indexes: newest-first listing and keyset paging, optionally per camera or category
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events (timestamp, id)")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_events_camera_timestamp ON events (camera_id, timestamp, id)")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_events_type_timestamp ON events (object_type, timestamp, id)")
+        self.conn.commit()
+        
+        # Check if detections record the frame size their boxes were measured in
+        try:
+            self.cursor.execute("SELECT frame_w, frame_h FROM detections LIMIT 1")
+        except sqlite3.OperationalError:
+            print("Updating database schema - adding detection frame size columns")
+            self.cursor.execute("ALTER TABLE detections ADD COLUMN frame_w INTEGER DEFAULT NULL")
+            self.cursor.execute("ALTER TABLE detections ADD COLUMN frame_h INTEGER DEFAULT NULL")
+            self.conn.commit()
+        
+        # Spatial-temporal index over detection boxes: normalized x and y (0-1), time since RTREE_TIME_ORIGIN
+        # and the camera number (0 for non-numeric camera ids; the camera is re-checked on the real row)
+        try:
+            self.cursor.execute("SELECT id FROM detection_rtree LIMIT 1")
+        except sqlite3.OperationalError:
+            def create_rtree(cursor):
+                print("Updating database schema - adding detection search index")
+                cursor.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS detection_rtree USING rtree("
+                    "id, min_x, max_x, min_y, max_y, min_t, max_t, min_c, max_c, +category)"
+                )
+                indexed = index_detections(cursor)
+                if indexed:
+                    print(f"Indexed {indexed} existing detections")
+            self._create_once('detection_rtree', create_rtree)
+        
+        # Check if events record the disk space of their image and clip (for retention size budgets)
+        try:
+            self.cursor.execute("SELECT size_bytes FROM events LIMIT 1")
+        except sqlite3.OperationalError:
+            print("Updating database schema - adding event size column")
+            self.cursor.execute("ALTER TABLE events ADD COLUMN size_bytes INTEGER DEFAULT NULL")
+            self.conn.commit()
+        
+        # Event counts per minute and hour by camera and category, updated with every event insert
+        try:
+            self.cursor.execute("SELECT bucket FROM event_counts_hour LIMIT 1")
+        except sqlite3.OperationalError:
+            def create_rollups(cursor):
+                print("Updating database schema - adding event count rollups")
+                for table, seconds in EVENT_COUNT_TABLES.values():
+                    cursor.execute(f'''
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        bucket INTEGER NOT NULL,
+                        camera_id INTEGER NOT NULL,
+                        category TEXT NOT NULL,
+                        count INTEGER NOT NULL,
+                        PRIMARY KEY (bucket, camera_id, category)
+                    ) WITHOUT ROWID
+                    ''')
+                    cursor.execute(f'''
+                    INSERT OR IGNORE INTO {table} (bucket, camera_id, category, count)
+                    SELECT CAST(COALESCE(captured_at, strftime('%s', timestamp)) AS INTEGER) / {seconds} * {seconds},
+                           camera_id, object_type, COUNT(*)
+                    FROM events
+                    WHERE camera_id IS NOT NULL
+                    GROUP BY 1, 2, 3
+                    ''')
+            # The hour table is created last, so it only exists once the backfill has committed
+            self._create_once('event_counts_hour', create_rollups)
+    
+    def _create_once(self, table, create):
+        """Run create(cursor) unless table exists, in one BEGIN IMMEDIATE transaction
+        
+        Several Database instances start at once (GUI, event sink workers,
+        dispatcher); the write lock and the re-check make exactly one of
+        them create and fill the table. Returns whether this one did.
+        """
+        self.cursor.execute("BEGIN IMMEDIATE")
+        try:
+            self.cursor.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (table,))
+            if self.cursor.fetchone():
+                self.conn.rollback()
+                return False
+            create(self.cursor)
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        return True
     
-    def add_camera(self, name, rtsp_url, latitude=None, longitude=None):
-        """Add a new camera to the database with optional location"""
+    def add_camera(self, name, rtsp_url, latitude=None, longitude=None, snapshot_url=None):
+        """Add a new camera to the database with optional location and snapshot stream"""
         self.cursor.execute(
-            "INSERT INTO cameras (name, rtsp_url, latitude, longitude) VALUES (?, ?, ?, ?)", 
-            (name, rtsp_url, latitude, longitude)
+            "INSERT INTO cameras (name, rtsp_url, latitude, longitude, snapshot_url) VALUES (?, ?, ?, ?, ?)", 
+            (name, rtsp_url, latitude, longitude, snapshot_url or None)
         )
         self.conn.commit()
+        self.camera_registry.invalidate()
         return self.cursor.lastrowid
     
-    def update_camera(self, camera_id, name, rtsp_url, latitude=None, longitude=None):
-        """Update an existing camera's details including location"""
+    def update_camera(self, camera_id, name, rtsp_url, latitude=None, longitude=None, snapshot_url=None):
+        """Update an existing camera's details including location
+        
+        snapshot_url=None leaves the stored snapshot stream untouched; pass an
+        empty string to clear it.
+        """
         self.cursor.execute(
             "UPDATE cameras SET name=?, rtsp_url=?, latitude=?, longitude=? WHERE id=?", 
             (name, rtsp_url, latitude, longitude, camera_id)
         )
+        if snapshot_url is not None:
+            self.cursor.execute(
+                "UPDATE cameras SET snapshot_url=? WHERE id=?",
+                (snapshot_url or None, camera_id)
+            )
         self.conn.commit()
+        self.camera_registry.invalidate()
     
     def delete_camera(self, camera_id):
         """Delete a camera from the database"""
         self.cursor.execute("DELETE FROM cameras WHERE id=?", (camera_id,))
         self.conn.commit()
+        self.camera_registry.invalidate()
     
     def get_cameras(self):
         """Get all cameras from the database including location info"""
-        self.cursor.execute("SELECT id, name, rtsp_url, enabled, latitude, longitude FROM cameras")
-        return self.cursor.fetchall()
+        return [camera.as_row() for camera in self.get_camera_list()]
+    
+    def get_camera_list(self):
+        """All cameras as Camera objects, ordered by id (served from the camera registry)"""
+        return list(self.camera_registry.cameras(self.cursor).values())
+    
+    def get_camera(self, camera_id):
+        """Camera object for an id (int or numeric string), or None"""
+        try:
+            camera_id = int(camera_id)
+        except (TypeError, ValueError):
+            return None
+        return self.camera_registry.cameras(self.cursor).get(camera_id)
     
     def get_camera_location(self, camera_id):
         """Get location information for a specific camera"""
-        self.cursor.execute("SELECT latitude, longitude FROM cameras WHERE id=?", (camera_id,))
-        return self.cursor.fetchone()
+        camera = self.get_camera(camera_id)
+        return camera.location if camera else None
     
-    def add_event(self, camera_id, object_type, image_path):
-        """Add a new detection event to the database"""
+    def get_camera_snapshot_url(self, camera_id):
+        """Get the high-resolution snapshot URL for a camera, or None for single-stream cameras"""
+        camera = self.get_camera(camera_id)
+        return camera.snapshot_url if camera else None
+    
+    def get_camera_snapshot_urls(self):
+        """Snapshot URLs of all dual-stream cameras: {camera_id: snapshot_url}"""
+        return {camera.id: camera.snapshot_url for camera in self.get_camera_list() if camera.snapshot_url}
+    
+    def add_event(self, camera_id, object_type, image_path, captured_at=None, detections=None, frame_size=None,
+                  size_bytes=None):
+        """Add a new detection event to the database and return its id
+        
+        captured_at is the wall-clock time (epoch seconds) the triggering frame was captured.
+        Waits for the writer's group commit; use add_event_async to not wait.
+        """
+        return self.add_event_async(camera_id, object_type, image_path, captured_at, detections,
+                                    frame_size, size_bytes).result()
+    
+    def add_event_async(self, camera_id, object_type, image_path, captured_at=None, detections=None,
+                        frame_size=None, size_bytes=None):
+        """Queue an event insert on the writer thread; returns a Future for the event id
+        
+        detections (dicts with class/type, confidence and bbox) and the
+        minute/hour event counts are written in the same transaction. The
+        detection thread already queued the frame's boxes with
+        add_detections_async; those rows are linked to the event, and the
+        boxes are only inserted here when none were stored for the frame.
+        size_bytes is the image's size on disk (counted against the retention budgets).
+        """
+        def insert(cursor):
+            cursor.execute(
+                "INSERT INTO events (camera_id, object_type, image_path, captured_at, size_bytes) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (camera_id, object_type, image_path, captured_at, size_bytes)
+            )
+            event_id = cursor.lastrowid
+            count_event(cursor, camera_id, object_type, captured_at or time.time())
+            if detections:
+                linked = 0
+                if captured_at:
+                    cursor.execute(
+                        "UPDATE detections SET event_id = ? "
+                        "WHERE camera_id = ? AND detected_at = ? AND event_id IS NULL",
+                        (event_id, str(camera_id), captured_at)
+                    )
+                    linked = cursor.rowcount
+                if not linked:
+                    insert_detections(cursor, detection_rows(event_id, camera_id, captured_at or time.time(),
+                                                             detections, os.path.basename(image_path), frame_size))
+            return event_id
+        return self.writer.submit(insert)
+    
+    def add_detections_async(self, camera_id, detected_at, detections, source=None, frame_size=None):
+        """Queue the boxes of a frame (add_event_async links them to its event); returns a Future for the row count"""
+        rows = detection_rows(None, camera_id, detected_at, detections, source, frame_size)
+        return self.writer.submit(insert_detections, rows)
+    
+    def find_detections(self, camera_id=None, region=None, start_time=None, end_time=None, categories=None,
+                        limit=1000):
+        """Search detection boxes by place and time through the R*Tree
+        
+        region is a rectangle (x1, y1, x2, y2) or a polygon [(x, y), ...] in
+        normalized frame coordinates (0-1). A box matches when its anchor
+        point (bottom centre, where people and vehicles touch the ground)
+        lies inside the region. start_time and end_time are epoch seconds.
+        Returns (id, event_id, camera_id, detected_at, category, confidence,
+        x, y, w, h, source) rows, oldest first.
+        """
+        polygon = None
+        if region is not None and len(region) == 4 and not isinstance(region[0], (tuple, list)):
+            x1, y1, x2, y2 = region
+            polygon = [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
+        elif region is not None:
+            polygon = [tuple(point) for point in region]
+        
+        conditions = []
+        params = []
+        if polygon is not None:
+            # Candidate boxes overlap the region's bounding box; the anchor test below is exact
+            xs = [point[0] for point in polygon]
+            ys = [point[1] for point in polygon]
+            conditions += ["r.max_x >= ?", "r.min_x <= ?", "r.max_y >= ?", "r.min_y <= ?"]
+            params += [min(xs), max(xs), min(ys), max(ys)]
+        if start_time is not None:
+            conditions.append("r.max_t >= ?")
+            params.append(start_time - RTREE_TIME_ORIGIN - 1)  # R*Tree bounds are rounded outwards
+        if end_time is not None:
+            conditions.append("r.min_t <= ?")
+            params.append(end_time - RTREE_TIME_ORIGIN + 1)
+        if camera_id is not None:
+            camera_number = int(camera_id) if str(camera_id).isdigit() else 0
+            conditions += ["r.min_c <= ?", "r.max_c >= ?", "d.camera_id = ?"]
+            params += [camera_number, camera_number, str(camera_id)]
+        if categories:
+            conditions.append(f"r.category IN ({', '.join('?' * len(categories))})")
+            params += list(categories)
+        # Exact time bounds on the real column
+        if start_time is not None:
+            conditions.append("d.detected_at >= ?")
+            params.append(start_time)
+        if end_time is not None:
+            conditions.append("d.detected_at <= ?")
+            params.append(end_time)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        
+        self.cursor.execute(f"""
+        SELECT d.id, d.event_id, d.camera_id, d.detected_at, d.category, d.confidence,
+               d.x, d.y, d.w, d.h, d.source, d.frame_w, d.frame_h
+        FROM detection_rtree r
+        CROSS JOIN detections d ON d.id = r.id
+        {where}
+        ORDER BY d.detected_at
+        """, params)
+        
+        matches = []
+        for row in self.cursor:
+            if polygon is not None:
+                x, y, w, h = row[6:10]
+                frame_w, frame_h = row[11:13]
+                if not point_in_polygon((x + w / 2) / frame_w, (y + h) / frame_h, polygon):
+                    continue
+            matches.append(row[:11])
+            if len(matches) >= limit:
+                break
+        return matches
+    
+    def get_detections(self, event_id):
+        """Boxes stored with an event: (category, confidence, x, y, w, h)"""
         self.cursor.execute(
-            "INSERT INTO events (camera_id, object_type, image_path) VALUES (?, ?, ?)",
-            (camera_id, object_type, image_path)
+            "SELECT category, confidence, x, y, w, h FROM detections WHERE event_id = ? ORDER BY id",
+            (event_id,)
+        )
+        return self.cursor.fetchall()
+    
+    def import_detection_sidecars(self, directory):
+        """Load det_*_metadata.json sidecar files into the detections table
+        
+        Files already imported (matched on their image file name) are
+        skipped, so the import can be re-run. Returns (files imported, rows).
+        """
+        self.cursor.execute("SELECT DISTINCT source FROM detections WHERE source IS NOT NULL")
+        imported = {row[0] for row in self.cursor.fetchall()}
+        
+        files = 0
+        pending = []
+        futures = []
+        for path in sorted(glob.glob(os.path.join(directory, '*_metadata.json'))):
+            try:
+                with open(path) as f:
+                    metadata = json.load(f)
+                source = metadata.get('filename') or os.path.basename(path).replace('_metadata.json', '.jpg')
+                if source in imported:
+                    continue
+                pending.extend(detection_rows(None, metadata.get('camera_id', ''), float(metadata['timestamp']),
+                                              metadata.get('detections', []), source))
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                print(f"Skipping sidecar {path}: {str(e)}")
+                continue
+            imported.add(source)
+            files += 1
+            if files % SIDECAR_IMPORT_BATCH == 0:
+                futures.append(self.writer.submit(insert_detections, pending))
+                pending = []
+        if pending:
+            futures.append(self.writer.submit(insert_detections, pending))
+        return files, sum(future.result() for future in futures)
+    
+    def set_event_clip(self, event_id, clip_path):
+        """Attach a saved video clip to an event (queued on the writer; returns a Future)"""
+        try:
+            clip_bytes = os.path.getsize(clip_path)
+        except OSError:
+            clip_bytes = 0
+        return self.writer.submit(
+            lambda cursor: cursor.execute(
+                "UPDATE events SET clip_path = ?, size_bytes = COALESCE(size_bytes, 0) + ? WHERE id = ?",
+                (clip_path, clip_bytes, event_id)
+            ).rowcount
         )
-        self.conn.commit()
-        return self.cursor.lastrowid
     
     def get_events(self, limit=100):
         """Get detection events with camera details"""
@@ -93,11 +588,472 @@ class Database:
         SELECT e.id, c.name, e.object_type, e.timestamp, e.image_path
         FROM events e
         JOIN cameras c ON e.camera_id = c.id
-        ORDER BY e.timestamp DESC
+        ORDER BY e.timestamp DESC, e.id DESC
         LIMIT ?
         """, (limit,))
         return self.cursor.fetchall()
     
+    def get_events_page(self, limit=100, cursor=None, camera_id=None, object_type=None,
+                        start_time=None, end_time=None):
+        """Get one page of events, newest first, walking the (timestamp, id) index
+        
+        Returns (rows, next_cursor). Rows match get_events; pass next_cursor
+        back to get the following page (None once there are no more rows).
+        Filters are optional; start_time and end_time accept epoch seconds
+        or 'YYYY-MM-DD HH:MM:SS' (UTC, like the timestamp column).
+        """
+        conditions = []
+        params = []
+        if cursor is not None:
+            conditions.append("(e.timestamp, e.id) < (?, ?)")
+            params.extend(cursor)
+        if camera_id is not None:
+            conditions.append("e.camera_id = ?")
+            params.append(camera_id)
+        if object_type is not None:
+            conditions.append("e.object_type = ?")
+            params.append(object_type)
+        if start_time is not None:
+            conditions.append("e.timestamp >= ?")
+            params.append(self._timestamp_value(start_time))
+        if end_time is not None:
+            conditions.append("e.timestamp <= ?")
+            params.append(self._timestamp_value(end_time))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        
+        # CROSS JOIN keeps events as the outer loop so the index order satisfies ORDER BY
+        self.cursor.execute(f"""
+        SELECT e.id, c.name, e.object_type, e.timestamp, e.image_path
+        FROM events e
+        CROSS JOIN cameras c ON e.camera_id = c.id
+        {where}
+        ORDER BY e.timestamp DESC, e.id DESC
+        LIMIT ?
+        """, params + [limit])
+        rows = self.cursor.fetchall()
+        next_cursor = (rows[-1][3], rows[-1][0]) if len(rows) == limit else None
+        return rows, next_cursor
+    
+    def get_event_counts(self, start_time, end_time, camera_id=None, categories=None, resolution='hour'):
+        """Event counts per time bucket, camera and category, read from the rollup tables
+        
+        Only the buckets between start_time and end_time (epoch seconds) are
+        read, so the cost does not depend on how much history is stored.
+        resolution is 'minute' or 'hour'. Returns (bucket start, camera_id,
+        category, count) rows, oldest first. Counts outlive retention.
+        """
+        table, seconds = EVENT_COUNT_TABLES[resolution]
+        conditions = ["bucket >= ?", "bucket < ?"]
+        params = [int(start_time // seconds * seconds), end_time]
+        if camera_id is not None:
+            conditions.append("camera_id = ?")
+            params.append(camera_id)
+        if categories:
+            conditions.append(f"category IN ({', '.join('?' * len(categories))})")
+            params.extend(categories)
+        self.cursor.execute(f"""
+        SELECT bucket, camera_id, category, count FROM {table}
+        WHERE {' AND '.join(conditions)}
+        ORDER BY bucket
+        """, params)
+        return self.cursor.fetchall()
+    
+    def get_event_totals(self, start_time, end_time, camera_id=None, categories=None, resolution='hour'):
+        """Total events per (camera_id, category) between two epoch times, from the rollup tables"""
+        totals = {}
+        for _, row_camera, category, count in self.get_event_counts(start_time, end_time, camera_id, categories,
+                                                                   resolution):
+            totals[(row_camera, category)] = totals.get((row_camera, category), 0) + count
+        return totals
+    
+    def prune_event_counts(self, before):
+        """Drop per-minute counts older than `before` (hourly counts are kept); returns a writer Future"""
+        return self.writer.submit(
+            lambda cursor: cursor.execute("DELETE FROM event_counts_minute WHERE bucket < ?", (before,)).rowcount
+        )
+    
+    def add_heatmap_async(self, camera_id, category, bucket, grid):
+        """Add an occupancy grid to a camera's hourly heatmap row; returns a writer Future
+        
+        A grid whose shape differs from the stored row (HEATMAP_GRID changed within the
+        hour) fails the Future with ValueError and leaves the row untouched.
+        """
+        camera_id = str(camera_id)
+        
+        def merge(cursor):
+            cursor.execute(
+                "SELECT rows, cols, cells FROM heatmaps WHERE camera_id = ? AND bucket = ? AND category = ?",
+                (camera_id, bucket, category)
+            )
+            row = cursor.fetchone()
+            cells = grid
+            if row is not None:
+                if (row[0], row[1]) != grid.shape:
+                    # Replacing the row would drop the hour's counts; keep them and refuse this grid
+                    message = (f"Heatmap grid {grid.shape[1]}x{grid.shape[0]} does not match the stored "
+                               f"{row[1]}x{row[0]} grid for camera {camera_id} ({category}) at {bucket}")
+                    print(message)
+                    raise ValueError(message)
+                cells = decode_grid(row[2], row[0], row[1]) + grid
+            cursor.execute(
+                "INSERT OR REPLACE INTO heatmaps (camera_id, bucket, category, rows, cols, cells) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (camera_id, bucket, category, cells.shape[0], cells.shape[1], encode_grid(cells))
+            )
+        return self.writer.submit(merge)
+    
+    def get_heatmap(self, camera_id, start_time, end_time, categories=None):
+        """Sum of a camera's hourly heatmaps between two epoch times, or None if there are none
+        
+        Returns a (rows, cols) uint64 array; models.heatmap.heatmap_png renders it.
+        """
+        conditions = ["camera_id = ?", "bucket >= ?", "bucket < ?"]
+        params = [str(camera_id), int(start_time // 3600 * 3600), end_time]
+        if categories:
+            conditions.append(f"category IN ({', '.join('?' * len(categories))})")
+            params.extend(categories)
+        self.cursor.execute(f"SELECT rows, cols, cells FROM heatmaps WHERE {' AND '.join(conditions)}", params)
+        total = None
+        for rows, cols, cells in self.cursor.fetchall():
+            if total is None:
+                total = np.zeros((rows, cols), np.uint64)
+            if total.shape == (rows, cols):  # Rows from a different grid size are skipped
+                total += decode_grid(cells, rows, cols)
+        return total
+    
+    def prune_heatmaps(self, before):
+        """Drop hourly heatmaps older than `before`; returns a writer Future"""
+        return self.writer.submit(
+            lambda cursor: cursor.execute("DELETE FROM heatmaps WHERE bucket < ?", (before,)).rowcount
+        )
+    
+    def iter_events(self, cursor=None, camera_id=None, categories=None, start_time=None, end_time=None,
+                    batch_size=500, with_detections=True):
+        """Stream events oldest first as dicts, one keyset page of (timestamp, id) at a time
+        
+        Only one page is in memory, and every page is its own short read, so
+        a long export never holds a snapshot open against the writer. Each
+        dict carries 'cursor'; pass it back to resume right after that event.
+        Camera names come from the camera registry; with_detections adds the
+        event's boxes ({'type', 'confidence', 'bbox'}, like the sidecars).
+        start_time and end_time take the same values as get_events_page.
+        """
+        page_cursor = self.conn.cursor()  # Keeps the shared cursor free between pages
+        while True:
+            conditions = []
+            params = []
+            if cursor is not None:
+                conditions.append("(timestamp, id) > (?, ?)")
+                params.extend(cursor)
+            if camera_id is not None:
+                conditions.append("camera_id = ?")
+                params.append(camera_id)
+            if categories:
+                conditions.append(f"object_type IN ({', '.join('?' * len(categories))})")
+                params.extend(categories)
+            if start_time is not None:
+                conditions.append("timestamp >= ?")
+                params.append(self._timestamp_value(start_time))
+            if end_time is not None:
+                conditions.append("timestamp <= ?")
+                params.append(self._timestamp_value(end_time))
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+            page_cursor.execute(f"""
+            SELECT id, camera_id, object_type, timestamp, captured_at, image_path, clip_path
+            FROM events
+            {where}
+            ORDER BY timestamp, id
+            LIMIT ?
+            """, params + [batch_size])
+            rows = page_cursor.fetchall()
+            if not rows:
+                return
+            
+            boxes = {}
+            if with_detections:
+                event_ids = [row[0] for row in rows]
+                page_cursor.execute(f"""
+                SELECT event_id, category, confidence, x, y, w, h FROM detections
+                WHERE event_id IN ({', '.join('?' * len(event_ids))})
+                ORDER BY id
+                """, event_ids)
+                for event_id, category, confidence, x, y, w, h in page_cursor.fetchall():
+                    boxes.setdefault(event_id, []).append({'type': category, 'confidence': confidence,
+                                                           'bbox': [x, y, w, h]})
+            cameras = self.camera_registry.cameras(page_cursor)
+            
+            for event_id, event_camera, object_type, timestamp, captured_at, image_path, clip_path in rows:
+                camera = cameras.get(event_camera)
+                event = {
+                    'id': event_id,
+                    'camera_id': event_camera,
+                    'camera_name': camera.name if camera else None,
+                    'object_type': object_type,
+                    'timestamp': timestamp,
+                    'captured_at': captured_at,
+                    'image_path': image_path,
+                    'clip_path': clip_path,
+                    'cursor': (timestamp, event_id),
+                }
+                if with_detections:
+                    event['detections'] = boxes.get(event_id, [])
+                yield event
+            if len(rows) < batch_size:
+                return
+            cursor = (rows[-1][3], rows[-1][0])
+    
+    @staticmethod
+    def _timestamp_value(value):
+        """Epoch seconds to the events.timestamp text format; strings pass through"""
+        if isinstance(value, (int, float)):
+            return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(value))
+        return value
+    
+    def add_recording_segment(self, camera_id, path, start_time, end_time, size_bytes, keyframes):
+        """Index a finished recording segment through the writer; keyframes is a list of (time, byte_offset)
+        
+        Returns a Future of the new segment id.
+        """
+        def insert(cursor):
+            cursor.execute(
+                "INSERT INTO recording_segments (camera_id, path, start_time, end_time, size_bytes) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (camera_id, path, start_time, end_time, size_bytes)
+            )
+            segment_id = cursor.lastrowid
+            cursor.executemany(
+                "INSERT INTO recording_keyframes (segment_id, time, byte_offset) VALUES (?, ?, ?)",
+                [(segment_id, keyframe_time, offset) for keyframe_time, offset in keyframes]
+            )
+            if self._recording_bytes is not None:
+                self._recording_bytes += size_bytes
+            return segment_id
+        return self.writer.submit(insert)
+    
+    def find_recording(self, camera_id, timestamp):
+        """Locate recorded video for a moment in time
+        
+        Returns (path, byte_offset, keyframe_time) for the last keyframe at or
+        before timestamp, or None if nothing was recorded then.
+        """
+        self.cursor.execute("""
+        SELECT id, path, start_time FROM recording_segments
+        WHERE camera_id = ? AND start_time <= ? AND end_time >= ?
+        ORDER BY start_time DESC
+        LIMIT 1
+        """, (camera_id, timestamp, timestamp))
+        segment = self.cursor.fetchone()
+        if not segment:
+            return None
+        segment_id, path, start_time = segment
+        
+        self.cursor.execute("""
+        SELECT time, byte_offset FROM recording_keyframes
+        WHERE segment_id = ? AND time <= ?
+        ORDER BY time DESC
+        LIMIT 1
+        """, (segment_id, timestamp))
+        keyframe = self.cursor.fetchone()
+        if not keyframe:
+            return (path, 0, start_time)
+        return (path, keyframe[1], keyframe[0])
+    
+    def get_recordings(self, camera_id, start_time, end_time):
+        """Get recording segments overlapping a time range, oldest first"""
+        self.cursor.execute("""
+        SELECT id, path, start_time, end_time, size_bytes FROM recording_segments
+        WHERE camera_id = ? AND end_time >= ? AND start_time <= ?
+        ORDER BY start_time
+        """, (camera_id, start_time, end_time))
+        return self.cursor.fetchall()
+    
+    def prune_recordings(self, max_bytes):
+        """Drop the oldest segments until recordings fit in max_bytes, through the writer
+        
+        Returns a Future of the removed file paths; the files themselves are
+        left for the caller to delete once the rows are gone.
+        """
+        def prune(cursor):
+            # The total is summed once, then maintained by the inserts and prunes
+            if self._recording_bytes is None:
+                cursor.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM recording_segments")
+                self._recording_bytes = cursor.fetchone()[0]
+            excess = self._recording_bytes - max_bytes
+            if excess <= 0:
+                return []
+            
+            removed = []
+            cursor.execute("SELECT id, path, size_bytes FROM recording_segments ORDER BY start_time")
+            for segment_id, path, size_bytes in cursor:
+                if excess <= 0:
+                    break
+                removed.append((segment_id, path))
+                excess -= size_bytes
+            
+            segment_ids = [(segment_id,) for segment_id, _ in removed]
+            cursor.executemany("DELETE FROM recording_keyframes WHERE segment_id = ?", segment_ids)
+            cursor.executemany("DELETE FROM recording_segments WHERE id = ?", segment_ids)
+            self._recording_bytes = max_bytes + excess
+            return [path for _, path in removed]
+        return self.writer.submit(prune)
+    
+    def get_unsized_events(self, limit=500):
+        """Events stored before sizes were recorded: (id, image_path, clip_path)"""
+        self.cursor.execute(
+            "SELECT id, image_path, clip_path FROM events WHERE size_bytes IS NULL LIMIT ?", (limit,)
+        )
+        return self.cursor.fetchall()
+    
+    def set_event_sizes(self, sizes):
+        """Record measured event sizes, a list of (size_bytes, event_id); returns a writer Future"""
+        return self.writer.submit(
+            lambda cursor: cursor.executemany("UPDATE events SET size_bytes = ? WHERE id = ?", sizes).rowcount
+        )
+    
+    def get_event_bytes(self):
+        """Disk space of event images and clips per camera: {camera_id: bytes}"""
+        self.cursor.execute("SELECT camera_id, COALESCE(SUM(size_bytes), 0) FROM events GROUP BY camera_id")
+        return dict(self.cursor.fetchall())
+    
+    def get_expired_events(self, before, camera_id=None, exclude_cameras=(), limit=500):
+        """Oldest events with a timestamp before `before` (epoch seconds): (id, image_path, clip_path, size_bytes)
+        
+        exclude_cameras skips cameras that have their own age limit.
+        """
+        conditions = ["timestamp < ?"]
+        params = [self._timestamp_value(before)]
+        if camera_id is not None:
+            conditions.append("camera_id = ?")
+            params.append(camera_id)
+        if exclude_cameras:
+            conditions.append(f"camera_id NOT IN ({', '.join('?' * len(exclude_cameras))})")
+            params.extend(exclude_cameras)
+        self.cursor.execute(f"""
+        SELECT id, image_path, clip_path, size_bytes FROM events
+        WHERE {' AND '.join(conditions)}
+        ORDER BY timestamp, id
+        LIMIT ?
+        """, params + [limit])
+        return self.cursor.fetchall()
+    
+    def get_oldest_events(self, excess, camera_id=None, limit=500):
+        """Oldest events whose sizes add up to at least excess bytes (at most limit)
+        
+        Rows are (id, image_path, clip_path, size_bytes), like get_expired_events.
+        """
+        if camera_id is None:
+            self.cursor.execute("SELECT id, image_path, clip_path, size_bytes FROM events ORDER BY timestamp, id")
+        else:
+            self.cursor.execute(
+                "SELECT id, image_path, clip_path, size_bytes FROM events WHERE camera_id = ? ORDER BY timestamp, id",
+                (camera_id,)
+            )
+        events = []
+        for event_id, image_path, clip_path, size_bytes in self.cursor:
+            if excess <= 0 or len(events) >= limit:
+                break
+            events.append((event_id, image_path, clip_path, size_bytes))
+            excess -= size_bytes or 0
+        return events
+    
+    def delete_events(self, event_ids):
+        """Delete events with their detections and index entries in one transaction; returns a writer Future"""
+        event_ids = list(event_ids)
+        placeholders = ', '.join('?' * len(event_ids))
+        
+        def delete(cursor):
+            cursor.execute(f"""
+            DELETE FROM detection_rtree WHERE id IN (
+                SELECT id FROM detections WHERE event_id IN ({placeholders})
+            )
+            """, event_ids)
+            cursor.execute(f"DELETE FROM detections WHERE event_id IN ({placeholders})", event_ids)
+            return cursor.execute(f"DELETE FROM events WHERE id IN ({placeholders})", event_ids).rowcount
+        return self.writer.submit(delete)
+    
+    def delete_detections_before(self, before, limit=500):
+        """Delete up to limit boxes that raised no event, detected before `before`; returns a writer Future"""
+        def delete(cursor):
+            cursor.execute(
+                "SELECT id FROM detections WHERE event_id IS NULL AND detected_at < ? LIMIT ?", (before, limit)
+            )
+            ids = [(row[0],) for row in cursor.fetchall()]
+            cursor.executemany("DELETE FROM detection_rtree WHERE id = ?", ids)
+            cursor.executemany("DELETE FROM detections WHERE id = ?", ids)
+            return len(ids)
+        return self.writer.submit(delete)
+    
+    def incremental_vacuum(self, pages):
+        """Return up to `pages` free pages to the file system through the writer
+        
+        Returns a Future of how many were freed. Runs as an exclusive writer
+        item: executescript steps the single PRAGMA incremental_vacuum(N) to
+        completion (execute() steps it once, freeing one page), and it
+        commits, so it cannot share the batch transaction.
+        """
+        def vacuum(cursor):
+            cursor.execute("PRAGMA freelist_count")
+            free_before = cursor.fetchone()[0]
+            if free_before:
+                cursor.executescript(f"PRAGMA incremental_vacuum({int(pages)})")
+            cursor.execute("PRAGMA freelist_count")
+            return free_before - cursor.fetchone()[0]
+        return self.writer.submit_exclusive(vacuum)
+    
+    def add_outbox_webhook(self, camera_id, object_type, fields, image, filename, created_at):
+        """Store an alert in the webhook outbox through the writer; fields is a dict of form fields
+        
+        Returns a Future of the outbox id.
+        """
+        def insert(cursor):
+            cursor.execute(
+                "INSERT INTO webhook_outbox (camera_id, object_type, fields, image, filename, next_attempt, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (camera_id, object_type, json.dumps(fields), image, filename, created_at, created_at)
+            )
+            return cursor.lastrowid
+        return self.writer.submit(insert)
+    
+    def get_due_webhooks(self, now, limit=10):
+        """Get outbox alerts due for delivery: (id, camera_id, object_type, fields, image, filename, attempts)"""
+        self.cursor.execute("""
+        SELECT id, camera_id, object_type, fields, image, filename, attempts
+        FROM webhook_outbox
+        WHERE next_attempt <= ?
+        ORDER BY next_attempt
+        LIMIT ?
+        """, (now, limit))
+        return [(row[0], row[1], row[2], json.loads(row[3]), row[4], row[5], row[6])
+                for row in self.cursor.fetchall()]
+    
+    def get_next_webhook_time(self):
+        """Earliest next_attempt in the outbox, or None if it is empty"""
+        self.cursor.execute("SELECT MIN(next_attempt) FROM webhook_outbox")
+        return self.cursor.fetchone()[0]
+    
+    def reschedule_webhook(self, webhook_id, attempts, next_attempt, error):
+        """Record a failed delivery and when to try again, through the writer; returns a Future"""
+        return self.writer.submit(lambda cursor: cursor.execute(
+            "UPDATE webhook_outbox SET attempts = ?, next_attempt = ?, last_error = ? WHERE id = ?",
+            (attempts, next_attempt, error, webhook_id)
+        ).rowcount)
+    
+    def delete_webhook(self, webhook_id):
+        """Remove a delivered (or abandoned) alert from the outbox through the writer; returns a Future"""
+        return self.writer.submit(
+            lambda cursor: cursor.execute("DELETE FROM webhook_outbox WHERE id = ?", (webhook_id,)).rowcount)
+    
+    def trim_webhook_outbox(self, limit):
+        """Drop the oldest alerts beyond limit through the writer; returns a Future of how many were dropped"""
+        def trim(cursor):
+            cursor.execute("""
+            DELETE FROM webhook_outbox WHERE id IN (
+                SELECT id FROM webhook_outbox ORDER BY created_at DESC LIMIT -1 OFFSET ?
+            )
+            """, (limit,))
+            return cursor.rowcount
+        return self.writer.submit(trim)
+    
     def close(self):
         """Close the database connection"""
         self.conn.close()
\ No newline at end of file
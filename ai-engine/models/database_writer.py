@@ -0,0 +1,206 @@
+import os
+import time
+import sqlite3
+import threading
+from concurrent.futures import Future
+from queue import Queue, Empty
+from config import (DB_PATH, DB_SYNCHRONOUS, DB_CACHE_SIZE_KB, DB_BUSY_TIMEOUT, DB_WRITER_BATCH_SIZE,
+                    DB_WRITER_BATCH_WINDOW, RETENTION_ENABLED, RETENTION_VACUUM_PAGES)
+
+
+def configure_connection(conn):
+    """Apply the shared connection settings: WAL journal, relaxed fsync, larger page cache"""
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")  # Only takes effect on a new file (see enable_incremental_vacuum)
+    conn.execute("PRAGMA journal_mode=WAL")  # Readers never block the writer and vice versa
+    conn.execute(f"PRAGMA synchronous={DB_SYNCHRONOUS}")  # NORMAL: no fsync per commit in WAL mode
+    conn.execute(f"PRAGMA cache_size=-{int(DB_CACHE_SIZE_KB)}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute(f"PRAGMA busy_timeout={int(DB_BUSY_TIMEOUT * 1000)}")
+
+
+def enable_incremental_vacuum(conn):
+    """Switch a file created before incremental auto_vacuum over to it; returns whether it did
+
+    Takes a full VACUUM, which rebuilds the whole file, so it runs once,
+    when the writer starts and before it takes any writes.
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        return False
+    print("Updating database schema - enabling incremental vacuum (one-time VACUUM)")
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("VACUUM")
+    return True
+
+
+class DatabaseWriter(threading.Thread):
+    """Single writer thread that owns a connection and group-commits queued writes
+
+    submit(fn, *args) queues fn(cursor, *args) and returns a Future for its
+    result. The thread takes whatever has queued up (at most batch_size
+    items, waiting up to batch_window for stragglers) and runs it in one
+    transaction. Each item gets its own savepoint, so a failing write only
+    fails its own Future. Futures resolve after the commit.
+
+    submit_exclusive(fn, *args) is for statements that cannot run inside a
+    transaction (incremental vacuum): fn runs on its own between batches,
+    in autocommit mode, in queue order with everything else. With
+    migrate_vacuum an older file is switched to incremental auto_vacuum
+    when the thread starts (see enable_incremental_vacuum).
+    """
+    def __init__(self, db_path=DB_PATH, batch_size=DB_WRITER_BATCH_SIZE, batch_window=DB_WRITER_BATCH_WINDOW,
+                 migrate_vacuum=RETENTION_ENABLED and bool(RETENTION_VACUUM_PAGES)):
+        super().__init__(daemon=True, name='database-writer')
+        self.db_path = db_path
+        self.migrate_vacuum = migrate_vacuum
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.queue = Queue()
+        self._held = None  # Exclusive item that ended the previous batch
+        self.is_running = True
+        self.batches = 0
+        self.writes = 0
+
+    def submit(self, fn, *args):
+        """Queue fn(cursor, *args) for the next batch; returns a Future"""
+        return self._queue_item(fn, args, False)
+
+    def submit_exclusive(self, fn, *args):
+        """Queue fn(cursor, *args) to run alone, outside any transaction; returns a Future"""
+        return self._queue_item(fn, args, True)
+
+    def _queue_item(self, fn, args, exclusive):
+        future = Future()
+        if not self.is_running:
+            future.set_exception(RuntimeError("database writer is stopped"))
+            return future
+        self.queue.put((fn, args, future, exclusive))
+        return future
+
+    def run(self):
+        conn = sqlite3.connect(self.db_path, isolation_level=None)  # Transactions are managed here
+        configure_connection(conn)
+        cursor = conn.cursor()
+        if self.migrate_vacuum:
+            try:
+                enable_incremental_vacuum(conn)
+            except sqlite3.Error as e:
+                print(f"Could not enable incremental vacuum: {str(e)}")
+        try:
+            while True:
+                batch = self._next_batch()
+                if batch is None:
+                    break
+                if len(batch) == 1 and batch[0][3]:
+                    self._write_exclusive(cursor, batch[0])
+                elif batch:
+                    self._write_batch(cursor, batch)
+        finally:
+            conn.close()
+
+    def _next_batch(self):
+        """Block for the first item, then gather more until the batch is full or the window closes
+
+        An exclusive item is returned as a batch of its own.
+        """
+        if self._held is not None:
+            first, self._held = self._held, None
+            return [first]
+        try:
+            first = self.queue.get(timeout=0.5)
+        except Empty:
+            return [] if self.is_running else None
+        if first is None:
+            return None
+        if first[3]:
+            return [first]
+
+        batch = [first]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+            except Empty:
+                break
+            if item is None:
+                self.queue.put(None)  # Finish this batch, then stop
+                break
+            if item[3]:
+                self._held = item  # Runs right after this batch
+                break
+            batch.append(item)
+        return batch
+
+    def _write_batch(self, cursor, batch):
+        results = []
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            for fn, args, future, _ in batch:
+                cursor.execute("SAVEPOINT item")
+                try:
+                    results.append((future, fn(cursor, *args), None))
+                    cursor.execute("RELEASE item")
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO item")
+                    cursor.execute("RELEASE item")
+                    results.append((future, None, e))
+            cursor.execute("COMMIT")
+        except Exception as e:
+            print(f"Database write batch failed: {str(e)}")
+            try:
+                cursor.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            for _, _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.writes += len(batch)
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def _write_exclusive(self, cursor, item):
+        fn, args, future, _ = item
+        try:
+            result = fn(cursor, *args)
+        except Exception as e:
+            print(f"Database write failed: {str(e)}")
+            future.set_exception(e)
+            return
+        self.writes += 1
+        future.set_result(result)
+
+    def stop(self, timeout=5):
+        """Write everything already queued, then stop"""
+        self.is_running = False
+        self.queue.put(None)
+        self.join(timeout)
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_database_writer(db_path=DB_PATH):
+    """Return the process-wide writer for a database file, starting it on first use"""
+    key = os.path.abspath(db_path)
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None or not writer.is_alive():
+            writer = _writers[key] = DatabaseWriter(db_path)
+            writer.start()
+        return writer
+
+
+def stop_database_writers():
+    """Flush and stop every writer that was started"""
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.stop()
@@ -7,11 +7,15 @@ import json
 from queue import Queue
 from PyQt6.QtCore import QThread, pyqtSignal
 from ultralytics import YOLO
+from config import EVENT_IMAGE_ANNOTATED, STORE_DETECTIONS, DETECTION_FEED_DIR
+from models.frame_ring import FrameRing
+from models.latency import latency_tracker
+from models.event_artifact import EventArtifact, draw_detections, encode_jpeg
 
 class DetectionThread(QThread):
     """Thread to handle object detection processing with hardware-aware optimizations"""
-    detection_complete = pyqtSignal(list, np.ndarray, str)  # detections, processed_frame, camera_id
-    event_detected = pyqtSignal(str, str, np.ndarray, tuple)  # camera_id, object_type, frame, bbox
+    detection_complete = pyqtSignal(list, np.ndarray, str, float)  # detections, processed_frame, camera_id, capture_time
+    event_detected = pyqtSignal(object)  # EventArtifact
     
     def __init__(self, model_path=None, device='cpu', use_gpu=False, batch_size=4,
              frame_skip=2, target_size=(640, 480), half_precision=False,
@@ -21,6 +25,7 @@ class DetectionThread(QThread):
         
         # Initialize basic properties first
         self.frame_queue = Queue(maxsize=16)  # Reduced queue size for lower memory usage
+        self.input_rings = {}  # Detection-size frame slots keyed by shape; queued frames hold a reference
         self.is_running = False
         self.model = None
         self.model_path = model_path
@@ -120,7 +125,14 @@ class DetectionThread(QThread):
             self.model = YOLO("yolov8n.pt")
             print("Fallback to basic model")
     
-    def add_frame(self, frame, camera_id):
+    def _get_ring(self, rings, shape, slots):
+        """Return the frame ring for a shape, allocating it on first use"""
+        ring = rings.get(shape)
+        if ring is None:
+            ring = rings[shape] = FrameRing(shape, slots)
+        return ring
+    
+    def add_frame(self, frame, camera_id, frame_ref=None):
         """Add a frame to the processing queue with frame skipping"""
         if camera_id not in self.frame_counter:
             self.frame_counter[camera_id] = 0
@@ -134,12 +146,45 @@ class DetectionThread(QThread):
         # Skip if queue is almost full to avoid backlog
         if self.frame_queue.qsize() >= self.frame_queue.maxsize - 1:
             return
-            
-        # Resize frame for faster processing
+        
+        # Pin the capture slot while reading it; a reused slot means the frame is stale anyway
+        if frame_ref is not None and not frame_ref.retain():
+            return
+        
         if self.target_size:
-            frame = cv2.resize(frame, self.target_size, interpolation=cv2.INTER_AREA)
+            shape = (self.target_size[1], self.target_size[0], 3)
+        else:
+            shape = frame.shape
+        
+        # Capture already decoded at the detection size: queue its slot as-is, no copy or resize.
+        # The reference taken above is released by the detection loop.
+        if frame_ref is not None and frame.shape == shape:
+            self.frame_queue.put((frame_ref, camera_id))
+            return
+        
+        try:
+            # Enough slots for a full queue plus the batch being processed
+            ring = self._get_ring(self.input_rings, shape, self.frame_queue.maxsize + self.batch_size + 2)
+            slot, buffer = ring.acquire_write()
+            if slot is None:
+                return
+            
+            # Resize frame for faster processing, straight into the preallocated slot
+            if frame.shape == shape:
+                np.copyto(buffer, frame)
+            else:
+                cv2.resize(frame, (shape[1], shape[0]), dst=buffer, interpolation=cv2.INTER_AREA)
             
-        self.frame_queue.put((frame.copy(), camera_id))
+            # Carry the capture stamps through to inference and events
+            if frame_ref is not None:
+                input_ref = ring.commit(slot, frame_ref.timestamp, frame_ref.pts)
+            else:
+                input_ref = ring.commit(slot, time.time())
+            input_ref.retain()  # Released by the detection loop once the frame is processed
+            self.frame_queue.put((input_ref, camera_id))
+        finally:
+            if frame_ref is not None:
+                frame_ref.release()
         
     def map_class_to_category(self, class_name):
         """Map YOLO class name to our dashboard categories (Human, Vehicle, Animal)"""
@@ -168,7 +213,7 @@ class DetectionThread(QThread):
         # Save metadata file
         try:
             metadata_file = filename.replace('.jpg', '_metadata.json')
-            events_dir = 'api-backend/events'
+            events_dir = DETECTION_FEED_DIR
             if not os.path.exists(events_dir):
                 os.makedirs(events_dir)
                 
@@ -182,11 +227,17 @@ class DetectionThread(QThread):
         self.is_running = True
         self.load_model()
         
+        # Boxes of frames that raise no event are queued on the database writer (events carry their own)
+        db = None
+        if STORE_DETECTIONS:
+            from models.database import Database  # Import here to avoid circular imports
+            db = Database()
+        
         while self.is_running:
             # Collect frames for batch processing
             frames_batch = []
             camera_ids = []
-            original_frames = []
+            frame_refs = []
             
             batch_size = self.batch_size if self.has_gpu else 1
             
@@ -194,10 +245,10 @@ class DetectionThread(QThread):
             while len(frames_batch) < batch_size and not self.frame_queue.empty():
                 if not self.frame_queue.empty():
                     try:
-                        frame, camera_id = self.frame_queue.get(block=False)
-                        frames_batch.append(frame)
+                        frame_ref, camera_id = self.frame_queue.get(block=False)
+                        frames_batch.append(frame_ref.frame)
                         camera_ids.append(camera_id)
-                        original_frames.append(frame.copy())
+                        frame_refs.append(frame_ref)
                     except:
                         pass
                 
@@ -208,6 +259,8 @@ class DetectionThread(QThread):
                 
             # Process frames in a batch
             start_time = time.time()
+            for frame_ref, camera_id in zip(frame_refs, camera_ids):
+                latency_tracker.record_age(camera_id, 'age_at_inference', frame_ref.timestamp, start_time)
             
             try:
                 # Run detection with only target classes - THIS IS THE KEY CHANGE
@@ -232,8 +285,11 @@ class DetectionThread(QThread):
                     if i >= len(camera_ids):
                         continue
                         
-                    frame = original_frames[i]
+                    frame = frames_batch[i]
                     camera_id = camera_ids[i]
+                    capture_time = frame_refs[i].timestamp
+                    
+                    # Annotate a private copy: the display keeps it after the input slot is reused
                     result_frame = frame.copy()
                     detections = []
                     new_events = []
@@ -267,21 +323,9 @@ class DetectionThread(QThread):
                                         self.tracking_objects[object_key] = current_time
                                         new_events.append({
                                             "category": category,
-                                            "frame": frame.copy(),
-                                            "bbox": bbox
+                                            "bbox": bbox,
+                                            "capture_time": capture_time
                                         })
-                                    
-                                    # Draw bounding box on the frame
-                                    color_map = {
-                                        "Human": (0, 255, 0),      # Green for humans
-                                        "Vehicle": (0, 0, 255),   # Red for vehicles  
-                                        "Animal": (255, 0, 0)     # Blue for animals
-                                    }
-                                    color = color_map.get(category, (255, 255, 255))
-                                    
-                                    cv2.rectangle(result_frame, (x1, y1), (x2, y2), color, 2)
-                                    cv2.putText(result_frame, f"{category}: {conf:.2f}", 
-                                            (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
                                 else:
                                     # This should not happen anymore since we filter at model level
                                     print(f"Unexpected class detected: {class_name}")
@@ -289,38 +333,79 @@ class DetectionThread(QThread):
                             except Exception as e:
                                 print(f"Error processing detection: {str(e)}")
                     
-                    # Save image and metadata if there are valid detections
+                    # Draw bounding boxes on the output frame
+                    draw_detections(result_frame, detections)
+                    
+                    # Encode once; the detection feed and (when annotated) the event share these bytes
+                    jpeg = None
                     if detections:
+                        jpeg = encode_jpeg(result_frame)
+                    
+                    # Save image and metadata for the MJPEG server's detection feed
+                    if jpeg is not None:
                         timestamp = int(time.time())
                         filename = f"det_{timestamp}.jpg"
-                        events_dir = 'api-backend/events'
+                        events_dir = DETECTION_FEED_DIR
                         
                         if not os.path.exists(events_dir):
                             os.makedirs(events_dir)
                             
                         image_path = os.path.join(events_dir, filename)
-                        cv2.imwrite(image_path, result_frame)
+                        with open(image_path, 'wb') as f:
+                            f.write(jpeg)
                         
                         # Save metadata for dashboard
                         self.save_detection_metadata(detections, filename, camera_id)
                         print(f"Saved detection: {filename} with {len(detections)} objects")
+                        
+                        # Stored here even when the frame raises an event, so the boxes survive an event
+                        # the sink drops; the event row links to them when it is written
+                        if db is not None:
+                            db.add_detections_async(camera_id, capture_time, detections, filename,
+                                                    (frame.shape[1], frame.shape[0]))
                     
                     # Emit the detection results
-                    self.detection_complete.emit(detections, result_frame, camera_id)
+                    self.detection_complete.emit(detections, result_frame, camera_id, capture_time)
                     
                     # Emit new events
                     if new_events:
                         for event in new_events[:1]:  # Limit to one event at a time
-                            self.event_detected.emit(camera_id, event["category"], event["frame"], event["bbox"])
+                            if EVENT_IMAGE_ANNOTATED and jpeg is not None:
+                                artifact = EventArtifact(camera_id, event["category"], event["bbox"],
+                                                         event["capture_time"], jpeg, frame.shape,
+                                                         detections, annotated=True)
+                            else:
+                                # Raw event images need their own encode, done before the input slot is released
+                                artifact = EventArtifact.from_frame(frame, camera_id, event["category"],
+                                                                    event["bbox"], event["capture_time"],
+                                                                    detections)
+                            if artifact is not None:
+                                self.event_detected.emit(artifact)
             
             except Exception as e:
                 print(f"Error in detection processing: {str(e)}")
+            finally:
+                # Hand the input slots back to the ring
+                for frame_ref in frame_refs:
+                    frame_ref.release()
+            
+            latency_tracker.maybe_report()
                 
             # Sleep based on hardware
             if not self.has_gpu:
                 time.sleep(0.03)
             else:
                 time.sleep(0.01)
+        
+        if db is not None:
+            db.close()
+    
+    def forget_camera(self, camera_id):
+        """Drop the frame-skip counter and event cooldowns of a stopped camera"""
+        self.frame_counter.pop(camera_id, None)
+        prefix = f"{camera_id}_"
+        for object_key in [key for key in list(self.tracking_objects) if key.startswith(prefix)]:
+            self.tracking_objects.pop(object_key, None)
     
     def stop(self):
         """Stop the thread safely"""
@@ -0,0 +1,116 @@
+import os
+import time
+from datetime import datetime
+import cv2
+from config import JPEG_QUALITY
+
+# Box colours (BGR) per dashboard category
+CATEGORY_COLORS = {
+    "Human": (0, 255, 0),      # Green for humans
+    "Vehicle": (0, 0, 255),    # Red for vehicles
+    "Animal": (255, 0, 0)      # Blue for animals
+}
+
+
+def draw_detections(image, detections):
+    """Draw detection boxes and labels onto image in place"""
+    for detection in detections:
+        x1, y1, x2, y2 = detection["box"]
+        category = detection["class"]
+        color = CATEGORY_COLORS.get(category, (255, 255, 255))
+        cv2.rectangle(image, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(image, f"{category}: {detection['confidence']:.2f}",
+                    (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+
+
+def encode_jpeg(image, quality=JPEG_QUALITY):
+    """Encode a frame to JPEG bytes, or None if encoding fails"""
+    ok, encoded = cv2.imencode('.jpg', image, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+    return encoded.tobytes() if ok else None
+
+
+def dated_directory(directory, timestamp):
+    """directory/YYYYMMDD for a timestamp (local date), created if needed; keeps any one folder small"""
+    path = os.path.join(directory, datetime.fromtimestamp(timestamp).strftime("%Y%m%d"))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+class EventArtifact:
+    """One event's image, encoded once and shared by every consumer
+
+    Holds the JPEG bytes together with the event metadata. The disk writer,
+    the database, the detection feed and the webhook dispatcher all take
+    the same bytes by reference; nothing re-encodes the frame or reads the
+    image back from disk.
+    """
+    __slots__ = ('camera_id', 'category', 'bbox', 'captured_at', 'created_at', 'detections',
+                 'jpeg', 'shape', 'annotated', 'image_path', 'event_id')
+
+    def __init__(self, camera_id, category, bbox, captured_at, jpeg, shape, detections=(), annotated=False):
+        self.camera_id = camera_id
+        self.category = category
+        self.bbox = bbox  # (x, y, w, h) in the coordinates of `shape`
+        self.captured_at = captured_at
+        self.created_at = time.time()
+        self.detections = detections  # Every box in the frame, for re-annotating a snapshot
+        self.jpeg = jpeg
+        self.shape = shape
+        self.annotated = annotated
+        self.image_path = None  # Set once the image is on disk
+        self.event_id = None  # Set once the event is in the database
+
+    @classmethod
+    def from_frame(cls, frame, camera_id, category, bbox, captured_at, detections=(), annotate=False,
+                   quality=JPEG_QUALITY):
+        """Encode a frame (drawing the boxes on a copy when annotate is set); None if encoding fails"""
+        image = frame
+        if annotate and detections:
+            image = frame.copy()
+            draw_detections(image, detections)
+        jpeg = encode_jpeg(image, quality)
+        if jpeg is None:
+            return None
+        return cls(camera_id, category, bbox, captured_at, jpeg, frame.shape, detections, annotate)
+
+    @property
+    def filename(self):
+        timestamp = datetime.fromtimestamp(self.captured_at or self.created_at).strftime("%Y%m%d_%H%M%S")
+        return f"{self.camera_id}_{timestamp}_{self.category}.jpg"
+
+    def replace_frame(self, frame, quality=JPEG_QUALITY):
+        """Re-encode from a different view of the same moment (e.g. a main-stream snapshot)
+
+        Boxes are rescaled to the new frame. Returns False and keeps the
+        current image if encoding fails.
+        """
+        from models.snapshot import scale_bbox  # Import here to avoid circular imports
+        detections = []
+        for detection in self.detections:
+            x, y, w, h = scale_bbox(detection["bbox"], self.shape, frame.shape)
+            detections.append(dict(detection, bbox=(x, y, w, h), box=(x, y, x + w, y + h)))
+        image = frame
+        if self.annotated and detections:
+            image = frame.copy()
+            draw_detections(image, detections)
+        jpeg = encode_jpeg(image, quality)
+        if jpeg is None:
+            return False
+        if self.bbox is not None:
+            self.bbox = scale_bbox(self.bbox, self.shape, frame.shape)
+        self.detections = detections
+        self.jpeg = jpeg
+        self.shape = frame.shape
+        return True
+
+    def save(self, directory):
+        """Write the encoded bytes to the day's subdirectory of directory; returns the path or None"""
+        try:
+            path = os.path.join(dated_directory(directory, self.captured_at or self.created_at), self.filename)
+            with open(path, 'wb') as f:
+                f.write(self.jpeg)
+        except OSError as e:
+            print(f"Error saving event image {self.filename}: {str(e)}")
+            return None
+        self.image_path = path
+        return path
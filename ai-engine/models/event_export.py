@@ -0,0 +1,43 @@
+import csv
+import json
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+CSV_FIELDS = ['id', 'camera_id', 'camera_name', 'object_type', 'timestamp', 'captured_at', 'image_path',
+              'clip_path', 'detections']
+
+
+def format_cursor(cursor):
+    """Resume cursor (timestamp, id) as text, e.g. for the command line"""
+    return f"{cursor[0]},{cursor[1]}"
+
+
+def parse_cursor(text):
+    timestamp, event_id = text.rsplit(',', 1)
+    return timestamp, int(event_id)
+
+
+def export_events(db, output, export_format='ndjson', cursor=None, header=True, **filters):
+    """Write events from Database.iter_events to a text stream as NDJSON or CSV
+
+    A generator: yields the resume cursor after each event is written,
+    so the caller always holds the position to continue from (also when
+    it is interrupted). filters are passed to iter_events. CSV gets a
+    header row unless header is False (e.g. when appending a resumed
+    export) and the detections as a JSON column.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"unknown export format {export_format!r}")
+    writer = None
+    if export_format == 'csv':
+        writer = csv.DictWriter(output, fieldnames=CSV_FIELDS, extrasaction='ignore')
+        if header:
+            writer.writeheader()
+
+    for event in db.iter_events(cursor, **filters):
+        event_cursor = event.pop('cursor')
+        if writer is not None:
+            event['detections'] = json.dumps(event.get('detections', []))
+            writer.writerow(event)
+        else:
+            output.write(json.dumps(event) + '\n')
+        yield event_cursor
@@ -0,0 +1,110 @@
+import time
+import threading
+from collections import deque
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from config import DB_PATH, EVENT_SINK_WORKERS, EVENT_SINK_QUEUE_SIZE
+
+
+class _SinkRunnable(QRunnable):
+    """Pool task that keeps draining the sink's backlog until it is empty"""
+    def __init__(self, sink):
+        super().__init__()
+        self.sink = sink
+
+    def run(self):
+        self.sink._drain()
+
+
+class EventSink(QObject):
+    """Stores events off the GUI thread on a QThreadPool
+
+    submit() only queues the artifact. At most max_concurrent pool tasks
+    work through the backlog, each calling handler(artifact, db, *args) with a
+    Database connection it opens for the run and closes when the backlog is
+    empty. When max_pending events
+    are already waiting, new ones are refused (event_dropped) rather than
+    letting a burst pile up. Results come back to the GUI thread through
+    the completion signals.
+    """
+    event_stored = pyqtSignal(object)  # EventArtifact with event_id and image_path filled in
+    event_failed = pyqtSignal(object, str)  # EventArtifact, error
+    event_dropped = pyqtSignal(object)  # EventArtifact refused because the backlog was full
+
+    def __init__(self, handler, db_path=DB_PATH, thread_pool=None, max_concurrent=EVENT_SINK_WORKERS,
+                 max_pending=EVENT_SINK_QUEUE_SIZE):
+        super().__init__()
+        self.handler = handler
+        self.db_path = db_path
+        self.thread_pool = thread_pool or QThreadPool.globalInstance()
+        self.max_concurrent = max(1, min(max_concurrent, self.thread_pool.maxThreadCount()))
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)  # Notified when the last pool task finishes
+        self._pending = deque()
+        self._active = 0  # Pool tasks currently draining the backlog
+        self._closed = False
+
+    def submit(self, artifact, *args):
+        """Queue an event (and extra handler arguments) for storage; returns False if the backlog is full"""
+        with self._lock:
+            if self._closed or len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                refused = True
+            else:
+                refused = False
+                self._pending.append((artifact, args))
+                start_task = self._active < self.max_concurrent
+                if start_task:
+                    self._active += 1
+        if refused:
+            print(f"Event sink full, dropped {artifact.category} event from camera {artifact.camera_id}")
+            self.event_dropped.emit(artifact)
+            return False
+        if start_task:
+            self.thread_pool.start(_SinkRunnable(self))
+        return True
+
+    def pending(self):
+        """Events waiting for a pool thread"""
+        with self._lock:
+            return len(self._pending)
+
+    def _drain(self):
+        db = None
+        try:
+            while True:
+                with self._lock:
+                    if not self._pending:
+                        return
+                    artifact, args = self._pending.popleft()
+                try:
+                    if db is None:
+                        # SQLite connections belong to the thread that opened them
+                        from models.database import Database  # Import here to avoid circular imports
+                        db = Database(self.db_path)
+                    self.handler(artifact, db, *args)
+                except Exception as e:
+                    print(f"Error storing {artifact.category} event from camera {artifact.camera_id}: {str(e)}")
+                    self.event_failed.emit(artifact, str(e))
+                else:
+                    self.event_stored.emit(artifact)
+        finally:
+            if db is not None:
+                db.close()
+            with self._lock:
+                self._active -= 1
+                if self._active == 0:
+                    self._idle.notify_all()
+
+    def stop(self, timeout_ms=5000):
+        """Refuse new events and wait for this sink's pool tasks to write the backlog and close their connections"""
+        deadline = time.monotonic() + timeout_ms / 1000
+        with self._lock:
+            self._closed = True
+            while self._active:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    print(f"Event sink stopped with {len(self._pending)} event(s) unsaved")
+                    return
+                self._idle.wait(remaining)
@@ -0,0 +1,275 @@
+import os
+import time
+import threading
+import subprocess
+import numpy as np
+from PyQt6.QtCore import QThread, pyqtSignal
+from config import FFMPEG_PATH, FFPROBE_PATH, FFMPEG_CUVID, FRAME_RING_SLOTS, CAMERA_OPEN_TIMEOUT
+from models.connection_supervisor import supervisor as default_supervisor
+from models.frame_ring import FrameRing
+
+
+# Decoders that can downscale while decoding: JPEG-family IDCT at 1/2, 1/4 or 1/8 size
+LOWRES_CODECS = ('mjpeg', 'jpeg2000')
+# NVDEC decoders that accept a -resize WxH option (scaling happens on the GPU before download)
+CUVID_CODECS = ('h264', 'hevc')
+
+
+def probe_stream(url, ffprobe_path=FFPROBE_PATH, timeout=CAMERA_OPEN_TIMEOUT):
+    """Return (width, height, codec_name) of the first video stream, or None if unknown"""
+    cmd = [ffprobe_path, '-v', 'error', '-select_streams', 'v:0',
+           '-show_entries', 'stream=width,height,codec_name', '-of', 'default=noprint_wrappers=1']
+    if isinstance(url, str) and url.startswith('rtsp://'):
+        cmd += ['-rtsp_transport', 'tcp']
+    cmd.append(url)
+    try:
+        output = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout).stdout
+        fields = dict(line.split('=', 1) for line in output.splitlines() if '=' in line)
+        return int(fields['width']), int(fields['height']), fields.get('codec_name')
+    except Exception:
+        return None
+
+
+def probe_resolution(url, ffprobe_path=FFPROBE_PATH, timeout=CAMERA_OPEN_TIMEOUT):
+    """Return the (width, height) of the first video stream, or None if unknown"""
+    probe = probe_stream(url, ffprobe_path, timeout)
+    return probe[:2] if probe else None
+
+
+def decoder_scaling_args(source_size, codec, output_size):
+    """Input options that make the decoder itself produce reduced output
+
+    The scale filter then only has to cover the remaining factor (or nothing).
+    """
+    source_width, source_height = source_size
+    output_width, output_height = output_size
+    if codec in LOWRES_CODECS:
+        lowres = 0
+        while (lowres < 3 and source_width >> (lowres + 1) >= output_width
+               and source_height >> (lowres + 1) >= output_height):
+            lowres += 1
+        return ['-lowres', str(lowres)] if lowres else []
+    if FFMPEG_CUVID and codec in CUVID_CODECS:
+        return ['-c:v', f'{codec}_cuvid', '-resize', f'{output_width}x{output_height}']
+    return []
+
+
+def plan_decode(probe, max_resolution=None, output_size=None):
+    """Choose the output size and decoder options for a probed stream
+
+    output_size forces an exact size (e.g. the detection size) so frames are
+    resized once; otherwise the source is fitted inside max_resolution.
+    Returns (output_size, decoder_args); output_size is None if it cannot be known.
+    """
+    if probe:
+        source_width, source_height, codec = probe
+        size = output_size or fit_resolution(source_width, source_height, max_resolution)
+        return size, decoder_scaling_args((source_width, source_height), codec, size)
+    if output_size:
+        return output_size, []
+    if max_resolution:
+        # Unknown source size: let ffmpeg scale straight to the maximum resolution
+        return fit_resolution(*max_resolution, None), []
+    return None, []
+
+
+def fit_resolution(width, height, max_resolution):
+    """Scale (width, height) down to fit max_resolution, keeping aspect ratio and even sizes"""
+    if max_resolution:
+        max_width, max_height = max_resolution
+        if width > max_width or height > max_height:
+            scale_factor = min(max_width / width, max_height / height)
+            width = int(width * scale_factor)
+            height = int(height * scale_factor)
+    # Most scalers and pixel formats want even dimensions
+    return max(2, width - width % 2), max(2, height - height % 2)
+
+
+def build_ffmpeg_command(url, output_size, ffmpeg_path=FFMPEG_PATH, input_args=None, output_args=None):
+    """Build an ffmpeg command that decodes, scales and writes raw BGR frames to stdout"""
+    cmd = [ffmpeg_path, '-hide_banner', '-loglevel', 'error', '-nostdin']
+    if isinstance(url, str) and url.startswith('rtsp://'):
+        cmd += ['-rtsp_transport', 'tcp', '-fflags', 'nobuffer', '-flags', 'low_delay',
+                # I/O timeout in microseconds; unlike -timeout (a listen timeout that puts the RTSP
+                # demuxer in server mode before FFmpeg 5) it means the same thing on every version
+                '-rw_timeout', str(int(CAMERA_OPEN_TIMEOUT * 1000000))]
+    elif isinstance(url, str) and os.path.exists(url):
+        # Local test files are played back in real time and looped like a live camera
+        cmd += ['-re', '-stream_loop', '-1']
+    if input_args:
+        cmd += list(input_args)
+    cmd += ['-i', url, '-an', '-sn']
+    if output_size:
+        width, height = output_size
+        cmd += ['-vf', f'scale={width}:{height}:flags=area']
+    if output_args:
+        cmd += list(output_args)
+    cmd += ['-pix_fmt', 'bgr24', '-f', 'rawvideo', 'pipe:1']
+    return cmd
+
+
+class FFmpegStream(QThread):
+    """Thread that ingests a camera through an ffmpeg subprocess writing raw BGR frames into a ring"""
+    frame_ready = pyqtSignal(np.ndarray, str, object)  # frame (ring view), camera_id, FrameRef
+    connection_status = pyqtSignal(str, str)  # camera_id, status
+
+    def __init__(self, camera_id, rtsp_url, queue_size=64, max_resolution=(1280, 720),
+                 ring_size=FRAME_RING_SLOTS, ffmpeg_path=FFMPEG_PATH, input_args=None, output_args=None,
+                 supervisor=None, output_size=None):
+        super().__init__()
+        self.camera_id = camera_id
+        self.rtsp_url = rtsp_url
+        self.queue_size = queue_size  # Kept for interface parity with RTSPStream
+        self.max_resolution = max_resolution
+        self.ring_size = max(2, ring_size)
+        self.ffmpeg_path = ffmpeg_path
+        self.input_args = input_args
+        self.output_args = output_args
+        self.requested_size = output_size  # Exact output size (e.g. detection size), overrides max_resolution
+        self.output_size = None
+        self.decoder_args = []
+        self.process = None
+        self.is_running = False
+        self.supervisor = supervisor or default_supervisor
+        self._stop_event = threading.Event()
+
+        # Raw frames are read from the pipe straight into preallocated ring slots
+        self.frame_ring = None
+        self._scratch = None  # Drain buffer used when every ring slot is still referenced
+
+    @property
+    def last_frame(self):
+        """Most recent frame as a zero-copy ring view, or None"""
+        return self.frame_ring.latest_frame() if self.frame_ring else None
+
+    def _start_process(self):
+        """Launch the ffmpeg decoder process"""
+        input_args = list(self.input_args or []) + self.decoder_args
+        cmd = build_ffmpeg_command(self.rtsp_url, self.output_size, self.ffmpeg_path,
+                                   input_args, self.output_args)
+        return subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0)
+
+    def _connect(self, frame):
+        """Start ffmpeg and wait for its first frame; returns the process or None"""
+        self.process = self._start_process()
+        if self._read_into(frame):
+            return self.process
+        self._stop_process()
+        return None
+
+    def _read_into(self, view):
+        """Fill a ring slot from the pipe; returns False on EOF"""
+        process = self.process
+        if process is None:
+            return False
+        buffer = memoryview(view.reshape(-1))
+        total = len(buffer)
+        received = 0
+        while received < total:
+            count = process.stdout.readinto(buffer[received:])
+            if not count:
+                return False
+            received += count
+        return True
+
+    def _stop_process(self):
+        """Terminate the ffmpeg process if it is still running"""
+        process, self.process = self.process, None
+        if process is None:
+            return
+        try:
+            process.terminate()
+            process.wait(timeout=2)
+        except Exception:
+            process.kill()
+        finally:
+            if process.stdout:
+                process.stdout.close()
+
+    def _plan_output(self):
+        """Probe the stream until the output frame size is known; returns False if stopped first"""
+        while self.is_running:
+            self.output_size, self.decoder_args = plan_decode(
+                probe_stream(self.rtsp_url), self.max_resolution, self.requested_size)
+            if self.output_size is not None:
+                return True
+            # Raw frames need a known size; without a probe or a maximum there is nothing to read yet
+            self.supervisor.record_failure(self.camera_id, "probe failed")
+            self.connection_status.emit(self.camera_id, "Failed to connect")
+            if not self.supervisor.wait_before_retry(self.camera_id, self._stop_event):
+                break
+        return False
+
+    def run(self):
+        """Thread main function: read fixed-size frames from ffmpeg and emit ring views"""
+        self.is_running = True
+        self._stop_event.clear()
+        if not self._plan_output():
+            self.is_running = False
+            return
+        width, height = self.output_size
+        self.frame_ring = FrameRing((height, width, 3), self.ring_size)
+        self._scratch = np.empty((height, width, 3), dtype=np.uint8)
+        print(f"Camera {self.camera_id}: ffmpeg ingest at {width}x{height}, ring of {self.ring_size} frames"
+              + (f", decoder scaling {' '.join(self.decoder_args)}" if self.decoder_args else ""))
+
+        try:
+            frame_count = 0
+            last_status_time = time.time()
+
+            while self.is_running:
+                slot, frame = self.frame_ring.acquire_write()
+                if slot is None:
+                    # Every slot is still referenced downstream: drain this frame and drop it
+                    frame = self._scratch
+
+                if self.process is None:
+                    # The first frame is read while holding a supervisor connection slot
+                    process = self.supervisor.connect(self.camera_id, lambda: self._connect(frame),
+                                                      self._stop_event)
+                    if process is None:
+                        if not self.is_running:
+                            break
+                        self.connection_status.emit(self.camera_id, "Failed to connect")
+                        if not self.supervisor.wait_before_retry(self.camera_id, self._stop_event):
+                            break
+                        continue
+                    self.connection_status.emit(self.camera_id, "Connected")
+                elif not self._read_into(frame):
+                    self._stop_process()
+                    if not self.is_running:
+                        break
+                    self.supervisor.record_failure(self.camera_id, "stream lost")
+                    self.connection_status.emit(self.camera_id, "Reconnecting...")
+                    if not self.supervisor.wait_before_retry(self.camera_id, self._stop_event):
+                        break
+                    continue
+
+                if slot is None:
+                    continue
+
+                # Consumers receive a view into the ring and retain the ref before reading it
+                frame_ref = self.frame_ring.commit(slot, time.time())
+                self.frame_ready.emit(frame, self.camera_id, frame_ref)
+
+                frame_count += 1
+                if frame_count % 100 == 0:
+                    current_status_time = time.time()
+                    elapsed = current_status_time - last_status_time
+                    fps = 100 / elapsed if elapsed > 0 else 0
+                    print(f"Camera {self.camera_id}: {fps:.1f} FPS (ffmpeg)")
+                    last_status_time = current_status_time
+
+        except Exception as e:
+            print(f"Error in camera {self.camera_id}: {str(e)}")
+            self.connection_status.emit(self.camera_id, f"Error: {str(e)[:30]}...")
+        finally:
+            self._stop_process()
+            self.connection_status.emit(self.camera_id, "Disconnected")
+
+    def stop(self):
+        """Stop the thread safely"""
+        self.is_running = False
+        self._stop_event.set()
+        self._stop_process()
+        self.wait(1000)
@@ -0,0 +1,180 @@
+import math
+import threading
+import numpy as np
+from multiprocessing import shared_memory
+
+# Per-slot header columns (float64): sequence number, capture wall-clock time, stream PTS
+HEADER_SEQ = 0
+HEADER_TIME = 1
+HEADER_PTS = 2
+HEADER_COLUMNS = 4  # Spare columns for per-frame metadata
+
+
+class FrameRef:
+    """Handle to one committed frame in a FrameRing, passed between pipeline stages
+
+    timestamp is the wall-clock capture time (time.time() when the frame was
+    decoded); pts is the stream presentation time in seconds, or None when
+    the source does not expose one.
+    """
+    __slots__ = ('ring', 'slot', 'seq', 'timestamp', 'pts')
+
+    def __init__(self, ring, slot, seq, timestamp=0.0, pts=None):
+        self.ring = ring
+        self.slot = slot
+        self.seq = seq
+        self.timestamp = timestamp
+        self.pts = pts
+
+    @property
+    def frame(self):
+        return self.ring.view(self.slot)
+
+    def retain(self):
+        """Pin the frame; returns False if the slot has already been reused"""
+        return self.ring.retain(self.slot, self.seq)
+
+    def release(self):
+        self.ring.release(self.slot)
+
+
+class FrameRing:
+    """Fixed pool of preallocated frame slots with sequence numbers and reference counts
+
+    Writers fill a slot in place and commit it; readers address frames by
+    (slot, seq). A slot is only reused once every reader has released it, so
+    steady-state capture allocates nothing. With a name the ring lives in
+    shared memory and other processes can attach to it.
+    """
+    def __init__(self, shape, slots=8, name=None, create=True, dtype=np.uint8):
+        self.shape = tuple(shape)
+        self.slots = max(2, slots)
+        self.dtype = np.dtype(dtype)
+        self.name = name
+        self.frame_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        header_bytes = self.slots * HEADER_COLUMNS * 8
+
+        if name:
+            size = header_bytes + self.frame_bytes * self.slots
+            self._shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+            buffer = self._shm.buf
+        else:
+            self._shm = None
+            buffer = bytearray(header_bytes + self.frame_bytes * self.slots)
+        self._owner = create
+
+        self._header = np.ndarray((self.slots, HEADER_COLUMNS), dtype=np.float64, buffer=buffer)
+        self._frames = np.ndarray((self.slots,) + self.shape, dtype=self.dtype,
+                                  buffer=buffer, offset=header_bytes)
+        if create:
+            self._header[:, HEADER_SEQ] = -1
+
+        self._refcount = [0] * self.slots
+        self._lock = threading.Lock()
+        self._next_slot = 0
+        self._next_seq = 0
+        self._latest = -1
+
+    def acquire_write(self):
+        """Reserve the next free slot for writing; returns (slot, view) or (None, None) if all are in use"""
+        with self._lock:
+            for offset in range(self.slots):
+                slot = (self._next_slot + offset) % self.slots
+                if self._refcount[slot] == 0 and slot != self._latest:
+                    self._next_slot = (slot + 1) % self.slots
+                    # Invalidate the slot so stale (slot, seq) handles fail while it is rewritten
+                    self._header[slot, HEADER_SEQ] = -1
+                    return slot, self._frames[slot]
+        return None, None
+
+    def commit(self, slot, timestamp=0.0, pts=None):
+        """Publish a written slot; returns a FrameRef for it"""
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            self._header[slot, HEADER_TIME] = timestamp
+            self._header[slot, HEADER_PTS] = np.nan if pts is None else pts
+            self._header[slot, HEADER_SEQ] = seq
+            self._latest = slot
+        return FrameRef(self, slot, seq, timestamp, pts)
+
+    def set_meta(self, slot, column, value):
+        """Store a per-frame metadata value in one of the spare header columns"""
+        self._header[slot, column] = value
+
+    def get_meta(self, slot, column):
+        return float(self._header[slot, column])
+
+    def view(self, slot):
+        """Zero-copy view of a slot's frame"""
+        return self._frames[slot]
+
+    def sequence(self, slot):
+        return int(self._header[slot, HEADER_SEQ])
+
+    def latest(self):
+        """Return a FrameRef for the most recently committed frame, or None"""
+        with self._lock:
+            if self._latest < 0:
+                return None
+            slot = self._latest
+            pts = float(self._header[slot, HEADER_PTS])
+            return FrameRef(self, slot, int(self._header[slot, HEADER_SEQ]),
+                            float(self._header[slot, HEADER_TIME]), None if math.isnan(pts) else pts)
+
+    def latest_frame(self):
+        """Zero-copy view of the most recent frame (never reused while it is the latest), or None"""
+        with self._lock:
+            return self._frames[self._latest] if self._latest >= 0 else None
+
+    def retain(self, slot, seq=None):
+        """Take a reference on a slot; fails if it has been overwritten since seq was read"""
+        with self._lock:
+            if seq is not None and int(self._header[slot, HEADER_SEQ]) != seq:
+                return False
+            self._refcount[slot] += 1
+            return True
+
+    def release(self, slot):
+        """Drop a reference taken with retain()"""
+        with self._lock:
+            if self._refcount[slot] > 0:
+                self._refcount[slot] -= 1
+
+    def read_copy(self, slot, seq, out=None):
+        """Copy a frame out without holding a reference (for readers in other processes)
+
+        Returns the copy, or None if the writer replaced the slot during the read.
+        """
+        if int(self._header[slot, HEADER_SEQ]) != seq:
+            return None
+        if out is None:
+            out = np.empty(self.shape, dtype=self.dtype)
+        np.copyto(out, self._frames[slot])
+        if int(self._header[slot, HEADER_SEQ]) != seq:
+            return None
+        return out
+
+    def close(self, unlink=None):
+        """Release the shared memory segment
+
+        unlink defaults to whether this ring created it; an attached reader
+        can pass True to clean up after a writer process that died.
+        """
+        if self._shm is None:
+            return
+        if unlink is None:
+            unlink = self._owner
+        # Views must be dropped before the mapping can be closed
+        self._header = None
+        self._frames = None
+        if unlink:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+        try:
+            self._shm.close()
+        except BufferError:
+            pass  # A frame view is still alive elsewhere; the mapping goes away with it
+        self._shm = None
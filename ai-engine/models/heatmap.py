@@ -0,0 +1,95 @@
+import time
+import zlib
+import cv2
+import numpy as np
+from config import HEATMAP_GRID, HEATMAP_FLUSH_INTERVAL
+
+HOUR = 60 * 60
+
+
+def encode_grid(grid):
+    """Occupancy grid to the compressed BLOB stored in the heatmaps table"""
+    return zlib.compress(np.ascontiguousarray(grid, dtype=np.uint32).tobytes(), 1)
+
+
+def decode_grid(cells, rows, cols):
+    return np.frombuffer(zlib.decompress(cells), dtype=np.uint32).reshape(rows, cols)
+
+
+def render_heatmap(grid, size=None, background=None, alpha=0.5):
+    """Colour a grid (log-scaled to its busiest cell) into a BGR image
+
+    size is the output (width, height); with a background frame the
+    heatmap is scaled to it and blended on top.
+    """
+    values = np.log1p(np.asarray(grid, dtype=np.float32))
+    peak = values.max() if values.size else 0
+    scaled = (values * (255.0 / peak)).astype(np.uint8) if peak > 0 else np.zeros(values.shape, np.uint8)
+    image = cv2.applyColorMap(scaled, cv2.COLORMAP_JET)
+    if background is not None:
+        size = (background.shape[1], background.shape[0])
+    if size is not None:
+        image = cv2.resize(image, size, interpolation=cv2.INTER_LINEAR)
+    if background is not None:
+        image = cv2.addWeighted(background, 1.0 - alpha, image, alpha, 0)
+    return image
+
+
+def heatmap_png(grid, size=None, background=None, alpha=0.5):
+    """PNG bytes of render_heatmap(), or None if encoding fails"""
+    ok, encoded = cv2.imencode('.png', render_heatmap(grid, size, background, alpha))
+    return encoded.tobytes() if ok else None
+
+
+class HeatmapAccumulator:
+    """Coarse per-camera, per-category occupancy grids built from detection boxes
+
+    Each box adds one count to the grid cell under its bottom centre (where
+    the object stands, the same anchor Database.find_detections tests), so
+    the cost per detection is constant and no image is touched. Frames
+    are bucketed by their capture time, so a frame that reaches inference
+    late still counts towards the hour it was captured in. Grids are merged
+    into their hour's row of the heatmaps table through the database writer
+    every flush_interval seconds, when a new hour starts, and on flush().
+    """
+    def __init__(self, db, grid_size=HEATMAP_GRID, flush_interval=HEATMAP_FLUSH_INTERVAL):
+        self.db = db
+        self.cols, self.rows = grid_size
+        self.flush_interval = flush_interval
+        self._grids = {}  # (camera_id, category, bucket) -> uint32 array (rows, cols)
+        self._bucket = None  # Start of the latest hour seen
+        self._last_flush = time.monotonic()
+
+    def add(self, camera_id, detections, frame_shape, timestamp=None):
+        """Count a frame's detections (dicts with 'box' (x1, y1, x2, y2) and 'class')
+
+        timestamp is the frame's capture time (FrameRef.timestamp); the
+        current time is used when it is not known.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        bucket = int(timestamp // HOUR * HOUR)
+        if (self._bucket is not None and bucket > self._bucket) or \
+                time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+        if self._bucket is None or bucket > self._bucket:
+            self._bucket = bucket
+        if not detections:
+            return
+
+        height, width = frame_shape[:2]
+        for detection in detections:
+            x1, _, x2, y2 = detection["box"]
+            col = min(self.cols - 1, max(0, int((x1 + x2) * self.cols / (2 * width))))
+            row = min(self.rows - 1, max(0, int(y2 * self.rows / height)))
+            key = (camera_id, detection["class"], bucket)
+            grid = self._grids.get(key)
+            if grid is None:
+                grid = self._grids[key] = np.zeros((self.rows, self.cols), np.uint32)
+            grid[row, col] += 1
+
+    def flush(self):
+        """Queue the grids on the database writer and start new ones; returns the writer Futures"""
+        grids, self._grids = self._grids, {}
+        self._last_flush = time.monotonic()
+        return [self.db.add_heatmap_async(camera_id, category, bucket, grid)
+                for (camera_id, category, bucket), grid in grids.items()]
@@ -0,0 +1,357 @@
+import os
+import sys
+import time
+import socket
+import selectors
+import threading
+import subprocess
+from queue import Queue, Empty
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PyQt6.QtCore import QObject, pyqtSignal
+from config import (FRAME_RING_SLOTS, CAMERA_OPEN_TIMEOUT, CAMERA_READ_TIMEOUT,
+                    INGEST_PROBE_WORKERS, INGEST_MAX_FPS)
+from models.connection_supervisor import supervisor as default_supervisor
+from models.ffmpeg_stream import probe_stream, plan_decode, build_ffmpeg_command
+from models.frame_ring import FrameRing
+from models.latency import latency_tracker, DecodeLagMeter
+
+F_SETPIPE_SZ = 1031  # Linux fcntl to enlarge a pipe buffer
+PIPE_SIZE = 1 << 20
+
+
+class _Channel:
+    """State for one camera serviced by the ingest loop"""
+    __slots__ = ('camera_id', 'url', 'max_resolution', 'requested_size', 'on_frame', 'on_status',
+                 'output_size', 'decoder_args', 'ring', 'scratch', 'process', 'slot', 'buffer', 'received', 'state',
+                 'deadline', 'holds_slot', 'last_data', 'frame_index', 'lag_meter')
+
+    def __init__(self, camera_id, url, max_resolution, on_frame, on_status, requested_size=None):
+        self.camera_id = camera_id
+        self.url = url
+        self.max_resolution = max_resolution
+        self.requested_size = requested_size
+        self.on_frame = on_frame
+        self.on_status = on_status
+        self.output_size = None
+        self.decoder_args = []
+        self.ring = None
+        self.scratch = None
+        self.process = None
+        self.slot = None
+        self.buffer = None
+        self.received = 0
+        self.state = 'probing'  # probing -> waiting -> connecting -> streaming (probe_wait: probe failed)
+        self.deadline = 0.0
+        self.holds_slot = False
+        self.last_data = 0.0
+        self.frame_index = 0  # Frames since the current connection started
+        self.lag_meter = DecodeLagMeter()
+
+
+class IngestLoop(threading.Thread):
+    """One selector thread servicing many cameras through ffmpeg pipes
+
+    Decoding and scaling happen in the ffmpeg processes. This thread only
+    wakes when a pipe has data, copies it into the camera's frame ring and
+    hands finished frames to the callbacks. Offline cameras are timers, not
+    threads, so thread count stays flat as cameras are added. Resolution
+    probes run on a small executor so they never block the loop.
+    """
+    def __init__(self, supervisor=None, probe_workers=INGEST_PROBE_WORKERS, ring_factory=None,
+                 max_fps=INGEST_MAX_FPS):
+        super().__init__(daemon=True, name='ingest-loop')
+        self.supervisor = supervisor or default_supervisor
+        self.ring_factory = ring_factory or (lambda camera_id, shape: FrameRing(shape, FRAME_RING_SLOTS))
+        self.max_fps = max_fps
+        self.selector = selectors.DefaultSelector()
+        self._wake_reader, self._wake_writer = socket.socketpair()
+        self._wake_reader.setblocking(False)
+        self._wake_writer.setblocking(False)
+        self.selector.register(self._wake_reader, selectors.EVENT_READ, None)
+        self._commands = Queue()
+        self._channels = {}
+        self._executor = ThreadPoolExecutor(max_workers=max(1, probe_workers),
+                                            thread_name_prefix='ingest-probe')
+        self.is_running = False
+
+    # Public API (any thread)
+
+    def add_camera(self, camera_id, url, max_resolution, on_frame, on_status, output_size=None):
+        """Start servicing a camera; callbacks run on the loop thread
+
+        output_size, if given, is the exact frame size to deliver and overrides max_resolution.
+        """
+        channel = _Channel(camera_id, url, max_resolution, on_frame, on_status, output_size)
+        self._post('add', channel)
+
+    def remove_camera(self, camera_id):
+        """Stop servicing a camera and terminate its ffmpeg process"""
+        self._post('remove', camera_id)
+
+    def stop(self):
+        """Stop the loop and all cameras"""
+        self.is_running = False
+        self._wake()
+        self.join(2)
+
+    def _post(self, command, payload):
+        self._commands.put((command, payload))
+        self._wake()
+
+    def _wake(self):
+        try:
+            self._wake_writer.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass  # A wake-up is already pending
+
+    # Loop thread
+
+    def run(self):
+        self.is_running = True
+        try:
+            while self.is_running:
+                self._drain_commands()
+                timeout = self._service_timers(time.monotonic())
+                for key, _ in self.selector.select(timeout):
+                    if key.data is None:
+                        try:
+                            while self._wake_reader.recv(4096):
+                                pass
+                        except BlockingIOError:
+                            pass
+                    else:
+                        self._on_readable(key.data)
+        except Exception as e:
+            print(f"Error in ingest loop: {str(e)}")
+        finally:
+            for channel in list(self._channels.values()):
+                self._close_channel(channel)
+            self._channels.clear()
+            self._executor.shutdown(wait=False)
+
+    def _drain_commands(self):
+        while True:
+            try:
+                command, payload = self._commands.get_nowait()
+            except Empty:
+                return
+            if command == 'add':
+                old = self._channels.pop(payload.camera_id, None)
+                if old is not None:
+                    self._close_channel(old)
+                self._channels[payload.camera_id] = payload
+                self._start_probe(payload)
+            elif command == 'remove':
+                channel = self._channels.pop(payload, None)
+                if channel is not None:
+                    self._close_channel(channel)
+                    channel.on_status(channel.camera_id, "Disconnected")
+            elif command == 'probed':
+                camera_id, channel, probe = payload
+                if self._channels.get(camera_id) is channel:
+                    self._on_probed(channel, probe)
+
+    def _start_probe(self, channel):
+        """Probe the source resolution and codec off the loop thread"""
+        channel.state = 'probing'
+        future = self._executor.submit(probe_stream, channel.url)
+        future.add_done_callback(
+            lambda f: self._post('probed', (channel.camera_id, channel, f.result())))
+
+    def _on_probed(self, channel, probe):
+        channel.output_size, channel.decoder_args = plan_decode(
+            probe, channel.max_resolution, channel.requested_size)
+        if channel.output_size is None:
+            # Raw frames need a known size: probe again after the camera's backoff
+            print(f"Camera {channel.camera_id}: cannot determine stream resolution, probing again")
+            self.supervisor.record_failure(channel.camera_id, "probe failed")
+            channel.on_status(channel.camera_id, "Failed to connect")
+            channel.state = 'probe_wait'
+            channel.deadline = time.monotonic() + self.supervisor.backoff_delay(channel.camera_id)
+            return
+        width, height = channel.output_size
+        channel.ring = self.ring_factory(channel.camera_id, (height, width, 3))
+        channel.scratch = np.empty((height, width, 3), dtype=np.uint8)
+        channel.state = 'waiting'
+        channel.deadline = 0.0
+
+    def _service_timers(self, now):
+        """Start due connection attempts and expire stalled ones; returns the select timeout"""
+        timeout = 1.0
+        for channel in list(self._channels.values()):
+            if channel.state == 'waiting' and now >= channel.deadline:
+                if self.supervisor.try_acquire_slot():
+                    channel.holds_slot = True
+                    self._start_process(channel, now)
+                else:
+                    channel.deadline = now + 0.2  # Connection slots are busy; look again shortly
+            elif channel.state == 'probe_wait' and now >= channel.deadline:
+                self._start_probe(channel)
+            elif channel.state == 'connecting' and now >= channel.deadline:
+                self._fail(channel, "open timeout", now)
+            elif channel.state == 'streaming' and now - channel.last_data > CAMERA_READ_TIMEOUT:
+                self._fail(channel, "read timeout", now)
+
+            if channel.state in ('waiting', 'connecting', 'probe_wait'):
+                timeout = min(timeout, max(0.0, channel.deadline - now))
+        return timeout
+
+    def _start_process(self, channel, now):
+        output_args = ['-r', str(self.max_fps)] if self.max_fps else None
+        cmd = build_ffmpeg_command(channel.url, channel.output_size,
+                                   input_args=channel.decoder_args, output_args=output_args)
+        try:
+            channel.process = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                                               stderr=subprocess.DEVNULL, bufsize=0)
+        except OSError as e:
+            self._fail(channel, str(e), now)
+            return
+
+        fd = channel.process.stdout.fileno()
+        os.set_blocking(fd, False)
+        if sys.platform.startswith('linux'):
+            try:
+                import fcntl
+                fcntl.fcntl(fd, F_SETPIPE_SZ, PIPE_SIZE)  # Fewer wake-ups per frame
+            except OSError:
+                pass
+        self.selector.register(channel.process.stdout, selectors.EVENT_READ, channel)
+        channel.state = 'connecting'
+        channel.frame_index = 0
+        channel.lag_meter.reset()
+        channel.deadline = now + CAMERA_OPEN_TIMEOUT
+        channel.last_data = now
+        self._next_buffer(channel)
+
+    def _next_buffer(self, channel):
+        """Point the channel at a fresh ring slot (or the scratch buffer if all slots are held)"""
+        slot, view = channel.ring.acquire_write()
+        channel.slot = slot
+        channel.buffer = memoryview((view if slot is not None else channel.scratch).reshape(-1))
+        channel.received = 0
+
+    def _on_readable(self, channel):
+        try:
+            count = channel.process.stdout.readinto(channel.buffer[channel.received:])
+        except BlockingIOError:
+            return
+        if count is None:
+            return
+        now = time.monotonic()
+        if count == 0:
+            self._fail(channel, "stream lost", now)
+            return
+
+        channel.received += count
+        channel.last_data = now
+        if channel.received < len(channel.buffer):
+            return
+
+        if channel.state == 'connecting':
+            channel.state = 'streaming'
+            self._release_slot(channel)
+            self.supervisor.record_success(channel.camera_id)
+            channel.on_status(channel.camera_id, "Connected")
+
+        # Raw pipes carry no timestamps; with a fixed output rate the PTS follows from the frame index
+        capture_time = time.time()
+        pts = channel.frame_index / self.max_fps if self.max_fps else None
+        channel.frame_index += 1
+        decode_lag = channel.lag_meter.lag(pts, capture_time)
+        if decode_lag is not None:
+            latency_tracker.record(channel.camera_id, 'decode_lag', decode_lag)
+        if channel.slot is not None:
+            frame_ref = channel.ring.commit(channel.slot, capture_time, pts)
+            try:
+                channel.on_frame(channel.camera_id, channel.ring.view(channel.slot), frame_ref)
+            except Exception as e:
+                print(f"Error delivering frame for camera {channel.camera_id}: {str(e)}")
+        self._next_buffer(channel)
+
+    def _fail(self, channel, reason, now):
+        """Tear down a failed connection and schedule the next attempt"""
+        was_streaming = channel.state == 'streaming'
+        self._stop_process(channel)
+        self._release_slot(channel)
+        self.supervisor.record_failure(channel.camera_id, reason)
+        channel.on_status(channel.camera_id, "Reconnecting..." if was_streaming else "Failed to connect")
+        channel.state = 'waiting'
+        channel.deadline = now + self.supervisor.backoff_delay(channel.camera_id)
+
+    def _release_slot(self, channel):
+        if channel.holds_slot:
+            channel.holds_slot = False
+            self.supervisor.release_slot()
+
+    def _stop_process(self, channel):
+        process, channel.process = channel.process, None
+        if process is None:
+            return
+        try:
+            self.selector.unregister(process.stdout)
+        except (KeyError, ValueError):
+            pass
+        try:
+            process.kill()
+            process.wait(timeout=1)
+        except Exception:
+            pass
+        process.stdout.close()
+
+    def _close_channel(self, channel):
+        self._stop_process(channel)
+        self._release_slot(channel)
+        channel.state = 'closed'
+
+
+_ingest_loop = None
+_ingest_loop_lock = threading.Lock()
+
+
+def get_ingest_loop():
+    """Return the process-wide ingest loop, starting it on first use"""
+    global _ingest_loop
+    with _ingest_loop_lock:
+        if _ingest_loop is None or not _ingest_loop.is_alive():
+            _ingest_loop = IngestLoop()
+            _ingest_loop.start()
+        return _ingest_loop
+
+
+class PooledStream(QObject):
+    """Camera handle serviced by the shared IngestLoop; a drop-in for RTSPStream in LiveController"""
+    frame_ready = pyqtSignal(np.ndarray, str, object)  # frame (ring view), camera_id, FrameRef
+    connection_status = pyqtSignal(str, str)  # camera_id, status
+
+    def __init__(self, camera_id, rtsp_url, queue_size=64, max_resolution=(1280, 720), loop=None,
+                 output_size=None):
+        super().__init__()
+        self.camera_id = camera_id
+        self.rtsp_url = rtsp_url
+        self.queue_size = queue_size  # Kept for interface parity with RTSPStream
+        self.max_resolution = max_resolution
+        self.output_size = output_size
+        self.loop = loop
+        self.frame_ring = None
+
+    @property
+    def last_frame(self):
+        """Most recent frame as a zero-copy ring view, or None"""
+        return self.frame_ring.latest_frame() if self.frame_ring else None
+
+    def _on_frame(self, camera_id, frame, frame_ref):
+        self.frame_ring = frame_ref.ring
+        self.frame_ready.emit(frame, camera_id, frame_ref)
+
+    def start(self):
+        """Register the camera with the ingest loop"""
+        if self.loop is None:
+            self.loop = get_ingest_loop()
+        self.loop.add_camera(self.camera_id, self.rtsp_url, self.max_resolution,
+                             self._on_frame, self.connection_status.emit, self.output_size)
+
+    def stop(self):
+        """Unregister the camera; its ffmpeg process is terminated by the loop"""
+        if self.loop is not None:
+            self.loop.remove_camera(self.camera_id)
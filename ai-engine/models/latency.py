@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import deque
+from config import LATENCY_SAMPLES, LATENCY_REPORT_INTERVAL
+
+
+class LatencyTracker:
+    """Per-camera latency distributions for each pipeline stage
+
+    Stages recorded by the pipeline:
+      decode_lag       - wall-clock time elapsed minus stream (PTS) time elapsed since
+                         the connection started; growth means frames are queueing
+                         before decode rather than compute being slow
+      age_at_inference - capture time to the start of model inference
+      age_at_event     - capture time to the event being persisted
+    """
+    def __init__(self, samples=LATENCY_SAMPLES, report_interval=LATENCY_REPORT_INTERVAL):
+        self.samples = samples
+        self.report_interval = report_interval
+        self._lock = threading.Lock()
+        self._series = {}  # (camera_id, stage) -> deque of seconds
+        self._last_report = time.time()
+
+    def record(self, camera_id, stage, seconds):
+        """Add one latency sample in seconds"""
+        key = (camera_id, stage)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = deque(maxlen=self.samples)
+            series.append(seconds)
+
+    def record_age(self, camera_id, stage, capture_time, now=None):
+        """Record how old a frame captured at capture_time is now"""
+        if capture_time:
+            self.record(camera_id, stage, (now or time.time()) - capture_time)
+
+    def summary(self):
+        """{camera_id: {stage: {'p50', 'p95', 'max', 'count'}}} over the recent window, in seconds"""
+        with self._lock:
+            snapshot = {key: sorted(series) for key, series in self._series.items() if series}
+        result = {}
+        for (camera_id, stage), values in snapshot.items():
+            count = len(values)
+            result.setdefault(camera_id, {})[stage] = {
+                'p50': values[count // 2],
+                'p95': values[min(count - 1, int(count * 0.95))],
+                'max': values[-1],
+                'count': count,
+            }
+        return result
+
+    def maybe_report(self):
+        """Print the summary if the report interval has passed"""
+        now = time.time()
+        if now - self._last_report < self.report_interval:
+            return
+        self._last_report = now
+        for camera_id, stages in sorted(self.summary().items()):
+            parts = [f"{stage} p50={s['p50'] * 1000:.0f}ms p95={s['p95'] * 1000:.0f}ms"
+                     for stage, s in sorted(stages.items())]
+            print(f"Camera {camera_id} latency: " + ", ".join(parts))
+
+
+class DecodeLagMeter:
+    """Tracks wall-clock vs PTS drift for one connection of one camera"""
+    __slots__ = ('first_pts', 'first_wall')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.first_pts = None
+        self.first_wall = None
+
+    def lag(self, pts, wall_time):
+        """Seconds the stream has fallen behind real time since the first frame, or None"""
+        if pts is None:
+            return None
+        if self.first_pts is None or pts < self.first_pts:
+            # First frame, or the stream clock restarted
+            self.first_pts = pts
+            self.first_wall = wall_time
+            return 0.0
+        return (wall_time - self.first_wall) - (pts - self.first_pts)
+
+
+# Shared tracker used by capture, detection and persistence
+latency_tracker = LatencyTracker()
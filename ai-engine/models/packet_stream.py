@@ -0,0 +1,147 @@
+import time
+import threading
+from PyQt6.QtCore import QThread
+from config import CAMERA_OPEN_TIMEOUT, CAMERA_READ_TIMEOUT
+from models.connection_supervisor import supervisor as default_supervisor
+
+try:
+    import av
+except ImportError:
+    av = None
+
+
+class BufferedPacket:
+    """Compressed video packet copied out of the demuxer (which reuses its buffers)"""
+    __slots__ = ('data', 'pts', 'dts', 'is_keyframe', 'wall_time')
+
+    def __init__(self, packet, wall_time):
+        self.data = bytes(packet)
+        self.pts = packet.pts
+        self.dts = packet.dts
+        self.is_keyframe = packet.is_keyframe
+        self.wall_time = wall_time
+
+
+def mux_packet(output, output_stream, buffered, time_base, offset=0):
+    """Write a buffered packet to an output container by stream copy; returns False if it has no timestamp"""
+    dts = buffered.dts if buffered.dts is not None else buffered.pts
+    if dts is None:
+        return False
+    packet = av.Packet(buffered.data)
+    packet.dts = dts - offset
+    packet.pts = (buffered.pts if buffered.pts is not None else dts) - offset
+    packet.time_base = time_base
+    packet.is_keyframe = buffered.is_keyframe
+    packet.stream = output_stream
+    output.mux(packet)
+    return True
+
+
+def add_stream_copy(output, template):
+    """Add an output stream with the same codec parameters as an input stream"""
+    if hasattr(output, 'add_stream_from_template'):
+        return output.add_stream_from_template(template)
+    return output.add_stream(template=template)
+
+
+class PacketStream(QThread):
+    """Demux-only camera connection that hands compressed packets to consumers
+
+    Nothing is decoded, so buffering and recording cost almost no CPU.
+    Consumers are called on this thread with:
+      on_stream_opened(stream)  the input video stream (codec template, time base)
+      on_packet(packet)         a BufferedPacket stamped with its arrival time
+      on_stream_closed()        the connection dropped or the thread is stopping
+    """
+    def __init__(self, camera_id, url, supervisor=None):
+        super().__init__()
+        self.camera_id = camera_id
+        self.url = url
+        self.supervisor = supervisor or default_supervisor
+        self.consumers = []
+        self.is_running = False
+        self._stop_event = threading.Event()
+
+    @staticmethod
+    def available():
+        """Packet streams need PyAV for demuxing and remuxing"""
+        return av is not None
+
+    def add_consumer(self, consumer):
+        """Register a consumer; call before start()"""
+        self.consumers.append(consumer)
+
+    def run(self):
+        self.is_running = True
+        self._stop_event.clear()
+        # Tracked separately from the camera's detection stream
+        connection_id = f"{self.camera_id}:packets"
+
+        while self.is_running:
+            container = self.supervisor.connect(connection_id, self._open, self._stop_event)
+            if container is not None:
+                try:
+                    self._demux(container)
+                except Exception as e:
+                    print(f"Packet stream error on camera {self.camera_id}: {str(e)}")
+                finally:
+                    for consumer in self.consumers:
+                        try:
+                            consumer.on_stream_closed()
+                        except Exception as e:
+                            print(f"Error closing packet consumer on camera {self.camera_id}: {str(e)}")
+                    container.close()
+                if not self.is_running:
+                    break
+                self.supervisor.record_failure(connection_id, "packet stream lost")
+
+            if not self.supervisor.wait_before_retry(connection_id, self._stop_event):
+                break
+
+    def _open(self):
+        """Open the stream for demuxing; returns the container or None"""
+        options = {'rtsp_transport': 'tcp'} if self.url.startswith('rtsp://') else {}
+        container = av.open(self.url, options=options, timeout=(CAMERA_OPEN_TIMEOUT, CAMERA_READ_TIMEOUT))
+        if not container.streams.video:
+            container.close()
+            return None
+        return container
+
+    def _demux(self, container):
+        """Pass packets to the consumers until the stream ends or the thread stops"""
+        stream = container.streams.video[0]
+        time_base = float(stream.time_base)
+        live = self.url.startswith('rtsp://')
+        start_wall = time.time()
+        first_dts = None
+        print(f"Camera {self.camera_id}: demuxing {stream.codec_context.name} packets for "
+              f"{len(self.consumers)} consumer(s)")
+        for consumer in self.consumers:
+            consumer.on_stream_opened(stream)
+
+        for packet in container.demux(stream):
+            if not self.is_running:
+                return
+            if packet.size == 0:
+                continue  # Flush packet at end of stream
+
+            now = time.time()
+            if not live and packet.dts is not None:
+                # Files are replayed at their native rate, like ffmpeg -re
+                if first_dts is None:
+                    first_dts = packet.dts
+                delay = start_wall + (packet.dts - first_dts) * time_base - now
+                if delay > 0:
+                    if self._stop_event.wait(delay):
+                        return
+                    now = time.time()
+
+            buffered = BufferedPacket(packet, now)
+            for consumer in self.consumers:
+                consumer.on_packet(buffered)
+
+    def stop(self):
+        """Stop demuxing; consumers are closed on the way out"""
+        self.is_running = False
+        self._stop_event.set()
+        self.wait(3000)
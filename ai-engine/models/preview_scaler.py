@@ -0,0 +1,62 @@
+import threading
+import cv2
+import numpy as np
+from PyQt6.QtCore import QThread, pyqtSignal
+
+
+def fit_size(frame_shape, target_size):
+    """Largest (width, height) with the frame's aspect ratio that fits target_size, never upscaling"""
+    height, width = frame_shape[:2]
+    target_width, target_height = target_size
+    scale = min(target_width / width, target_height / height, 1.0)
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+class PreviewScaler(QThread):
+    """Downscales display frames to their widget's size off the GUI thread
+
+    submit() keeps only the newest frame per camera, so a slow pass drops
+    stale frames instead of queueing them. Frames that already fit are
+    passed through without a copy.
+    """
+    preview_ready = pyqtSignal(np.ndarray, str)  # scaled frame, camera_id
+
+    def __init__(self):
+        super().__init__()
+        self.is_running = False
+        self._condition = threading.Condition()
+        self._pending = {}  # camera_id -> (frame, target (width, height))
+
+    def submit(self, frame, camera_id, target_size):
+        """Replace the camera's pending frame; target_size is the widget's (width, height) in pixels"""
+        with self._condition:
+            self._pending[camera_id] = (frame, target_size)
+            self._condition.notify()
+
+    def discard(self, camera_id):
+        """Drop a pending frame, e.g. when the camera's widget goes away"""
+        with self._condition:
+            self._pending.pop(camera_id, None)
+
+    def run(self):
+        self.is_running = True
+        while self.is_running:
+            with self._condition:
+                while self.is_running and not self._pending:
+                    self._condition.wait(0.5)
+                pending, self._pending = self._pending, {}
+
+            for camera_id, (frame, target_size) in pending.items():
+                try:
+                    size = fit_size(frame.shape, target_size)
+                    if size != (frame.shape[1], frame.shape[0]):
+                        frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+                    self.preview_ready.emit(frame, camera_id)
+                except Exception as e:
+                    print(f"Error scaling preview for camera {camera_id}: {str(e)}")
+
+    def stop(self):
+        with self._condition:
+            self.is_running = False
+            self._condition.notify()
+        self.wait(1000)
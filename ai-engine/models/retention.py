@@ -0,0 +1,243 @@
+import os
+import time
+import threading
+from datetime import datetime
+from config import (DB_PATH, DETECTION_FEED_DIR, RETENTION_INTERVAL, RETENTION_MAX_AGE_DAYS, RETENTION_MAX_BYTES,
+                    RETENTION_CAMERA_MAX_AGE_DAYS, RETENTION_CAMERA_MAX_BYTES, RETENTION_DETECTION_MAX_AGE_DAYS,
+                    RETENTION_MINUTE_COUNTS_DAYS, RETENTION_HEATMAP_DAYS, RETENTION_FEED_MAX_AGE_DAYS, RETENTION_FEED_MAX_BYTES,
+                    RETENTION_BATCH_SIZE, RETENTION_VACUUM_PAGES)
+
+DAY = 24 * 60 * 60
+
+
+class RetentionManager(threading.Thread):
+    """Background thread that keeps events, their files and the detection feed within budget
+
+    Each pass deletes, oldest first:
+      - events past their camera's age limit (per-camera override, else the global one)
+      - each camera's events beyond its size budget, then events beyond the global size budget
+      - detection boxes that raised no event, once they pass their age limit
+      - per-minute event counts and hourly heatmaps past their age limits (hourly counts are kept)
+      - det_*.jpg images and their sidecars in the detection feed folder beyond its age and size limits
+    and then returns freed database pages to the disk with an incremental
+    vacuum. Rows are deleted in batches through the DatabaseWriter (an
+    event together with its detections); image and clip files are removed
+    after the batch commits, so no event ever points at a missing file.
+    Sizes are the image plus clip bytes recorded on each event.
+    """
+    def __init__(self, db_path=DB_PATH, interval=RETENTION_INTERVAL, max_age_days=RETENTION_MAX_AGE_DAYS,
+                 max_bytes=RETENTION_MAX_BYTES, camera_max_age_days=None, camera_max_bytes=None,
+                 detection_max_age_days=RETENTION_DETECTION_MAX_AGE_DAYS,
+                 minute_counts_days=RETENTION_MINUTE_COUNTS_DAYS, heatmap_days=RETENTION_HEATMAP_DAYS,
+                 feed_dir=DETECTION_FEED_DIR,
+                 feed_max_age_days=RETENTION_FEED_MAX_AGE_DAYS, feed_max_bytes=RETENTION_FEED_MAX_BYTES,
+                 batch_size=RETENTION_BATCH_SIZE, vacuum_pages=RETENTION_VACUUM_PAGES):
+        super().__init__(daemon=True, name='retention')
+        self.db_path = db_path
+        self.interval = interval
+        self.max_age_days = max_age_days
+        self.max_bytes = max_bytes
+        self.camera_max_age_days = {
+            int(camera_id): days for camera_id, days in
+            (RETENTION_CAMERA_MAX_AGE_DAYS if camera_max_age_days is None else camera_max_age_days).items()
+        }
+        self.camera_max_bytes = {
+            int(camera_id): budget for camera_id, budget in
+            (RETENTION_CAMERA_MAX_BYTES if camera_max_bytes is None else camera_max_bytes).items()
+        }
+        self.detection_max_age_days = detection_max_age_days
+        self.minute_counts_days = minute_counts_days
+        self.heatmap_days = heatmap_days
+        self.feed_dir = feed_dir
+        self.feed_max_age_days = feed_max_age_days
+        self.feed_max_bytes = feed_max_bytes
+        self.batch_size = batch_size
+        self.vacuum_pages = vacuum_pages
+        self._stop_event = threading.Event()
+        self._db = None
+
+    def run(self):
+        # SQLite connections belong to the thread that opened them
+        from models.database import Database  # Import here to avoid circular imports
+        self._db = Database(self.db_path)
+        try:
+            delay = min(60, self.interval)  # Let startup settle before the first pass
+            while not self._stop_event.wait(delay):
+                try:
+                    self.run_once()
+                except Exception as e:
+                    print(f"Retention pass failed: {str(e)}")
+                delay = self.interval
+        finally:
+            self._db.close()
+
+    def run_once(self, now=None):
+        """One retention pass; returns counts of what was removed"""
+        now = now or time.time()
+        stats = {'events': 0, 'detections': 0, 'feed_files': 0, 'pages': 0}
+        self._measure_events()
+
+        # Age limits
+        for camera_id, days in self.camera_max_age_days.items():
+            if days is not None:
+                stats['events'] += self._delete_expired(now - days * DAY, camera_id=camera_id)
+        if self.max_age_days is not None:
+            stats['events'] += self._delete_expired(now - self.max_age_days * DAY,
+                                                    exclude_cameras=list(self.camera_max_age_days))
+
+        # Size budgets
+        if self.camera_max_bytes or self.max_bytes is not None:
+            camera_bytes = self._db.get_event_bytes()
+            total = sum(camera_bytes.values())
+            for camera_id, budget in self.camera_max_bytes.items():
+                if budget is None:
+                    continue
+                deleted, freed = self._delete_oldest(camera_bytes.get(camera_id, 0) - budget, camera_id)
+                stats['events'] += deleted
+                total -= freed
+            if self.max_bytes is not None:
+                stats['events'] += self._delete_oldest(total - self.max_bytes)[0]
+
+        if self.detection_max_age_days is not None:
+            stats['detections'] = self._delete_detections(now - self.detection_max_age_days * DAY)
+        if self.minute_counts_days is not None:
+            self._db.prune_event_counts(now - self.minute_counts_days * DAY).result()
+        if self.heatmap_days is not None:
+            self._db.prune_heatmaps(now - self.heatmap_days * DAY).result()
+        stats['feed_files'] = self._trim_feed(now)
+        if self.vacuum_pages:
+            stats['pages'] = self._db.incremental_vacuum(self.vacuum_pages).result()
+
+        if any(stats.values()):
+            print(f"Retention: removed {stats['events']} events, {stats['detections']} detection boxes, "
+                  f"{stats['feed_files']} feed files; freed {stats['pages']} database pages")
+        return stats
+
+    def _measure_events(self):
+        """Fill in the size of events stored before sizes were recorded"""
+        while not self._stop_event.is_set():
+            events = self._db.get_unsized_events(self.batch_size)
+            if not events:
+                return
+            sizes = [(sum(self._file_size(path) for path in (image_path, clip_path)), event_id)
+                     for event_id, image_path, clip_path in events]
+            self._db.set_event_sizes(sizes).result()
+
+    def _delete_expired(self, before, camera_id=None, exclude_cameras=()):
+        deleted = 0
+        while not self._stop_event.is_set():
+            events = self._db.get_expired_events(before, camera_id, exclude_cameras, self.batch_size)
+            if not events:
+                break
+            self._delete_events(events)
+            deleted += len(events)
+        return deleted
+
+    def _delete_oldest(self, excess, camera_id=None):
+        """Delete the oldest events until excess bytes are freed; returns (events, bytes freed)"""
+        deleted = 0
+        freed = 0
+        while freed < excess and not self._stop_event.is_set():
+            events = self._db.get_oldest_events(excess - freed, camera_id, self.batch_size)
+            if not events:
+                break
+            freed += self._delete_events(events)
+            deleted += len(events)
+        return deleted, freed
+
+    def _delete_events(self, events):
+        """Delete one batch of (id, image_path, clip_path, size_bytes) rows, then their files; returns bytes"""
+        self._db.delete_events([event[0] for event in events]).result()
+        directories = set()
+        for _, image_path, clip_path, _ in events:
+            for path in (image_path, clip_path):
+                if path and self._remove_file(path):
+                    directories.add(os.path.dirname(path))
+        self._remove_empty_shards(directories)
+        return sum(size_bytes or 0 for _, _, _, size_bytes in events)
+
+    def _delete_detections(self, before):
+        deleted = 0
+        while not self._stop_event.is_set():
+            count = self._db.delete_detections_before(before, self.batch_size).result()
+            deleted += count
+            if count < self.batch_size:
+                break
+        return deleted
+
+    def _trim_feed(self, now):
+        """Delete the oldest det_*.jpg images, with their _metadata.json sidecars, beyond the feed's limits
+
+        A sidecar goes with its image (the boxes are in the detections
+        table); a sidecar whose image is already gone is trimmed on its own.
+        Returns the number of images removed.
+        """
+        if not os.path.isdir(self.feed_dir):
+            return 0
+        feed = {}  # det_* name without extension -> [mtime, bytes, paths, has image]
+        with os.scandir(self.feed_dir) as entries:
+            for entry in entries:
+                if not entry.name.startswith('det_') or not entry.is_file():
+                    continue
+                if entry.name.endswith('_metadata.json'):
+                    stem, is_image = entry.name[:-len('_metadata.json')], False
+                elif entry.name.endswith('.jpg'):
+                    stem, is_image = entry.name[:-len('.jpg')], True
+                else:
+                    continue
+                stat = entry.stat()
+                item = feed.setdefault(stem, [stat.st_mtime, 0, [], False])
+                item[0] = min(item[0], stat.st_mtime)
+                item[1] += stat.st_size
+                item[2].append(entry.path)
+                item[3] = item[3] or is_image
+        files = sorted(feed.values(), key=lambda item: item[0])
+
+        cutoff = now - self.feed_max_age_days * DAY if self.feed_max_age_days is not None else None
+        total = sum(size for _, size, _, _ in files)
+        removed = 0
+        for mtime, size, paths, is_image in files:
+            expired = cutoff is not None and mtime < cutoff
+            over_budget = self.feed_max_bytes is not None and total > self.feed_max_bytes
+            if not expired and not over_budget:
+                break
+            if all([self._remove_file(path) for path in paths]) and is_image:
+                removed += 1
+            total -= size
+        return removed
+
+    @staticmethod
+    def _file_size(path):
+        try:
+            return os.path.getsize(path) if path else 0
+        except OSError:
+            return 0
+
+    @staticmethod
+    def _remove_file(path):
+        """Delete a file; a file that is already gone counts as removed"""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Retention could not delete {path}: {str(e)}")
+            return False
+        return True
+
+    @staticmethod
+    def _remove_empty_shards(directories):
+        """Remove emptied YYYYMMDD folders, except today's (it is still being written to)"""
+        today = datetime.now().strftime("%Y%m%d")
+        for directory in directories:
+            name = os.path.basename(directory)
+            if len(name) == 8 and name.isdigit() and name != today:
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    pass  # Not empty yet
+
+    def stop(self, timeout=10):
+        """Stop after the current batch"""
+        self._stop_event.set()
+        self.join(timeout)
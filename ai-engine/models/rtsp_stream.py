@@ -2,15 +2,33 @@ import cv2
 import numpy as np
 import time
 import platform
+import threading
+from functools import lru_cache
 from queue import Queue
 from PyQt6.QtCore import QThread, pyqtSignal
+from config import CAMERA_OPEN_TIMEOUT, CAMERA_READ_TIMEOUT, FRAME_RING_SLOTS
+from models.connection_supervisor import supervisor as default_supervisor
+from models.frame_ring import FrameRing
+from models.latency import latency_tracker, DecodeLagMeter
+
+
+@lru_cache(maxsize=None)
+def cuda_available():
+    """Check once per process whether a CUDA GPU is available (importing torch is slow)"""
+    try:
+        import torch
+        return torch.cuda.is_available()
+    except:
+        return False
+
 
 class RTSPStream(QThread):
     """Thread to handle RTSP stream processing with hardware-aware optimizations"""
-    frame_ready = pyqtSignal(np.ndarray, str)
+    frame_ready = pyqtSignal(np.ndarray, str, object)  # frame (ring view), camera_id, FrameRef
     connection_status = pyqtSignal(str, str)  # camera_id, status
     
-    def __init__(self, camera_id, rtsp_url, queue_size=64, max_resolution=(1280, 720)):
+    def __init__(self, camera_id, rtsp_url, queue_size=64, max_resolution=(1280, 720), supervisor=None,
+                 output_size=None):
         super().__init__()
         self.camera_id = camera_id
         
@@ -38,13 +56,17 @@ class RTSPStream(QThread):
             self.max_resolution = max_resolution
             self.frame_interval = 0.01  # Up to 100 FPS
         
+        # Exact frame size to deliver (e.g. the detection size); overrides max_resolution so
+        # every frame is resized once, straight from the decoded size
+        self.output_size = output_size
+        
         self.frame_queue = Queue(maxsize=self.queue_size)
         self.is_running = False
         self.cap = None
-        self.last_frame = None
-        self.reconnect_attempts = 0
-        self.max_reconnect_attempts = 5
-        self.reconnect_delay = 2  # seconds
+        self.frame_ring = None  # Preallocated frame slots, sized once the stream resolution is known
+        # Reconnection is paced by the shared supervisor (backoff, jitter, concurrency cap)
+        self.supervisor = supervisor or default_supervisor
+        self._stop_event = threading.Event()
         
         print(f"Stream {camera_id} initialized: Mac={self.is_mac}, GPU={self.has_gpu}, "
               f"MaxRes={self.max_resolution}, FrameInterval={self.frame_interval}")
@@ -57,11 +79,7 @@ class RTSPStream(QThread):
     
     def _check_gpu_availability(self):
         """Check if CUDA GPU is available"""
-        try:
-            import torch
-            return torch.cuda.is_available()
-        except:
-            return False
+        return cuda_available()
     
     def _optimize_rtsp_url(self, url):
         """Optimize RTSP URL for better performance"""
@@ -94,31 +112,81 @@ class RTSPStream(QThread):
         
         return url
     
-    def run(self):
-        """Thread main function to capture frames continuously with optimizations"""
-        self.is_running = True
+    @property
+    def last_frame(self):
+        """Most recent frame as a zero-copy ring view, or None"""
+        return self.frame_ring.latest_frame() if self.frame_ring else None
+    
+    def _open_capture(self):
+        """Open the stream with open/read timeouts; returns None if it cannot be opened"""
+        params = []
+        if hasattr(cv2, 'CAP_PROP_OPEN_TIMEOUT_MSEC'):
+            params += [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, int(CAMERA_OPEN_TIMEOUT * 1000),
+                       cv2.CAP_PROP_READ_TIMEOUT_MSEC, int(CAMERA_READ_TIMEOUT * 1000)]
         
         # Configure OpenCV to use FFmpeg backend which works well cross-platform
-        self.cap = cv2.VideoCapture(self.rtsp_url, cv2.CAP_FFMPEG)
+        cap = cv2.VideoCapture(self.rtsp_url, cv2.CAP_FFMPEG, params) if params else \
+            cv2.VideoCapture(self.rtsp_url, cv2.CAP_FFMPEG)
         
         # Try to enable hardware acceleration if available on non-Mac
         if not self.is_mac and isinstance(self.rtsp_url, str) and self.rtsp_url.startswith('rtsp://'):
             # Try to enable hardware acceleration
             try:
-                self.cap.set(cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY)
+                cap.set(cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY)
                 
                 # Configure additional options for lower latency
-                self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Minimize buffering
+                cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Minimize buffering
             except:
                 print(f"Hardware acceleration not available for camera {self.camera_id}")
-            
-        if not self.cap.isOpened():
-            self.connection_status.emit(self.camera_id, "Failed to connect")
-            self.is_running = False
-            return
-            
-        self.connection_status.emit(self.camera_id, "Connected")
         
+        if not cap.isOpened():
+            cap.release()
+            return None
+        return cap
+    
+    def run(self):
+        """Thread main function: connect through the supervisor and capture until stopped"""
+        self.is_running = True
+        self._stop_event.clear()
+        
+        try:
+            while self.is_running:
+                self.cap = self.supervisor.connect(self.camera_id, self._open_capture, self._stop_event)
+                
+                if self.cap is None:
+                    if not self.is_running:
+                        break
+                    self.connection_status.emit(self.camera_id, "Failed to connect")
+                    # Offline cameras just sleep on the stop event until their next backoff slot
+                    if not self.supervisor.wait_before_retry(self.camera_id, self._stop_event):
+                        break
+                    continue
+                
+                self.connection_status.emit(self.camera_id, "Connected")
+                self._capture_frames()
+                
+                self.cap.release()
+                self.cap = None
+                if not self.is_running:
+                    break
+                
+                # Stream dropped: back off before reconnecting
+                self.supervisor.record_failure(self.camera_id, "stream lost")
+                self.connection_status.emit(self.camera_id, "Reconnecting...")
+                if not self.supervisor.wait_before_retry(self.camera_id, self._stop_event):
+                    break
+                
+        except Exception as e:
+            print(f"Error in camera {self.camera_id}: {str(e)}")
+            self.connection_status.emit(self.camera_id, f"Error: {str(e)[:30]}...")
+        finally:
+            if self.cap:
+                self.cap.release()
+                self.cap = None
+            self.connection_status.emit(self.camera_id, "Disconnected")
+    
+    def _capture_frames(self):
+        """Read frames from the open capture until it fails or the thread is stopped"""
         # Get original resolution
         orig_width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         orig_height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
@@ -128,7 +196,12 @@ class RTSPStream(QThread):
         scale_factor = 1.0
         target_width, target_height = orig_width, orig_height
         
-        if self.max_resolution:
+        if self.output_size:
+            target_width, target_height = self.output_size
+            scale_down = (target_width, target_height) != (orig_width, orig_height)
+            if scale_down:
+                print(f"Camera {self.camera_id}: Scaling from {orig_width}x{orig_height} to {target_width}x{target_height}")
+        elif self.max_resolution:
             max_width, max_height = self.max_resolution
             if orig_width > max_width or orig_height > max_height:
                 scale_down = True
@@ -139,96 +212,94 @@ class RTSPStream(QThread):
                 target_height = int(orig_height * scale_factor)
                 print(f"Camera {self.camera_id}: Scaling down from {orig_width}x{orig_height} to {target_width}x{target_height}")
         
-        try:
-            frame_count = 0
-            last_status_time = time.time()
-            last_frame_time = time.time()
+        # Frames are decoded (or scaled) straight into preallocated ring slots
+        ring_shape = (target_height, target_width, 3)
+        if self.frame_ring is None or self.frame_ring.shape != ring_shape:
+            self.frame_ring = FrameRing(ring_shape, FRAME_RING_SLOTS)
+        decode_buffer = None  # Reused full-resolution buffer when scaling down
+        lag_meter = DecodeLagMeter()  # Wall clock vs stream PTS for this connection
+        
+        frame_count = 0
+        last_status_time = time.time()
+        last_frame_time = time.time()
+        
+        while self.is_running:
+            # Control frame rate to avoid overwhelming the system
+            current_time = time.time()
+            elapsed = current_time - last_frame_time
             
-            while self.is_running:
-                # Control frame rate to avoid overwhelming the system
-                current_time = time.time()
-                elapsed = current_time - last_frame_time
-                
-                if elapsed < self.frame_interval:
-                    # Wait until the frame interval has passed
-                    time.sleep(max(0, self.frame_interval - elapsed))
-                    continue
-                
-                last_frame_time = current_time
-                ret, frame = self.cap.read()
-                
-                if not ret:
-                    # Try to reconnect if connection is lost
-                    self.reconnect_attempts += 1
-                    self.connection_status.emit(self.camera_id, f"Reconnecting... ({self.reconnect_attempts}/{self.max_reconnect_attempts})")
-                    
-                    if self.reconnect_attempts > self.max_reconnect_attempts:
-                        self.connection_status.emit(self.camera_id, "Connection failed after multiple attempts")
-                        time.sleep(5)  # Wait longer between reconnection cycles
-                        self.reconnect_attempts = 0
-                    
-                    self.cap.release()
-                    time.sleep(self.reconnect_delay)
-                    self.cap = cv2.VideoCapture(self.rtsp_url, cv2.CAP_FFMPEG)
-                    
-                    # Try to enable hardware acceleration again
-                    if not self.is_mac and isinstance(self.rtsp_url, str) and self.rtsp_url.startswith('rtsp://'):
-                        try:
-                            self.cap.set(cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY)
-                            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-                        except:
-                            pass
-                    continue
-                
-                # Reset reconnect counter on successful frame
-                self.reconnect_attempts = 0
-                
-                # Scale down the frame if needed
-                if scale_down:
-                    frame = cv2.resize(frame, (target_width, target_height), 
-                                     interpolation=cv2.INTER_AREA)  # INTER_AREA is better for downsampling
-                
-                # Clear queue if it's getting full to avoid lag - more aggressive on Mac
-                queue_threshold = 0.7 if self.is_mac else 0.8
-                queue_target = 0.4 if self.is_mac else 0.5
-                
-                if self.frame_queue.qsize() > self.frame_queue.maxsize * queue_threshold:
-                    try:
-                        while self.frame_queue.qsize() > self.frame_queue.maxsize * queue_target:
-                            self.frame_queue.get_nowait()
-                    except:
-                        pass
-                
-                self.last_frame = frame.copy()
-                
-                # Signal that a new frame is ready
-                self.frame_ready.emit(frame, self.camera_id)
-                
-                # Print stats every 100 frames
-                frame_count += 1
-                if frame_count % 100 == 0:
-                    current_status_time = time.time()
-                    elapsed = current_status_time - last_status_time
-                    fps = 100 / elapsed if elapsed > 0 else 0
-                    print(f"Camera {self.camera_id}: {fps:.1f} FPS, Queue: {self.frame_queue.qsize()}/{self.frame_queue.maxsize}")
-                    last_status_time = current_status_time
-                
-                # Sleep briefly to reduce CPU usage (adaptive based on queue size)
-                sleep_time = self.frame_interval  # Base sleep time
-                if self.frame_queue.qsize() > self.frame_queue.maxsize * 0.5:
-                    sleep_time = self.frame_interval * 1.5  # Sleep longer if queue is getting full
-                
-                time.sleep(sleep_time * 0.1)  # Short sleep to give other threads a chance to run
-                
-        except Exception as e:
-            print(f"Error in camera {self.camera_id}: {str(e)}")
-            self.connection_status.emit(self.camera_id, f"Error: {str(e)[:30]}...")
-        finally:
-            if self.cap:
-                self.cap.release()
-            self.connection_status.emit(self.camera_id, "Disconnected")
+            if elapsed < self.frame_interval:
+                # Wait until the frame interval has passed
+                time.sleep(max(0, self.frame_interval - elapsed))
+                continue
+            
+            last_frame_time = current_time
+            
+            slot, frame = self.frame_ring.acquire_write()
+            if slot is None:
+                # Every slot is still referenced downstream: skip this frame without decoding it
+                if not self.cap.grab():
+                    return
+                continue
+            
+            if scale_down:
+                ret, decode_buffer = self.cap.read(decode_buffer)
+                if ret:
+                    # INTER_AREA is better for downsampling
+                    cv2.resize(decode_buffer, (target_width, target_height), dst=frame,
+                               interpolation=cv2.INTER_AREA)
+            else:
+                ret, decoded = self.cap.read(frame)
+                if ret and decoded is not frame:
+                    # Stream changed resolution mid-flight; fit it into the slot
+                    cv2.resize(decoded, (target_width, target_height), dst=frame,
+                               interpolation=cv2.INTER_AREA)
+            
+            if not ret:
+                return
+            
+            # Stamp the frame with its capture wall-clock time and stream presentation time
+            capture_time = time.time()
+            pts_msec = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+            pts = pts_msec / 1000.0 if pts_msec >= 0 else None
+            decode_lag = lag_meter.lag(pts, capture_time)
+            if decode_lag is not None:
+                latency_tracker.record(self.camera_id, 'decode_lag', decode_lag)
+            
+            # Clear queue if it's getting full to avoid lag - more aggressive on Mac
+            queue_threshold = 0.7 if self.is_mac else 0.8
+            queue_target = 0.4 if self.is_mac else 0.5
+            
+            if self.frame_queue.qsize() > self.frame_queue.maxsize * queue_threshold:
+                try:
+                    while self.frame_queue.qsize() > self.frame_queue.maxsize * queue_target:
+                        self.frame_queue.get_nowait()
+                except:
+                    pass
+            
+            frame_ref = self.frame_ring.commit(slot, capture_time, pts)
+            
+            # Signal that a new frame is ready (consumers retain the ref before reading the view)
+            self.frame_ready.emit(frame, self.camera_id, frame_ref)
+            
+            # Print stats every 100 frames
+            frame_count += 1
+            if frame_count % 100 == 0:
+                current_status_time = time.time()
+                elapsed = current_status_time - last_status_time
+                fps = 100 / elapsed if elapsed > 0 else 0
+                print(f"Camera {self.camera_id}: {fps:.1f} FPS, Queue: {self.frame_queue.qsize()}/{self.frame_queue.maxsize}")
+                last_status_time = current_status_time
+            
+            # Sleep briefly to reduce CPU usage (adaptive based on queue size)
+            sleep_time = self.frame_interval  # Base sleep time
+            if self.frame_queue.qsize() > self.frame_queue.maxsize * 0.5:
+                sleep_time = self.frame_interval * 1.5  # Sleep longer if queue is getting full
+            
+            time.sleep(sleep_time * 0.1)  # Short sleep to give other threads a chance to run
     
     def stop(self):
         """Stop the thread safely"""
         self.is_running = False
+        self._stop_event.set()
         self.wait(1000)  # Wait for thread to finish
\ No newline at end of file
@@ -0,0 +1,114 @@
+import os
+from datetime import datetime
+from PyQt6.QtCore import QObject, pyqtSignal
+from config import RECORDINGS_DIR, RECORDING_SEGMENT_SECONDS
+from models.packet_stream import av, add_stream_copy, mux_packet
+
+TS_PACKET_SIZE = 188  # MPEG-TS readers resynchronise on these boundaries
+
+
+class SegmentRecorder(QObject):
+    """PacketStream consumer that records continuous MPEG-TS segments by stream copy
+
+    A segment is cut on the first keyframe after segment_seconds, so every
+    file plays on its own. The byte offset of each keyframe is noted as it
+    is written, which lets playback seek into a segment without scanning it.
+    Files are laid out as <directory>/<camera_id>/<YYYYMMDD>/<HHMMSS>.ts.
+    """
+    # camera_id, path, start time, end time, size in bytes, [(keyframe time, byte offset), ...]
+    segment_closed = pyqtSignal(str, str, float, float, int, list)
+
+    def __init__(self, camera_id, directory=RECORDINGS_DIR, segment_seconds=RECORDING_SEGMENT_SECONDS):
+        super().__init__()
+        self.camera_id = camera_id
+        self.directory = directory
+        self.segment_seconds = segment_seconds
+        self._stream = None
+        self._timestamp_offset = None  # First DTS of the connection; keeps segment timestamps continuous
+        self._file = None
+        self._output = None
+        self._output_stream = None
+        self._path = None
+        self._start_time = 0.0
+        self._end_time = 0.0
+        self._keyframes = []
+
+    # PacketStream consumer interface (called on the demux thread)
+
+    def on_stream_opened(self, stream):
+        self._stream = stream
+        self._timestamp_offset = None
+
+    def on_packet(self, packet):
+        if (self._output is not None and packet.is_keyframe
+                and packet.wall_time - self._start_time >= self.segment_seconds):
+            self._close_segment()
+
+        if self._output is None:
+            if not packet.is_keyframe:
+                return  # Segments have to open on a keyframe
+            if not self._open_segment(packet.wall_time):
+                return
+
+        if self._timestamp_offset is None:
+            self._timestamp_offset = packet.dts if packet.dts is not None else packet.pts or 0
+        if packet.is_keyframe:
+            # The muxer buffers its output, so the flushed position is at or just before
+            # this keyframe; rounding down to a TS packet keeps it a valid seek point
+            offset = self._file.tell() // TS_PACKET_SIZE * TS_PACKET_SIZE
+            self._keyframes.append((packet.wall_time, offset))
+
+        try:
+            mux_packet(self._output, self._output_stream, packet, self._stream.time_base,
+                       self._timestamp_offset)
+        except Exception as e:
+            print(f"Recording error on camera {self.camera_id}: {str(e)}")
+            self._close_segment()
+            return
+        self._end_time = packet.wall_time
+
+    def on_stream_closed(self):
+        self._close_segment()
+        self._stream = None
+
+    def _open_segment(self, start_time):
+        """Start a new segment file; returns False if it could not be created"""
+        started = datetime.fromtimestamp(start_time)
+        directory = os.path.join(self.directory, self.camera_id, started.strftime("%Y%m%d"))
+        path = os.path.join(directory, started.strftime("%H%M%S") + ".ts")
+        try:
+            os.makedirs(directory, exist_ok=True)
+            self._file = open(path, 'wb')
+            self._output = av.open(self._file, 'w', format='mpegts')
+            self._output_stream = add_stream_copy(self._output, self._stream)
+        except Exception as e:
+            print(f"Cannot start recording segment for camera {self.camera_id}: {str(e)}")
+            self._output = None
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            return False
+
+        self._path = path
+        self._start_time = self._end_time = start_time
+        self._keyframes = []
+        return True
+
+    def _close_segment(self):
+        """Finish the current segment and report it for indexing"""
+        output, self._output = self._output, None
+        if output is None:
+            return
+        try:
+            output.close()
+        except Exception as e:
+            print(f"Error finishing recording segment for camera {self.camera_id}: {str(e)}")
+        self._file.close()
+        self._file = None
+        self._output_stream = None
+
+        size = os.path.getsize(self._path) if os.path.exists(self._path) else 0
+        if size:
+            self.segment_closed.emit(self.camera_id, self._path, self._start_time, self._end_time,
+                                     size, self._keyframes)
+        self._keyframes = []
@@ -0,0 +1,78 @@
+import cv2
+import shutil
+from config import SNAPSHOT_MODE, FFMPEG_PATH
+
+
+class SnapshotSource:
+    """High-resolution snapshot source backed by a camera's main stream
+
+    Detection runs on the cheap substream; this class only touches the main
+    stream when an event needs evidence. In 'keyframe' mode an ffmpeg process
+    decodes keyframes only (-skip_frame nokey) and the latest one is kept in
+    its ring. In 'on_demand' mode the main stream is opened per event.
+    """
+    def __init__(self, camera_id, snapshot_url, mode=SNAPSHOT_MODE):
+        self.camera_id = camera_id
+        self.snapshot_url = snapshot_url
+        self.mode = mode
+        self.keyframe_stream = None
+
+        if self.mode == 'keyframe' and shutil.which(FFMPEG_PATH) is None:
+            print(f"Camera {camera_id}: ffmpeg not found, snapshots fall back to on-demand capture")
+            self.mode = 'on_demand'
+
+    def start(self):
+        """Start the keyframe cache if configured"""
+        if self.mode != 'keyframe':
+            return
+        from models.ffmpeg_stream import FFmpegStream  # Import here to avoid circular imports
+
+        self.keyframe_stream = FFmpegStream(
+            self.camera_id,
+            self.snapshot_url,
+            max_resolution=None,  # Keep the native main-stream resolution
+            ring_size=3,
+            input_args=['-skip_frame', 'nokey'],
+            output_args=['-vsync', '0']
+        )
+        self.keyframe_stream.start()
+
+    def capture(self):
+        """Return a high-resolution BGR frame, or None if the main stream is unavailable"""
+        if self.keyframe_stream is not None and self.keyframe_stream.frame_ring is not None:
+            keyframe_ref = self.keyframe_stream.frame_ring.latest()
+            if keyframe_ref is not None and keyframe_ref.retain():
+                # Pin the slot while copying; it is reused after a few more keyframes
+                try:
+                    return keyframe_ref.frame.copy()
+                finally:
+                    keyframe_ref.release()
+        return self._capture_on_demand()
+
+    def _capture_on_demand(self):
+        """Open the main stream just long enough to read one frame"""
+        cap = cv2.VideoCapture(self.snapshot_url, cv2.CAP_FFMPEG)
+        try:
+            if not cap.isOpened():
+                return None
+            ret, frame = cap.read()
+            return frame if ret else None
+        except Exception as e:
+            print(f"Snapshot error on camera {self.camera_id}: {str(e)}")
+            return None
+        finally:
+            cap.release()
+
+    def stop(self):
+        """Stop the keyframe cache"""
+        if self.keyframe_stream is not None:
+            self.keyframe_stream.stop()
+            self.keyframe_stream = None
+
+
+def scale_bbox(bbox, from_shape, to_shape):
+    """Map an (x, y, w, h) box between two frame shapes"""
+    x, y, w, h = bbox
+    scale_x = to_shape[1] / from_shape[1]
+    scale_y = to_shape[0] / from_shape[0]
+    return (int(x * scale_x), int(y * scale_y), int(w * scale_x), int(h * scale_y))
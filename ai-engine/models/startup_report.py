@@ -0,0 +1,66 @@
+import time
+
+
+class StartupReport:
+    """Time-to-first-frame for each camera started by one load_cameras() pass
+
+    Cameras are registered as they are started; the first frame (or the
+    last connection status) is noted per camera. The report is printed once,
+    either when every camera has delivered a frame or when the caller's
+    deadline passes, whichever comes first.
+    """
+    def __init__(self):
+        self.generation = 0  # Bumped per load so a stale deadline does not print a newer report
+        self.started_at = 0.0
+        self.logged = False
+        self._cameras = {}  # camera_id -> [name, first frame time or None, last status]
+        self._waiting = 0
+
+    def begin(self):
+        """Start a new report; returns its generation"""
+        self.generation += 1
+        self.started_at = time.time()
+        self.logged = False
+        self._cameras = {}
+        self._waiting = 0
+        return self.generation
+
+    def add_camera(self, camera_id, name):
+        self._cameras[camera_id] = [name, None, "Starting"]
+        self._waiting += 1
+
+    def first_frame(self, camera_id, timestamp):
+        """Note a camera's first frame; returns True once every camera has one"""
+        entry = self._cameras.get(camera_id)
+        if entry is None or entry[1] is not None:
+            return False
+        entry[1] = timestamp
+        self._waiting -= 1
+        return self._waiting == 0
+
+    def set_status(self, camera_id, status):
+        entry = self._cameras.get(camera_id)
+        if entry is not None:
+            entry[2] = status
+
+    def summary(self):
+        """{camera_id: (name, seconds to first frame or None, last status)}"""
+        return {
+            camera_id: (name, None if first is None else max(0.0, first - self.started_at), status)
+            for camera_id, (name, first, status) in self._cameras.items()
+        }
+
+    def log(self, generation=None):
+        """Print the report (once per generation)"""
+        if self.logged or (generation is not None and generation != self.generation) or not self._cameras:
+            return
+        self.logged = True
+        summary = self.summary()
+        ready = sorted(seconds for _, seconds, _ in summary.values() if seconds is not None)
+        print(f"Startup: {len(ready)}/{len(summary)} cameras delivering frames"
+              + (f", last after {ready[-1]:.1f}s" if ready else ""))
+        never = float('inf')
+        for camera_id, (name, seconds, status) in sorted(
+                summary.items(), key=lambda item: never if item[1][1] is None else item[1][1]):
+            first_frame = f"{seconds:6.2f}s" if seconds is not None else "  none "
+            print(f"  camera {camera_id:>4} {name[:24]:<24} first frame {first_frame}  ({status})")
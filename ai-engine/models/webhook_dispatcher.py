@@ -0,0 +1,209 @@
+import time
+import random
+from queue import Queue, Full, Empty
+import requests
+from requests.adapters import HTTPAdapter
+from PyQt6.QtCore import QThread, pyqtSignal
+from config import (DB_PATH, WEBHOOK_URL, WEBHOOK_SECRET, AUTH_TOKEN, WEBHOOK_TIMEOUT,
+                    WEBHOOK_QUEUE_SIZE, WEBHOOK_COALESCE_SECONDS, WEBHOOK_MAX_ATTEMPTS,
+                    WEBHOOK_RETRY_DELAY, WEBHOOK_RETRY_MAX_DELAY, WEBHOOK_OUTBOX_LIMIT)
+
+# Client errors that will not succeed on retry (everything else is retried)
+RETRYABLE_STATUS = (408, 425, 429)
+
+
+class _PendingAlert:
+    """Follow-up alerts for one camera and category being coalesced into a single webhook"""
+    __slots__ = ('camera_id', 'object_type', 'fields', 'image', 'filename', 'first_time', 'count')
+
+    def __init__(self, camera_id, object_type, fields, image, filename, first_time):
+        self.camera_id = camera_id
+        self.object_type = object_type
+        self.fields = fields
+        self.image = image
+        self.filename = filename
+        self.first_time = first_time
+        self.count = 1
+
+
+class WebhookDispatcher(QThread):
+    """Background webhook delivery with a durable outbox
+
+    submit() only queues the alert (JPEG bytes plus form fields), so
+    callers never wait on the network. The first alert for a camera and
+    category is sent at once; the ones that follow within the coalescing
+    window are merged into one summary webhook sent when it closes.
+    Every alert is written to the webhook_outbox table (through the
+    DatabaseWriter) before it is sent and removed once the server accepts
+    it; failures are retried with exponential backoff, including after a
+    restart. Requests go through one requests.Session so connections are
+    kept alive between alerts.
+    """
+    webhook_sent = pyqtSignal(str, str, int)  # camera_id, object_type, status code
+    webhook_failed = pyqtSignal(str, str, str)  # camera_id, object_type, error
+
+    def __init__(self, url=WEBHOOK_URL, headers=None, db_path=DB_PATH, queue_size=WEBHOOK_QUEUE_SIZE,
+                 coalesce_seconds=WEBHOOK_COALESCE_SECONDS, max_attempts=WEBHOOK_MAX_ATTEMPTS,
+                 timeout=WEBHOOK_TIMEOUT):
+        super().__init__()
+        self.url = url
+        self.headers = headers if headers is not None else {
+            'x-webhook-secret': WEBHOOK_SECRET,
+            'authorization': AUTH_TOKEN
+        }
+        self.db_path = db_path
+        self.coalesce_seconds = coalesce_seconds
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.queue = Queue(maxsize=queue_size)
+        self.dropped = 0  # Alerts refused because the queue was full
+        self.is_running = False
+        self._windows = {}  # (camera_id, object_type) -> time the open coalescing window began
+        self._pending = {}  # (camera_id, object_type) -> _PendingAlert
+        self._writes = []  # Outbox inserts queued on the database writer since the last flush
+        self._db = None
+        self._session = None
+
+    def submit(self, camera_id, object_type, fields, image, filename):
+        """Queue an alert without blocking; returns False if the queue is full"""
+        try:
+            self.queue.put_nowait((camera_id, object_type, fields, image, filename, time.time()))
+            return True
+        except Full:
+            self.dropped += 1
+            print(f"Webhook queue full, dropped {object_type} alert from camera {camera_id}")
+            return False
+
+    def run(self):
+        # SQLite connections belong to the thread that opened them
+        from models.database import Database  # Import here to avoid circular imports
+        self._db = Database(self.db_path)
+        self._session = requests.Session()
+        self._session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=0))
+        self._session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=0))
+        self.is_running = True
+
+        try:
+            while self.is_running:
+                try:
+                    self._add_pending(*self.queue.get(timeout=self._wait_time(time.time())))
+                    while True:
+                        self._add_pending(*self.queue.get_nowait())
+                except Empty:
+                    pass
+
+                now = time.time()
+                self._flush_pending(now)
+                self._deliver_due(now)
+        except Exception as e:
+            print(f"Error in webhook dispatcher: {str(e)}")
+        finally:
+            # Anything still queued or coalescing goes to the outbox so it is sent after a restart
+            try:
+                while True:
+                    self._add_pending(*self.queue.get_nowait())
+            except Empty:
+                pass
+            self._flush_pending(float('inf'))
+            self._session.close()
+            self._db.close()
+
+    def _wait_time(self, now):
+        """Seconds until the next coalescing window closes or outbox retry is due (at most 1s)"""
+        deadlines = [self._windows[key] + self.coalesce_seconds for key in self._pending]
+        next_retry = self._db.get_next_webhook_time()
+        if next_retry is not None:
+            deadlines.append(next_retry)
+        return max(0.05, min([1.0] + [deadline - now for deadline in deadlines]))
+
+    def _add_pending(self, camera_id, object_type, fields, image, filename, created_at):
+        """Send the first alert of a window right away; hold the ones that follow it"""
+        key = (camera_id, object_type)
+        window = self._windows.get(key)
+        if window is None or created_at >= window + self.coalesce_seconds:
+            self._flush_window(key)
+            self._windows[key] = created_at
+            self._writes.append(self._db.add_outbox_webhook(camera_id, object_type, fields, image, filename,
+                                                            created_at))
+            return
+        alert = self._pending.get(key)
+        if alert is None:
+            self._pending[key] = _PendingAlert(camera_id, object_type, fields, image, filename, created_at)
+        else:
+            alert.count += 1  # Keep the first follow-up's image and fields
+
+    def _flush_window(self, key):
+        """Close a coalescing window, moving its held alerts into the outbox as one webhook"""
+        self._windows.pop(key, None)
+        alert = self._pending.pop(key, None)
+        if alert is None:
+            return
+        fields = dict(alert.fields)
+        if alert.count > 1:
+            fields['caseDetails'] = (f"{fields.get('caseDetails', '')} "
+                                     f"({alert.count} more detections within {self.coalesce_seconds}s)").strip()
+        self._writes.append(self._db.add_outbox_webhook(alert.camera_id, alert.object_type, fields, alert.image,
+                                                        alert.filename, alert.first_time))
+
+    def _flush_pending(self, now):
+        """Close the coalescing windows that have ended, then keep the outbox within its limit
+
+        Waits for the queued outbox inserts, so the delivery that follows sees them.
+        """
+        for key, window in list(self._windows.items()):
+            if now >= window + self.coalesce_seconds:
+                self._flush_window(key)
+        if self._writes:
+            writes, self._writes = self._writes, []
+            for write in writes:
+                try:
+                    write.result()
+                except Exception as e:
+                    print(f"Error storing webhook in outbox: {str(e)}")
+            dropped = self._db.trim_webhook_outbox(WEBHOOK_OUTBOX_LIMIT).result()
+            if dropped:
+                print(f"Webhook outbox full, dropped {dropped} oldest alert(s)")
+
+    def _deliver_due(self, now):
+        """Attempt every outbox alert that is due"""
+        for webhook_id, camera_id, object_type, fields, image, filename, attempts in \
+                self._db.get_due_webhooks(now):
+            if not self.is_running:
+                return
+            attempts += 1
+            try:
+                files = {'image': (filename or 'event.jpg', image, 'image/jpeg')} if image else None
+                response = self._session.post(self.url, files=files, data=fields,
+                                              headers=self.headers, timeout=self.timeout)
+                status = response.status_code
+                if 200 <= status < 300:
+                    self._db.delete_webhook(webhook_id).result()
+                    self.webhook_sent.emit(camera_id, object_type, status)
+                    continue
+                error = f"HTTP {status}"
+                permanent = 400 <= status < 500 and status not in RETRYABLE_STATUS
+                unreachable = False
+            except requests.RequestException as e:
+                error = str(e)
+                permanent = False
+                unreachable = True
+
+            if permanent or attempts >= self.max_attempts:
+                print(f"Giving up on {object_type} webhook for camera {camera_id} "
+                      f"after {attempts} attempt(s): {error}")
+                self._db.delete_webhook(webhook_id).result()
+            else:
+                self._db.reschedule_webhook(webhook_id, attempts, now + self._retry_delay(attempts), error).result()
+            self.webhook_failed.emit(camera_id, object_type, error)
+            if unreachable:
+                return  # Leave the rest of the batch for the next round instead of timing out on each
+
+    def _retry_delay(self, attempts):
+        """Exponential backoff with jitter"""
+        delay = min(WEBHOOK_RETRY_MAX_DELAY, WEBHOOK_RETRY_DELAY * 2 ** (attempts - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def stop(self):
+        """Stop the dispatcher; undelivered alerts stay in the outbox"""
+        self.is_running = False
+        self.wait(int((self.timeout + 2) * 1000))
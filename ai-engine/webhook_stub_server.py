@@ -0,0 +1,68 @@
+"""Local stand-in for the alert webhook server
+
+Prints every alert it receives and can simulate failures, so the webhook
+dispatcher can be exercised without the real endpoint.
+
+Usage: python webhook_stub_server.py [port] [failure_rate]
+Then point WEBHOOK_URL in config.py at http://127.0.0.1:<port>/api/webhook/receive
+"""
+import sys
+import random
+from email import policy
+from email.parser import BytesParser
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PORT = int(sys.argv[1]) if len(sys.argv) > 1 else 8099
+FAILURE_RATE = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0  # Fraction of requests answered with 503
+
+
+def parse_multipart(content_type, body):
+    """Split a multipart/form-data body into ({field: value}, image size in bytes)"""
+    message = BytesParser(policy=policy.default).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+    fields = {}
+    image_bytes = 0
+    for part in message.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        if name == 'image':
+            image_bytes = len(part.get_payload(decode=True) or b'')
+        else:
+            fields[name] = part.get_content()
+    return fields, image_bytes
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the real server
+    received = 0
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        if random.random() < FAILURE_RATE:
+            self._reply(503, b'{"error": "simulated failure"}')
+            print(f"[{datetime.now():%H:%M:%S}] 503 (simulated failure)")
+            return
+
+        fields, image_bytes = parse_multipart(self.headers.get('Content-Type', ''), body)
+        WebhookHandler.received += 1
+        print(f"[{datetime.now():%H:%M:%S}] #{WebhookHandler.received} from "
+              f"{self.client_address[0]}:{self.client_address[1]} image={image_bytes}B "
+              f"secret={'ok' if self.headers.get('x-webhook-secret') else 'missing'} {fields}")
+        self._reply(200, b'{"status": "received"}')
+
+    def _reply(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Alerts are printed by do_POST
+
+
+if __name__ == '__main__':
+    print(f"Webhook stand-in listening on http://127.0.0.1:{PORT}/api/webhook/receive "
+          f"(failure rate {FAILURE_RATE:.0%})")
+    ThreadingHTTPServer(('127.0.0.1', PORT), WebhookHandler).serve_forever()
@@ -16,22 +16,54 @@ exports.runDetection = (req, res) => {
 };
 
 // ✅ Serve images from ai-engine/events (not just events/)
-exports.getEvents = (req, res) => {
+// Images are sharded into YYYYMMDD folders; newest day first, older flat files last
+// Optional ?page=1&limit=100 — folders are only read until the requested page is filled;
+// without a limit every image is returned
+exports.getEvents = async (req, res) => {
   const eventsDir = path.resolve(__dirname, '../../ai-engine/events');
+  const isImage = f => f.toLowerCase().endsWith('.jpg') || f.toLowerCase().endsWith('.jpeg') || f.toLowerCase().endsWith('.png');
+  const page = Math.max(1, parseInt(req.query.page, 10) || 1);
+  const paged = req.query.limit !== undefined;
+  const limit = paged ? Math.min(1000, Math.max(1, parseInt(req.query.limit, 10) || 100)) : Infinity;
+  const wanted = paged ? page * limit : Infinity;
 
-  fs.readdir(eventsDir, (err, files) => {
-    if (err) {
-      console.error("❌ Failed to read events folder:", err);
-      return res.status(500).json([]);
+  let entries;
+  try {
+    entries = await fs.promises.readdir(eventsDir, { withFileTypes: true });
+  } catch (err) {
+    console.error("❌ Failed to read events folder:", err);
+    return res.status(500).json([]);
+  }
+
+  const days = entries
+    .filter(entry => entry.isDirectory() && /^\d{8}$/.test(entry.name))
+    .map(entry => entry.name)
+    .sort()
+    .reverse();
+
+  const data = [];
+  for (const day of days) {
+    if (data.length >= wanted) break;
+    try {
+      (await fs.promises.readdir(path.join(eventsDir, day)))
+        .filter(isImage)
+        .forEach(f => data.push({
+          filename: f,
+          url: `/events/${day}/${f}` // this matches your static path in server.js
+        }));
+    } catch (dayErr) {
+      console.error(`❌ Failed to read events folder ${day}:`, dayErr); // Removed by retention meanwhile
     }
+  }
 
-    const data = files
-      .filter(f => f.toLowerCase().endsWith('.jpg') || f.toLowerCase().endsWith('.jpeg') || f.toLowerCase().endsWith('.png'))
-      .map(f => ({
-        filename: f,
-        url: `/events/${f}` // this matches your static path in server.js
+  if (data.length < wanted) {
+    entries
+      .filter(entry => entry.isFile() && isImage(entry.name))
+      .forEach(entry => data.push({
+        filename: entry.name,
+        url: `/events/${entry.name}` // this matches your static path in server.js
       }));
+  }
 
-    res.json(data);
-  });
+  res.json(paged ? data.slice(wanted - limit, wanted) : data);
 };
@@ -14,40 +14,52 @@ const scriptPath = path.resolve(__dirname, '..', process.env.PYTHON_SCRIPT);
 const rtspUrl = process.env.RTSP_URL;
 
 // 📸 GET /api/events - Get all detection images for Gallery
-router.get('/', (req, res) => {
+// Optional ?page=1&limit=100 (limit capped at 1000); without a limit every image is returned
+router.get('/', async (req, res) => {
   try {
     const eventsDir = path.resolve(__dirname, '..', process.env.EVENTS_DIR || 'events');
-    
-    // Check if events directory exists
-    if (!fs.existsSync(eventsDir)) {
+
+    // Read all files from events directory without blocking the event loop
+    let files;
+    try {
+      files = await fs.promises.readdir(eventsDir);
+    } catch (err) {
+      if (err.code !== 'ENOENT') throw err;
       console.log('Events directory not found:', eventsDir);
       return res.json([]);
     }
 
-    // Read all files from events directory
-    const files = fs.readdirSync(eventsDir);
-    
-    // Filter only image files and sort by modification time (newest first)
-    const imageFiles = files
-      .filter(file => {
-        const ext = path.extname(file).toLowerCase();
-        return ['.jpg', '.jpeg', '.png', '.gif'].includes(ext) &&
-         file.startsWith('det_')
-      })
-      .map(file => {
-        const filePath = path.join(eventsDir, file);
-        const stats = fs.statSync(filePath);
+    // Filter only image files
+    const names = files.filter(file => {
+      const ext = path.extname(file).toLowerCase();
+      return ['.jpg', '.jpeg', '.png', '.gif'].includes(ext) &&
+       file.startsWith('det_')
+    });
+
+    // Stat them and sort by modification time (newest first)
+    const imageFiles = (await Promise.all(names.map(async file => {
+      try {
+        const stats = await fs.promises.stat(path.join(eventsDir, file));
         return {
           filename: file,
           url: `/events/${file}`,
           timestamp: stats.mtime,
           size: stats.size
         };
-      })
+      } catch (err) {
+        return null; // Removed by retention since the directory was read
+      }
+    })))
+      .filter(Boolean)
       .sort((a, b) => b.timestamp.getTime() - a.timestamp.getTime()); // newest first
 
     console.log(`📸 Found ${imageFiles.length} images in events folder`);
-    res.json(imageFiles);
+    if (req.query.limit === undefined) {
+      return res.json(imageFiles);
+    }
+    const page = Math.max(1, parseInt(req.query.page, 10) || 1);
+    const limit = Math.min(1000, Math.max(1, parseInt(req.query.limit, 10) || 100));
+    res.json(imageFiles.slice((page - 1) * limit, page * limit));
     
   } catch (error) {
     console.error('Error reading events directory:', error);